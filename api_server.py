@@ -36,6 +36,22 @@ def load_config():
     except Exception:
         return {}
 
+def get_workers():
+    """
+    Obtiene la cantidad de procesos worker de uvicorn desde config.json (api.workers).
+    
+    Por defecto es 1: el estado de procesamiento (cola de jobs, progreso, locks de
+    edición de periodos, índices en memoria) vive en el proceso, así que con varios
+    workers un request de estado puede llegar a un proceso distinto al que procesa.
+    Usar más de 1 solo si el despliegue enruta de forma consistente o no usa esos endpoints.
+    """
+    config = load_config()
+    try:
+        workers = int(config.get("api", {}).get("workers", 1))
+    except (TypeError, ValueError):
+        return 1
+    return max(1, workers)
+
 def get_ssl_config():
     """Obtiene la configuración SSL desde config.json"""
     config = load_config()
@@ -77,9 +93,14 @@ if __name__ == "__main__":
         print("\nNOTA: Para habilitar HTTPS, configura 'api.ssl.enabled: true' en config.json")
         print("      y coloca los certificados en las rutas especificadas.")
     
+    workers = get_workers()
+    if workers > 1:
+        print(f"\nWorkers: {workers} (el estado en memoria no se comparte entre procesos)")
+    
     print("\nPresiona Ctrl+C para detener el servidor\n")
     
-    # Configurar uvicorn
+    # Configurar uvicorn (loop/http quedan en "auto": usa uvloop y httptools de
+    # uvicorn[standard] si están instalados y, si no, asyncio y h11)
     uvicorn_config = {
         "app": app,
         "host": "0.0.0.0",
@@ -89,6 +110,11 @@ if __name__ == "__main__":
         "timeout_keep_alive": 5
     }
     
+    if workers > 1:
+        # Con varios workers uvicorn necesita la app como import string
+        uvicorn_config["app"] = "src.api.main:app"
+        uvicorn_config["workers"] = workers
+    
     if use_https:
         uvicorn_config["ssl_keyfile"] = key_path
         uvicorn_config["ssl_certfile"] = cert_path
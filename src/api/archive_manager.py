@@ -107,12 +107,19 @@ class ArchiveManager:
         
         cutoff_date = datetime.now() - timedelta(days=days)
         
-        for zip_file in self.public_folder.glob("*.zip"):
+        # os.scandir + comparación de sufijo en lugar de Path.glob
+        try:
+            with os.scandir(self.public_folder) as entries:
+                zip_entries = [entry for entry in entries if entry.name.endswith(".zip")]
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        
+        for zip_entry in zip_entries:
             try:
                 # Obtener fecha de modificación
-                mtime = datetime.fromtimestamp(zip_file.stat().st_mtime)
+                mtime = datetime.fromtimestamp(zip_entry.stat().st_mtime)
                 if mtime < cutoff_date:
-                    zip_file.unlink()
+                    os.unlink(zip_entry.path)
             except Exception:
                 pass
 
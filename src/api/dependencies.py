@@ -18,6 +18,8 @@ from .upload_manager import UploadManager
 from .archive_manager import ArchiveManager
 from .processed_tracker import ProcessedTracker
 from .periodo_manager import PeriodoManager
+from .excel_index import ExcelIndex
+from .structured_index import StructuredIndex
 
 logger = logging.getLogger(__name__)
 
@@ -301,6 +303,56 @@ def get_processed_tracker() -> ProcessedTracker:
     return _service_cache["processed_tracker"]
 
 
+def get_excel_index() -> ExcelIndex:
+    """
+    Obtiene instancia de ExcelIndex (singleton).
+    
+    El índice se guarda en {output}/api/index.db.
+    
+    Returns:
+        Instancia configurada de ExcelIndex
+    """
+    global _service_cache
+    
+    if _service_cache is None:
+        _service_cache = {}
+    
+    if "excel_index" not in _service_cache:
+        file_manager = get_file_manager()
+        base_output = file_manager.get_output_folder() or "./output"
+        db_path = Path(base_output) / "api" / "index.db"
+        _service_cache["excel_index"] = ExcelIndex(str(db_path))
+    
+    return _service_cache["excel_index"]
+
+
+def get_structured_index() -> StructuredIndex:
+    """
+    Obtiene instancia de StructuredIndex (singleton).
+    
+    Indexa los JSONs de {output}/api/{request_id}/structured/ y persiste los
+    resúmenes en {output}/api/structured_index.json.
+    
+    Returns:
+        Instancia configurada de StructuredIndex
+    """
+    global _service_cache
+    
+    if _service_cache is None:
+        _service_cache = {}
+    
+    if "structured_index" not in _service_cache:
+        file_manager = get_file_manager()
+        base_output = file_manager.get_output_folder() or "./output"
+        api_folder = Path(base_output) / "api"
+        _service_cache["structured_index"] = StructuredIndex(
+            str(api_folder),
+            cache_file=str(api_folder / "structured_index.json")
+        )
+    
+    return _service_cache["structured_index"]
+
+
 def get_periodo_manager() -> PeriodoManager:
     """
     Obtiene instancia de PeriodoManager (singleton).
@@ -361,6 +413,8 @@ def clear_service_cache():
 
 # Cache para lista de correos autorizados
 _allowed_emails_cache: Optional[list] = None
+# Mismo contenido como frozenset para que is_email_allowed sea una búsqueda O(1)
+_allowed_emails_set: Optional[frozenset] = None
 
 
 def get_allowed_emails() -> list:
@@ -370,7 +424,7 @@ def get_allowed_emails() -> list:
     Returns:
         Lista de correos autorizados (emails en minúsculas)
     """
-    global _allowed_emails_cache
+    global _allowed_emails_cache, _allowed_emails_set
     
     if _allowed_emails_cache is not None:
         return _allowed_emails_cache
@@ -400,6 +454,7 @@ def get_allowed_emails() -> list:
                 continue
     
     # Cachear resultado
+    _allowed_emails_set = frozenset(allowed_emails)
     _allowed_emails_cache = allowed_emails
     
     return allowed_emails
@@ -418,7 +473,9 @@ def is_email_allowed(email: str) -> bool:
     if not email:
         return False
     
-    allowed_emails = get_allowed_emails()
+    allowed_emails = _allowed_emails_set
+    if allowed_emails is None:
+        allowed_emails = frozenset(get_allowed_emails())
     email_normalized = email.lower().strip()
     
     return email_normalized in allowed_emails
@@ -428,8 +485,9 @@ def clear_allowed_emails_cache():
     """
     Limpia el cache de correos autorizados (útil para recargar configuración).
     """
-    global _allowed_emails_cache
+    global _allowed_emails_cache, _allowed_emails_set
     _allowed_emails_cache = None
+    _allowed_emails_set = None
 
 
 def add_email_to_allowed_list(email: str) -> bool:
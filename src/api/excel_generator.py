@@ -3,15 +3,26 @@ Excel Generator - Generación de archivos Excel consolidados
 Responsabilidad: Crear archivos Excel a partir de JSONs estructurados
 """
 
+import io
+import os
 import json
+import asyncio
 import logging
 from pathlib import Path
 from typing import Optional
 
 from ..core.file_manager import truncate_filename_for_path
+from .structured_index import load_structured_json
 
 logger = logging.getLogger(__name__)
 
+# Ancho máximo de columna en el Excel consolidado (contenido + 2 de margen)
+_MAX_COLUMN_WIDTH = 50
+_MAX_CONTENT_WIDTH = _MAX_COLUMN_WIDTH - 2
+
+# Buffer de escritura del .xlsx en disco (xlsxwriter escribe el ZIP en muchos bloques pequeños)
+_EXCEL_WRITE_BUFFER_SIZE = 1 << 20
+
 
 def truncate_request_id_for_folder(request_id: str, max_length: int = 30) -> str:
     """
@@ -54,6 +65,117 @@ def extract_code_from_filename(filename: str) -> str:
     return filename[:first_underscore_index]
 
 
+def _to_numeric(value) -> Optional[float]:
+    """
+    Convierte un valor a float para columnas numéricas del Excel.
+    
+    Args:
+        value: Valor del registro (string numérico con separadores, int o float)
+        
+    Returns:
+        Valor como float o None si no se puede convertir
+    """
+    try:
+        # Convertir a float si es string numérico
+        if isinstance(value, str):
+            # Limpiar el string (remover espacios, comas, etc.)
+            cleaned_value = value.replace(",", "").replace(" ", "").strip()
+            if cleaned_value:
+                return float(cleaned_value)
+            return None
+        if isinstance(value, (int, float)):
+            return float(value)
+    except (ValueError, TypeError):
+        # Si no se puede convertir, dejar como está
+        pass
+    return None
+
+
+def _write_consolidated_workbook(output, column_order: list, all_records: list):
+    """
+    Escribe el Excel consolidado (encabezados, filas y anchos de columna).
+    
+    Args:
+        output: Archivo abierto en modo binario o BytesIO donde se escribe el .xlsx
+        column_order: Columnas en el orden en que se escriben
+        all_records: Registros consolidados (dicts)
+    """
+    import xlsxwriter
+    
+    # constant_memory: cada fila se escribe a disco al pasar a la siguiente,
+    # sin construir el modelo de celdas en memoria
+    wb = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'strings_to_numbers': False,
+        'strings_to_urls': False,
+        'nan_inf_to_errors': True
+    })
+    ws = wb.add_worksheet("Datos Consolidados")
+    
+    # Estilos
+    header_format = wb.add_format({
+        'bold': True,
+        'font_color': '#FFFFFF',
+        'font_size': 11,
+        'bg_color': '#366092',
+        'pattern': 1,
+        'align': 'center',
+        'valign': 'vcenter',
+        'text_wrap': True
+    })
+    # Formato numérico con 2 decimales
+    numeric_format = wb.add_format({'num_format': '#,##0.00'})
+    
+    # Columnas que deben tener formato numérico
+    numeric_columns = ["nPrecioTotal", "nPrecioUnitario"]
+    
+    # Escribir encabezados (siempre se escriben, aunque no haya datos)
+    ws.write_row(0, 0, column_order, header_format)
+    
+    # Índices de las columnas numéricas (se resuelven una sola vez, no por celda)
+    numeric_col_indices = [idx for idx, col_name in enumerate(column_order) if col_name in numeric_columns]
+    
+    # El formato numérico se asigna a la columna (antes de escribir filas): xlsxwriter
+    # lo aplica a las celdas escritas sin formato propio, sin re-escribir cada celda
+    for col_idx in numeric_col_indices:
+        ws.set_column(col_idx, col_idx, None, numeric_format)
+    
+    # Escribir datos (si hay) y calcular el ancho de cada columna en la misma pasada
+    column_widths = [len(str(col_name)) for col_name in column_order]
+    row_idx = 1
+    for record in all_records:
+        if isinstance(record, dict):
+            # Extraer la fila completa de una vez (columnas faltantes o None -> celda vacía)
+            row_values = [value if value is not None else "" for value in map(record.get, column_order)]
+            
+            # Convertir a número las columnas numéricas (toman el formato de la columna)
+            for col_idx in numeric_col_indices:
+                value = row_values[col_idx]
+                if value != "":
+                    numeric_value = _to_numeric(value)
+                    if numeric_value is not None:
+                        row_values[col_idx] = numeric_value
+            
+            # Una vez alcanzado el ancho máximo no hace falta seguir midiendo la columna
+            for col_idx, value in enumerate(row_values):
+                if value and column_widths[col_idx] < _MAX_CONTENT_WIDTH:
+                    value_length = len(str(value))
+                    if value_length > column_widths[col_idx]:
+                        column_widths[col_idx] = value_length
+            
+            ws.write_row(row_idx, 0, row_values)
+            row_idx += 1
+    
+    # Ajustar ancho de columnas (conservando el formato de las columnas numéricas)
+    for col_idx, max_length in enumerate(column_widths):
+        adjusted_width = min(max(max_length + 2, 10), _MAX_COLUMN_WIDTH)
+        ws.set_column(col_idx, col_idx, adjusted_width,
+                      numeric_format if col_idx in numeric_col_indices else None)
+    
+    # Guardar el Excel
+    wb.close()
+
+
 async def generate_excel_for_request(
     request_id: str,
     pdf_name: str,
@@ -65,6 +187,9 @@ async def generate_excel_for_request(
     Genera un archivo Excel consolidado para un request_id.
     SIEMPRE genera el Excel, incluso si no hay datos (solo con encabezados).
     
+    La lectura de JSONs y la escritura del Excel se ejecutan en un thread
+    para no bloquear el event loop.
+    
     Args:
         request_id: ID del procesamiento
         pdf_name: Nombre del PDF
@@ -75,27 +200,83 @@ async def generate_excel_for_request(
     Returns:
         Tupla (excel_filename, excel_download_url) o (None, None) solo si hay error crítico
     """
-    try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill, Alignment, NamedStyle
-        from openpyxl.utils import get_column_letter
+    excel_filename, excel_download_url, _ = await asyncio.to_thread(
+        _generate_excel_for_request_sync,
+        request_id,
+        pdf_name,
+        timestamp,
+        archive_manager,
+        file_manager
+    )
+    return excel_filename, excel_download_url
+
+
+def generate_excel_stream_for_request_sync(
+    request_id: str,
+    pdf_name: str,
+    timestamp: str,
+    archive_manager,
+    file_manager
+) -> tuple[Optional[str], Optional[io.BytesIO]]:
+    """
+    Genera el Excel consolidado de un request_id en memoria para descargarlo directamente.
+    
+    El Excel también se guarda en la carpeta pública (mismo nombre y URL que
+    generate_excel_for_request), pero el llamador puede responder con los bytes
+    ya generados sin volver a leer el archivo del disco. Es bloqueante: el
+    llamador debe ejecutarla en un thread.
+    
+    Args:
+        request_id: ID del procesamiento
+        pdf_name: Nombre del PDF
+        timestamp: Timestamp para el nombre del archivo
+        archive_manager: Instancia de ArchiveManager
+        file_manager: Instancia de FileManager
+        
+    Returns:
+        Tupla (excel_filename, buffer con el contenido del Excel) o (None, None) si hay error crítico
+    """
+    excel_filename, _, excel_buffer = _generate_excel_for_request_sync(
+        request_id,
+        pdf_name,
+        timestamp,
+        archive_manager,
+        file_manager,
+        True
+    )
+    return excel_filename, excel_buffer
+
+
+def _generate_excel_for_request_sync(
+    request_id: str,
+    pdf_name: str,
+    timestamp: str,
+    archive_manager,
+    file_manager,
+    stream: bool = False
+) -> tuple[Optional[str], Optional[str], Optional[io.BytesIO]]:
+    """
+    Implementación síncrona de generate_excel_for_request.
+    
+    Args:
+        request_id: ID del procesamiento
+        pdf_name: Nombre del PDF
+        timestamp: Timestamp para el nombre del archivo
+        archive_manager: Instancia de ArchiveManager
+        file_manager: Instancia de FileManager
+        stream: Si True, el Excel se genera en memoria y también se retorna el buffer
         
+    Returns:
+        Tupla (excel_filename, excel_download_url, buffer o None) o (None, None, None)
+        solo si hay error crítico
+    """
+    try:
         # Buscar todos los JSONs estructurados en la carpeta específica por request_id
         base_output = file_manager.get_output_folder() or "./output"
         # Carpeta específica por request_id: output/api/{request_id}/structured/ (truncado a 30 chars)
         request_id_folder = truncate_request_id_for_folder(request_id)
         structured_folder = Path(base_output) / "api" / request_id_folder / "structured"
         
-        # Crear workbook de Excel (siempre se crea)
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Datos Consolidados"
-        
-        # Estilos
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        
         # Diccionario para almacenar todas las tablas consolidadas
         all_tables = {}
         all_columns = set()
@@ -118,11 +299,17 @@ async def generate_excel_for_request(
         }
         
         # Buscar JSONs en la carpeta específica por request_id
+        # (os.scandir en lugar de glob: un solo recorrido del directorio, sin fnmatch ni stat extra)
         json_files = []
-        if structured_folder.exists():
-            # Buscar todos los JSONs estructurados en esta carpeta específica
-            all_json_files = sorted(structured_folder.glob("*_structured.json"))
-            json_files = all_json_files  # Todos los JSONs en esta carpeta pertenecen a este request_id
+        try:
+            with os.scandir(structured_folder) as entries:
+                # Todos los JSONs en esta carpeta pertenecen a este request_id
+                json_files = sorted(
+                    Path(entry.path) for entry in entries
+                    if entry.name.endswith("_structured.json") and entry.is_file()
+                )
+        except (FileNotFoundError, NotADirectoryError):
+            pass
         
         # Procesar cada JSON estructurado (si existen)
         for json_file in json_files:
@@ -139,8 +326,7 @@ async def generate_excel_for_request(
                     page_num = 0
                 
                 # Leer JSON
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    json_data = json.load(f)
+                json_data = load_structured_json(json_file)
                 
                 # Obtener metadata para extraer información del periodo
                 metadata = json_data.get("metadata", {})
@@ -271,61 +457,6 @@ async def generate_excel_for_request(
         currency_cols = [c for c in ["tDivisaOriginal"] if c in existing_extra_columns]
         column_order = ["hoja"] + period_info_cols + currency_cols + sorted_columns
         
-        # Escribir encabezados (siempre se escriben, aunque no haya datos)
-        row = 1
-        for col_idx, col_name in enumerate(column_order, start=1):
-            cell = ws.cell(row=row, column=col_idx, value=col_name)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
-        
-        # Columnas que deben tener formato numérico
-        numeric_columns = ["nPrecioTotal", "nPrecioUnitario"]
-        
-        # Escribir datos (si hay)
-        row = 2
-        for record in all_records:
-            if isinstance(record, dict):
-                for col_idx, col_name in enumerate(column_order, start=1):
-                    value = record.get(col_name, "")
-                    if value is None:
-                        value = ""
-                    
-                    cell = ws.cell(row=row, column=col_idx, value=value)
-                    
-                    # Aplicar formato numérico a columnas específicas
-                    if col_name in numeric_columns:
-                        # Intentar convertir a número si es posible
-                        if value != "":
-                            try:
-                                # Convertir a float si es string numérico
-                                if isinstance(value, str):
-                                    # Limpiar el string (remover espacios, comas, etc.)
-                                    cleaned_value = value.replace(",", "").replace(" ", "").strip()
-                                    if cleaned_value:
-                                        numeric_value = float(cleaned_value)
-                                        cell.value = numeric_value
-                                elif isinstance(value, (int, float)):
-                                    cell.value = float(value)
-                                
-                                # Aplicar formato numérico con 2 decimales
-                                cell.number_format = '#,##0.00'
-                            except (ValueError, TypeError):
-                                # Si no se puede convertir, dejar como está
-                                pass
-                row += 1
-        
-        # Ajustar ancho de columnas
-        for col_idx, col_name in enumerate(column_order, start=1):
-            max_length = len(str(col_name))
-            if row > 2:  # Solo si hay datos
-                for row_idx in range(2, row):
-                    cell_value = ws.cell(row=row_idx, column=col_idx).value
-                    if cell_value:
-                        max_length = max(max_length, len(str(cell_value)))
-            adjusted_width = min(max(max_length + 2, 10), 50)
-            ws.column_dimensions[get_column_letter(col_idx)].width = adjusted_width
-        
         # Guardar Excel en carpeta pública (SIEMPRE se guarda, aunque esté vacío)
         # Truncar nombre del Excel a máximo 50 caracteres para evitar rutas largas
         excel_filename_base = f"{pdf_name}_consolidado_{timestamp}_{request_id[:8]}.xlsx"
@@ -335,23 +466,41 @@ async def generate_excel_for_request(
         # Asegurar que la carpeta pública existe
         excel_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # Guardar el Excel
-        wb.save(excel_path)
+        # Crear workbook de Excel con xlsxwriter (siempre se crea)
+        # En modo stream el .xlsx se arma en un BytesIO que luego se guarda y se retorna;
+        # si no, se escribe al archivo con un buffer grande (menos write() pequeños del ZIP)
+        if stream:
+            excel_buffer = io.BytesIO()
+            _write_consolidated_workbook(excel_buffer, column_order, all_records)
+            with open(excel_path, 'wb') as f:
+                f.write(excel_buffer.getbuffer())
+            excel_buffer.seek(0)
+        else:
+            excel_buffer = None
+            with open(excel_path, 'wb', buffering=_EXCEL_WRITE_BUFFER_SIZE) as f:
+                _write_consolidated_workbook(f, column_order, all_records)
         
         # Verificar que se guardó correctamente
         if not excel_path.exists():
             logger.error(f"Excel no se guardó correctamente: {excel_path}")
-            return None, None
+            return None, None, None
         
         # Generar URL pública
         excel_download_url = archive_manager.get_public_url(excel_path)
         
+        # Registrar en el índice request_id -> Excel (no crítico si falla)
+        try:
+            from .dependencies import get_excel_index
+            get_excel_index().set_excel(request_id, excel_filename)
+        except Exception as e:
+            logger.warning(f"[{request_id}] No se pudo registrar el Excel en el índice: {e}")
+        
         logger.info(f"[{request_id}] Excel generado exitosamente: {excel_filename} ({len(all_records)} registros, {len(column_order)} columnas)")
         
-        return excel_filename, excel_download_url
+        return excel_filename, excel_download_url, excel_buffer
     except Exception as e:
         logger.error(f"Error generando Excel para request_id {request_id}: {e}")
         import traceback
         logger.debug(f"Traceback Excel: {traceback.format_exc()}")
-        return None, None
+        return None, None, None
 
@@ -0,0 +1,182 @@
+"""
+Excel Index - Índice persistente request_id -> Excel consolidado
+Responsabilidad: Registrar el Excel generado por cada request_id para evitar
+reconstruir el mapeo escaneando public/ y los JSONs estructurados en cada listado
+"""
+
+import os
+import sqlite3
+import logging
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ExcelIndex:
+    """
+    Índice SQLite de Excels consolidados por request_id.
+
+    Responsabilidades:
+    - Registrar el Excel generado para un request_id
+    - Retornar el mapeo completo request_id -> nombre de Excel
+    - Eliminar entradas cuyo Excel ya no existe en disco
+    - Marcar si ya se importaron los Excels existentes (bootstrap)
+    """
+
+    def __init__(self, db_path: str = "output/api/index.db"):
+        """
+        Inicializa el índice.
+
+        Args:
+            db_path: Ruta al archivo SQLite del índice
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = Lock()
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS request_excel ("
+            "request_id TEXT PRIMARY KEY, "
+            "excel_filename TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS index_meta ("
+            "key TEXT PRIMARY KEY, "
+            "value TEXT)"
+        )
+        self._conn.commit()
+
+    def set_excel(self, request_id: str, excel_filename: str):
+        """
+        Registra (o reemplaza) el Excel asociado a un request_id.
+
+        Args:
+            request_id: ID completo del request
+            excel_filename: Nombre del archivo Excel en public/
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO request_excel(request_id, excel_filename) VALUES (?, ?)",
+                (request_id, excel_filename)
+            )
+            self._conn.commit()
+
+    def set_many(self, mapping: Dict[str, str]):
+        """
+        Registra varios Excels en una sola transacción.
+
+        Args:
+            mapping: Diccionario request_id -> nombre de Excel
+        """
+        if not mapping:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO request_excel(request_id, excel_filename) VALUES (?, ?)",
+                mapping.items()
+            )
+            self._conn.commit()
+
+    def delete_many(self, request_ids: Iterable[str]):
+        """
+        Elimina del índice los Excels de varios request_id (p. ej. archivos borrados de public/).
+
+        Args:
+            request_ids: IDs completos de los requests
+        """
+        ids = [(request_id,) for request_id in dict.fromkeys(request_ids) if request_id]
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM request_excel WHERE request_id = ?", ids)
+            self._conn.commit()
+
+    def get_excel(self, request_id: str) -> Optional[str]:
+        """
+        Obtiene el nombre del Excel de un request_id.
+
+        Args:
+            request_id: ID completo del request
+
+        Returns:
+            Nombre del Excel o None si no está registrado
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT excel_filename FROM request_excel WHERE request_id = ?",
+                (request_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, request_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Obtiene los Excels de varios request_id en una sola consulta.
+
+        Args:
+            request_ids: IDs completos de los requests
+
+        Returns:
+            Diccionario request_id -> nombre de Excel (solo los registrados)
+        """
+        ids = list(dict.fromkeys(request_id for request_id in request_ids if request_id))
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT request_id, excel_filename FROM request_excel WHERE request_id IN ({placeholders})",
+                ids
+            ).fetchall()
+        return dict(rows)
+
+    def get_all(self) -> Dict[str, str]:
+        """
+        Obtiene el mapeo completo request_id -> nombre de Excel.
+
+        Returns:
+            Diccionario request_id -> nombre de Excel
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT request_id, excel_filename FROM request_excel"
+            ).fetchall()
+        return dict(rows)
+
+    def get_signature(self) -> Tuple[Optional[Tuple[int, int]], ...]:
+        """
+        Obtiene una firma de la base del índice (para validar respuestas cacheadas).
+
+        En modo WAL cada commit escribe en el archivo -wal (y los checkpoints en la
+        base), así que la firma cambia también con escrituras de otros procesos.
+
+        Returns:
+            Tupla con (mtime_ns, tamaño) de la base y del WAL (None si no existe)
+        """
+        signature = []
+        for path in (str(self.db_path), f"{self.db_path}-wal"):
+            try:
+                stat_result = os.stat(path)
+                signature.append((stat_result.st_mtime_ns, stat_result.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def is_bootstrapped(self) -> bool:
+        """Indica si ya se importaron los Excels existentes en disco."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM index_meta WHERE key = 'bootstrapped'"
+            ).fetchone()
+        return bool(row and row[0] == "1")
+
+    def mark_bootstrapped(self):
+        """Marca el índice como inicializado con los Excels existentes."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO index_meta(key, value) VALUES ('bootstrapped', '1')"
+            )
+            self._conn.commit()
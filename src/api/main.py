@@ -9,20 +9,31 @@ import time
 import uuid
 import tempfile
 import logging
+import queue
+import atexit
 import json
+import re
 import asyncio
 import secrets
+import io
 import hashlib
+import functools
+import heapq
+import operator
 import string
+import stat
 from pathlib import Path
-from typing import Optional, Dict, Any, AsyncGenerator, Tuple
-from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, AsyncGenerator, Tuple, Iterator
+from datetime import datetime, timedelta, date
 from threading import Lock
+from logging.handlers import QueueHandler, QueueListener
+from urllib.parse import quote
+import orjson
 from pydantic import BaseModel
 
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, status, Query, Header, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.exceptions import RequestValidationError
 from starlette.requests import Request as StarletteRequest
@@ -64,6 +75,7 @@ from .models import (
     PeriodoArchivoInfo,
     CreatePeriodoRequest,
     PeriodoResponse,
+    UpdatePeriodoRequest,
     PeriodosListResponse,
     PeriodoDetailResponse,
     PeriodoResumenPSResponse,
@@ -105,10 +117,13 @@ from .dependencies import (
     remove_email_from_allowed_list,
     get_learning_system,
     get_periodo_manager,
-    get_database_service
+    get_database_service,
+    get_excel_index,
+    get_structured_index
 )
+from .structured_index import load_structured_json
 from .processing_worker import get_worker_manager, ProcessingJob
-from .middleware import AuthMiddleware
+from .middleware import AuthMiddleware, CacheControlMiddleware
 
 # Configurar logging
 logging.basicConfig(
@@ -117,6 +132,49 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler que encola el record sin formatearlo.
+    
+    QueueHandler.prepare() formatea el mensaje y el traceback en el thread que loguea
+    (el event loop); como el listener vive en el mismo proceso, se puede pasar el
+    record tal cual y dejar todo el formateo al thread del QueueListener.
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _setup_queue_logging() -> Optional[QueueListener]:
+    """
+    Mueve los handlers del logger raíz detrás de una cola.
+    
+    Los endpoints solo encolan el record; el formateo (incluido el traceback de
+    logger.exception) y la escritura a consola los hace un thread QueueListener.
+    
+    Returns:
+        QueueListener iniciado, o None si no había handlers o ya estaba configurado
+    """
+    root_logger = logging.getLogger()
+    handlers = root_logger.handlers[:]
+    if not handlers or any(isinstance(handler, QueueHandler) for handler in handlers):
+        return None
+    
+    log_queue = queue.SimpleQueue()
+    for handler in handlers:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(_DeferredQueueHandler(log_queue))
+    
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # Vaciar la cola al terminar el proceso
+    atexit.register(listener.stop)
+    return listener
+
+
+_log_listener = _setup_queue_logging()
+
 # Suprimir warnings de archivos temporales en consola
 logging.getLogger(__name__).setLevel(logging.INFO)
 
@@ -140,6 +198,82 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+
+def _orjson_response(content: Dict[str, Any], status_code: int = status.HTTP_200_OK) -> Response:
+    """
+    Retorna un dict plano como JSON serializado con orjson.
+
+    Para endpoints sin response_model evita el jsonable_encoder de FastAPI y el
+    json.dumps de JSONResponse. El contenido debe ser serializable por orjson
+    (tipos básicos, datetime, etc.).
+
+    Args:
+        content: Diccionario a retornar
+        status_code: Código HTTP de la respuesta
+
+    Returns:
+        Response con media type application/json
+    """
+    return Response(
+        content=orjson.dumps(content),
+        status_code=status_code,
+        media_type="application/json"
+    )
+
+
+# Cuerpos JSON fijos de los endpoints de acuse (se serializan una sola vez)
+_SUCCESS_BODY = orjson.dumps({"success": True})
+_EDITING_ACTIVE_BODY = orjson.dumps({"success": True, "active": True})
+_EDITING_INACTIVE_BODY = orjson.dumps({"success": True, "active": False})
+# El mensaje se inserta ya serializado con orjson (escapa comillas en el ID)
+_PERIODO_DELETED_TEMPLATE = b'{"success":true,"message":%s}'
+
+
+def _json_bytes_response(body: bytes) -> Response:
+    """
+    Retorna un cuerpo JSON ya serializado.
+
+    Args:
+        body: JSON en bytes
+
+    Returns:
+        Response 200 con media type application/json
+    """
+    return Response(content=body, media_type="application/json")
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """
+    Indica si el ETag coincide con alguno del header If-None-Match del request.
+
+    Args:
+        request: Request de FastAPI
+        etag: ETag actual del recurso (entre comillas)
+
+    Returns:
+        True si el cliente ya tiene esta versión (se puede responder 304)
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def _signature_etag(*parts: Any) -> str:
+    """
+    Construye un ETag a partir de firmas de estado (mtime/tamaño, campos de un job) de los datos
+    de una respuesta. Es el único esquema de ETag de la API.
+
+    Args:
+        parts: Nombre del recurso, parámetros y firmas de los datos de los que depende
+
+    Returns:
+        ETag (entre comillas)
+    """
+    return f'"{hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()}"'
+
 # Exception handler para errores de validación de Pydantic
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: StarletteRequest, exc: RequestValidationError):
@@ -207,6 +341,10 @@ app.add_middleware(
 )
 
 
+# Cache-Control para las respuestas GET con ETag (revalidación en el navegador, sin caches compartidos)
+app.add_middleware(CacheControlMiddleware)
+
+
 # Middleware de autenticación (preparado pero desactivado)
 auth_middleware = AuthMiddleware()
 # app.middleware("http")(auth_middleware)  # Descomentar cuando se active auth
@@ -281,6 +419,30 @@ def truncate_request_id_for_folder(request_id: str, max_length: int = 30) -> str
     # Truncar y mantener los primeros caracteres (más importantes)
     return request_id[:max_length]
 
+def _scan_files(folder: Path, suffix: str, prefix: str = "") -> Iterator[os.DirEntry]:
+    """
+    Itera los archivos de una carpeta cuyo nombre empieza con prefix y termina con suffix.
+    
+    Usa os.scandir en lugar de Path.glob: evita la traducción fnmatch y la creación
+    de un Path por cada entrada. Si la carpeta no existe, no retorna nada.
+    
+    Args:
+        folder: Carpeta a recorrer
+        suffix: Sufijo del nombre (ej: "_structured.json")
+        prefix: Prefijo opcional del nombre (ej: "analysis_")
+        
+    Returns:
+        Iterador de os.DirEntry (usar entry.name / entry.path)
+    """
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.endswith(suffix) and name.startswith(prefix) and entry.is_file():
+                    yield entry
+    except (FileNotFoundError, NotADirectoryError):
+        return
+
 def generate_secure_password(length: int = 10) -> str:
     """
     Genera una contraseña aleatoria cumpliendo requisitos de complejidad.
@@ -316,13 +478,13 @@ async def enter_period_editing(periodo_id: str, body: PeriodEditingRequest):
 
         # Si ya hay alguien distinto editando, informar pero no reemplazar su lock
         if existing and existing.get("email") != body.email:
-            return {
+            return _orjson_response({
                 "success": True,
                 "already_in_use": True,
                 "editor_email": existing.get("email"),
                 "editor_nombre": existing.get("nombre"),
                 "since": existing.get("since"),
-            }
+            })
 
         # Registrar / actualizar lock para este usuario
         since = existing.get("since") if existing and existing.get("email") == body.email else now
@@ -333,13 +495,13 @@ async def enter_period_editing(periodo_id: str, body: PeriodEditingRequest):
             "last_seen": now,
         }
 
-    return {
+    return _orjson_response({
         "success": True,
         "already_in_use": False,
         "editor_email": body.email,
         "editor_nombre": body.nombre,
         "since": since,
-    }
+    })
 
 
 @app.post("/api/v1/periodos/{periodo_id}/editing/heartbeat", tags=["Periodos"])
@@ -355,9 +517,9 @@ async def heartbeat_period_editing(periodo_id: str, body: PeriodEditingRequest):
         existing = _period_edit_locks.get(periodo_id)
         if existing and existing.get("email") == body.email:
             existing["last_seen"] = now
-            return {"success": True, "active": True}
+            return _json_bytes_response(_EDITING_ACTIVE_BODY)
 
-    return {"success": True, "active": False}
+    return _json_bytes_response(_EDITING_INACTIVE_BODY)
 
 
 @app.post("/api/v1/periodos/{periodo_id}/editing/leave", tags=["Periodos"])
@@ -370,7 +532,7 @@ async def leave_period_editing(periodo_id: str, body: PeriodEditingRequest):
         if existing and existing.get("email") == body.email:
             _period_edit_locks.pop(periodo_id, None)
 
-    return {"success": True}
+    return _json_bytes_response(_SUCCESS_BODY)
 
 
 def generate_password_from_email(email: str) -> str:
@@ -626,8 +788,8 @@ def load_users_data() -> Dict[str, Any]:
     """Carga los datos de usuarios desde user_passwords.json."""
     passwords_file = get_user_passwords_file()
     try:
-        with open(passwords_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(passwords_file, 'rb') as f:
+            return orjson.loads(f.read())
     except Exception:
         return {"passwords": {}, "users": {}}
 
@@ -674,8 +836,8 @@ def load_maestros_data() -> Dict[str, Any]:
     """Carga los datos de maestros desde maestros_apartados.json."""
     maestros_file = get_maestros_file()
     try:
-        with open(maestros_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(maestros_file, 'rb') as f:
+            return orjson.loads(f.read())
     except Exception:
         return {"apartados": []}
 
@@ -802,6 +964,30 @@ def cleanup_expired_tokens():
         logger.info(f"Limpiados {expired_count} tokens expirados")
 
 
+# Mes (número o nombre en español/inglés, en minúsculas) -> nombre normalizado en español
+_MONTH_MAP: Dict[str, str] = {
+    '1': 'Enero', '2': 'Febrero', '3': 'Marzo', '4': 'Abril',
+    '5': 'Mayo', '6': 'Junio', '7': 'Julio', '8': 'Agosto',
+    '9': 'Septiembre', '10': 'Octubre', '11': 'Noviembre', '12': 'Diciembre',
+    'enero': 'Enero', 'january': 'Enero', 'jan': 'Enero',
+    'febrero': 'Febrero', 'february': 'Febrero', 'feb': 'Febrero',
+    'marzo': 'Marzo', 'march': 'Marzo', 'mar': 'Marzo',
+    'abril': 'Abril', 'april': 'Abril', 'apr': 'Abril',
+    'mayo': 'Mayo', 'may': 'Mayo',
+    'junio': 'Junio', 'june': 'Junio', 'jun': 'Junio',
+    'julio': 'Julio', 'july': 'Julio', 'jul': 'Julio',
+    'agosto': 'Agosto', 'august': 'Agosto', 'aug': 'Agosto',
+    'septiembre': 'Septiembre', 'september': 'Septiembre', 'sep': 'Septiembre',
+    'octubre': 'Octubre', 'october': 'Octubre', 'oct': 'Octubre',
+    'noviembre': 'Noviembre', 'november': 'Noviembre', 'nov': 'Noviembre',
+    'diciembre': 'Diciembre', 'december': 'Diciembre', 'dec': 'Diciembre'
+}
+
+
+# (email, year, month) de la metadata de un PDF subido (metadata["metadata"])
+_upload_email_year_month = operator.itemgetter("email", "year", "month")
+
+
 def _normalize_month(month: str) -> str:
     """
     Normaliza el mes a formato estándar.
@@ -812,35 +998,7 @@ def _normalize_month(month: str) -> str:
     Returns:
         Nombre del mes en español (normalizado)
     """
-    month_lower = month.lower().strip()
-    
-    # Si es número, convertir a nombre
-    month_map_int = {
-        '1': 'enero', '2': 'febrero', '3': 'marzo', '4': 'abril',
-        '5': 'mayo', '6': 'junio', '7': 'julio', '8': 'agosto',
-        '9': 'septiembre', '10': 'octubre', '11': 'noviembre', '12': 'diciembre'
-    }
-    
-    if month_lower in month_map_int:
-        return month_map_int[month_lower].capitalize()
-    
-    # Mapeo de meses en diferentes idiomas/formats
-    month_map = {
-        'enero': 'Enero', 'january': 'Enero', 'jan': 'Enero',
-        'febrero': 'Febrero', 'february': 'Febrero', 'feb': 'Febrero',
-        'marzo': 'Marzo', 'march': 'Marzo', 'mar': 'Marzo',
-        'abril': 'Abril', 'april': 'Abril', 'apr': 'Abril',
-        'mayo': 'Mayo', 'may': 'Mayo',
-        'junio': 'Junio', 'june': 'Junio', 'jun': 'Junio',
-        'julio': 'Julio', 'july': 'Julio', 'jul': 'Julio',
-        'agosto': 'Agosto', 'august': 'Agosto', 'aug': 'Agosto',
-        'septiembre': 'Septiembre', 'september': 'Septiembre', 'sep': 'Septiembre',
-        'octubre': 'Octubre', 'october': 'Octubre', 'oct': 'Octubre',
-        'noviembre': 'Noviembre', 'november': 'Noviembre', 'nov': 'Noviembre',
-        'diciembre': 'Diciembre', 'december': 'Diciembre', 'dec': 'Diciembre'
-    }
-    
-    return month_map.get(month_lower, month.capitalize())
+    return _MONTH_MAP.get(month.lower().strip(), month.capitalize())
 
 
 @app.get("/", tags=["General"])
@@ -860,7 +1018,8 @@ async def health_check():
     Health check endpoint.
     Verifica que la API esté funcionando correctamente.
     """
-    return HealthResponse(
+    # Valores fijos y un datetime ya tipado: no hace falta validarlos en cada sondeo
+    return HealthResponse.model_construct(
         status="healthy",
         version="1.0.0",
         timestamp=datetime.now()
@@ -1936,15 +2095,6 @@ async def upload_pdf(
     # Normalizar mes
     normalized_month = _normalize_month(month)
     
-    # Leer contenido del PDF
-    try:
-        pdf_content = await pdf_file.read()
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail={"error": f"Error leyendo archivo: {str(e)}"}
-        )
-    
     # Validar periodo_id si se proporciona
     if periodo_id:
         periodo_manager = get_periodo_manager()
@@ -1991,9 +2141,12 @@ async def upload_pdf(
         metadata["periodo_id"] = periodo_id
     
     try:
-        # Guardar PDF y metadata (operación síncrona que completa antes de continuar)
-        file_id = upload_manager.save_uploaded_pdf(
-            pdf_content,
+        # Guardar PDF y metadata (se completa antes de continuar). El PDF se copia
+        # por bloques desde el archivo temporal del UploadFile, sin cargarlo entero
+        # en memoria, y en un thread para no bloquear el event loop
+        file_id, file_size_bytes = await asyncio.to_thread(
+            upload_manager.save_uploaded_pdf_stream,
+            pdf_file.file,
             pdf_file.filename,
             metadata
         )
@@ -2017,8 +2170,8 @@ async def upload_pdf(
         
         # Verificar que el tamaño del archivo guardado coincide
         actual_file_size = pdf_path.stat().st_size
-        if actual_file_size != len(pdf_content):
-            logger.warning(f"Tamaño del archivo guardado ({actual_file_size}) no coincide con el esperado ({len(pdf_content)})")
+        if actual_file_size != file_size_bytes:
+            logger.warning(f"Tamaño del archivo guardado ({actual_file_size}) no coincide con el esperado ({file_size_bytes})")
         
         # Obtener timestamp de cuando se guardó realmente
         uploaded_at = datetime.now()
@@ -2048,7 +2201,7 @@ async def upload_pdf(
         filename=pdf_file.filename,
         uploaded_at=uploaded_at,
         metadata=metadata,
-        file_size_bytes=len(pdf_content)
+        file_size_bytes=file_size_bytes
     )
     
     # Convertir a dict y agregar campos adicionales que el frontend necesita
@@ -2149,6 +2302,26 @@ async def delete_uploaded_pdf(
     )
 
 
+def _count_pdf_pages(pdf_path: Path) -> int:
+    """
+    Cuenta las páginas de un PDF (bloqueante, para usar en threadpool).
+    
+    Args:
+        pdf_path: Ruta al PDF
+        
+    Returns:
+        Número de páginas, o 0 si el PDF no se pudo abrir
+    """
+    from src.core.pdf_processor import PDFProcessor
+    pdf_processor = PDFProcessor()
+    
+    total_pages = 0
+    if pdf_processor.open_pdf(str(pdf_path)):
+        total_pages = pdf_processor.get_page_count()
+        pdf_processor.close()
+    return total_pages
+
+
 @app.post("/api/v1/process-pdf", response_model=ProcessPDFResponse, tags=["Processing"])
 async def process_pdf(
     request: Request,
@@ -2201,9 +2374,7 @@ async def process_pdf(
     
     # Obtener datos del PDF subido
     pdf_filename = metadata["filename"]
-    email = metadata["metadata"]["email"]
-    year = metadata["metadata"]["year"]
-    normalized_month = metadata["metadata"]["month"]
+    email, year, normalized_month = _upload_email_year_month(metadata["metadata"])
     
     # Obtener periodo_id de metadata si no se proporcionó explícitamente
     # (puede haber sido especificado en upload-pdf)
@@ -2220,15 +2391,10 @@ async def process_pdf(
         logger.info(f"[{request_id}] Periodo asociado: {periodo_id_to_use}")
     
     # Contar páginas del PDF para determinar si necesita procesamiento por lotes
+    # (abrir el PDF es bloqueante: se hace en el threadpool)
     from .dependencies import get_file_manager
     file_manager = get_file_manager()
-    from src.core.pdf_processor import PDFProcessor
-    pdf_processor = PDFProcessor()
-    
-    total_pages = 0
-    if pdf_processor.open_pdf(str(pdf_path)):
-        total_pages = pdf_processor.get_page_count()
-        pdf_processor.close()
+    total_pages = await asyncio.to_thread(_count_pdf_pages, pdf_path)
     
     logger.info(f"[{request_id}] PDF tiene {total_pages} páginas")
     
@@ -2393,9 +2559,7 @@ async def process_batch(request: BatchProcessRequest):
             
             # Obtener datos del PDF subido
             pdf_filename = metadata["filename"]
-            email = metadata["metadata"]["email"]
-            year = metadata["metadata"]["year"]
-            normalized_month = metadata["metadata"]["month"]
+            email, year, normalized_month = _upload_email_year_month(metadata["metadata"])
             
             # Usar file_id como request_id
             request_id = file_id
@@ -2460,15 +2624,20 @@ async def process_batch(request: BatchProcessRequest):
 
 
 @app.get("/api/v1/process-status/{request_id}", response_model=ProcessStatusResponse, tags=["Processing"])
-async def get_process_status(request_id: str):
+async def get_process_status(request_id: str, request: Request):
     """
     Consulta el estado de un procesamiento de PDF.
     
+    La respuesta lleva un ETag derivado del estado del job: los clientes que hacen
+    polling pueden enviar If-None-Match y reciben 304 sin cuerpo mientras el job
+    no cambie.
+    
     Args:
         request_id: ID del request de procesamiento (obtenido de POST /api/v1/process-pdf)
+        request: Request de FastAPI (para leer If-None-Match)
         
     Returns:
-        ProcessStatusResponse con estado actual del procesamiento
+        ProcessStatusResponse con estado actual del procesamiento (o 304 si no cambió)
     """
     worker_manager = get_worker_manager()
     job = worker_manager.get_job_status(request_id)
@@ -2479,7 +2648,15 @@ async def get_process_status(request_id: str):
             detail={"error": f"Request ID '{request_id}' no encontrado. Verifica que el ID sea correcto."}
         )
     
-    return ProcessStatusResponse(
+    # ETag de todos los campos que se retornan (cambia con cualquier avance del job)
+    etag = _signature_etag(
+        "process-status", job.request_id, job.status, job.progress, job.message, job.pages_processed,
+        job.processing_time, job.download_url, job.excel_download_url, job.error
+    )
+    if _etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    response = _model_json_response(ProcessStatusResponse(
         success=True,
         request_id=job.request_id,
         status=job.status,
@@ -2490,7 +2667,9 @@ async def get_process_status(request_id: str):
         download_url=job.download_url,
         excel_download_url=job.excel_download_url,
         error=job.error
-    )
+    ))
+    response.headers["ETag"] = etag
+    return response
 
 
 async def _stream_job_status(request_id: str) -> AsyncGenerator[str, None]:
@@ -2664,20 +2843,16 @@ def _get_archivo_info_from_json(request_id: str) -> Optional[Dict[str, Any]]:
         # Buscar en la carpeta específica por request_id
         structured_folder = Path(base_output) / "api" / request_id_folder / "structured"
         
-        if not structured_folder.exists():
-            return None
-        
-        # Buscar JSONs estructurados en esta carpeta específica
+        # Buscar JSONs estructurados en esta carpeta específica (si no existe, no hay JSONs)
         # Todos los JSONs en esta carpeta pertenecen a este request_id (o sus batches)
-        json_files = list(structured_folder.glob("*_structured.json"))
+        json_files = list(_scan_files(structured_folder, "_structured.json"))
         if not json_files:
             return None
         
         # Usar el primer JSON encontrado (todos tienen la misma metadata)
         json_file = json_files[0]
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
+            json_data = load_structured_json(json_file.path)
             
             metadata = json_data.get("metadata", {})
             # Verificar que el request_id coincide (puede ser el maestro o un batch)
@@ -3240,9 +3415,7 @@ async def process_all_periodo_files(
                 
                 # Obtener datos del PDF subido
                 pdf_filename = metadata["filename"]
-                email = metadata["metadata"]["email"]
-                year = metadata["metadata"]["year"]
-                normalized_month = metadata["metadata"]["month"]
+                email, year, normalized_month = _upload_email_year_month(metadata["metadata"])
                 
                 # Usar file_id como request_id
                 request_id = file_id
@@ -3556,21 +3729,38 @@ async def stream_periodo_status(
 
 
 @app.get("/api/v1/uploaded-files", response_model=UploadedFilesResponse, tags=["Files"])
-async def get_uploaded_files():
+async def get_uploaded_files(request: Request):
     """
     Obtiene lista de archivos subidos (pendientes y procesados).
     Solo muestra archivos de correos autorizados.
     
+    La respuesta lleva un ETag derivado del estado de la carpeta de metadata; con
+    If-None-Match se responde 304 sin leer los JSONs si nada cambió.
+    
+    Args:
+        request: Request de FastAPI (para leer If-None-Match)
+    
     Returns:
         Lista de archivos subidos (pendientes y procesados, solo correos autorizados)
     """
     upload_manager = get_upload_manager()
+    
+    # La firma se calcula antes de listar: si algo cambia mientras tanto, el ETag
+    # enviado queda desactualizado y el siguiente request recibe el listado nuevo
+    etag = _signature_etag(
+        "uploaded-files", await asyncio.to_thread(upload_manager.get_metadata_signature)
+    )
+    if _etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
     # Mostrar tanto pendientes como procesados
-    files = upload_manager.list_uploaded_files(processed=None)
+    # La lectura de metadata es bloqueante: se hace en el threadpool
+    files = await asyncio.to_thread(upload_manager.list_uploaded_files, processed=None)
     
     # Filtrar solo archivos de correos autorizados
+    # (model_construct: la metadata la escribe el propio UploadManager, no se re-valida)
     file_info_list = [
-        UploadedFileInfo(
+        UploadedFileInfo.model_construct(
             file_id=f["file_id"],
             filename=f["filename"],
             uploaded_at=f["uploaded_at"],
@@ -3581,82 +3771,217 @@ async def get_uploaded_files():
         for f in files
     ]
     
-    return UploadedFilesResponse(
+    # Serializar una sola vez con el core de Pydantic (sin re-validar contra el response_model)
+    response = _model_json_response(UploadedFilesResponse(
         success=True,
         total=len(file_info_list),
         files=file_info_list
-    )
+    ))
+    response.headers["ETag"] = etag
+    return response
 
 
-@app.get("/api/v1/process-status/{request_id}", response_model=ProcessStatusResponse, tags=["Processing"])
-async def get_process_status(request_id: str):
+# Nombre de Excel consolidado: {pdf_name}_consolidado_{YYYYmmdd_HHMMSS}_{request_id[:8]}
+# Captura el request_id[:8] (último segmento antes de la extensión)
+_EXCEL_CONSOLIDADO_RE = re.compile(r"_consolidado_[\d_]+_([0-9a-f]{8})$")
+
+
+# metadata.request_id al inicio de un JSON estructurado: "metadata" es la primera clave
+# y request_id una clave directa suya (sin objetos anidados antes)
+_STRUCTURED_HEAD_REQUEST_ID_RE = re.compile(
+    rb'\A\s*\{\s*"metadata"\s*:\s*\{[^{}]*?"request_id"\s*:\s*"([^"\\]*)"'
+)
+# Bytes que se leen del inicio del JSON para buscar el request_id sin parsearlo completo
+_STRUCTURED_HEAD_SIZE = 4096
+
+
+def _read_structured_request_id(json_path: str) -> str:
     """
-    Consulta el estado de un procesamiento de PDF.
+    Lee el metadata.request_id de un JSON estructurado (bloqueante, para usar en threadpool).
+    
+    Primero busca el request_id en los primeros bytes del archivo (la metadata va al
+    inicio); solo si no aparece ahí se parsea el JSON completo.
     
     Args:
-        request_id: ID del request de procesamiento (obtenido de POST /api/v1/process-pdf)
+        json_path: Ruta al JSON estructurado
         
     Returns:
-        ProcessStatusResponse con estado actual del procesamiento
+        request_id del JSON o cadena vacía si no se pudo leer
     """
-    worker_manager = get_worker_manager()
-    job = worker_manager.get_job_status(request_id)
+    try:
+        with open(json_path, "rb") as f:
+            head = f.read(_STRUCTURED_HEAD_SIZE)
+        match = _STRUCTURED_HEAD_REQUEST_ID_RE.match(head)
+        if match:
+            return match.group(1).decode("utf-8")
+    except (OSError, UnicodeDecodeError):
+        pass
     
-    if not job:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={"error": f"Request ID '{request_id}' no encontrado. Verifica que el ID sea correcto."}
+    try:
+        json_data = load_structured_json(json_path)
+        return json_data.get("metadata", {}).get("request_id", "")
+    except Exception:
+        return ""
+
+
+async def _scan_excel_request_map(public_folder: Path) -> Dict[str, str]:
+    """
+    Reconstruye el mapa request_id -> Excel consolidado escaneando la carpeta pública
+    y los JSONs estructurados. Se usa solo para inicializar el índice de Excels
+    (archivos generados antes de que existiera el índice).
+    
+    Los JSONs estructurados se leen una sola vez y en paralelo en el threadpool,
+    sin bloquear el event loop.
+    
+    Args:
+        public_folder: Carpeta pública donde se guardan los Excels
+        
+    Returns:
+        Diccionario request_id -> nombre_archivo_excel
+    """
+    excel_files = {}  # Mapa: request_id -> nombre_archivo_excel
+    
+    # Buscar todos los Excel consolidados y extraer request_id[:8] del nombre
+    # Formato: {pdf_name}_consolidado_{timestamp}_{request_id[:8]}.xlsx
+    prefix_to_excel = {}  # Mapa: request_id[:8] -> nombre_archivo_excel
+    for excel_file in _scan_files(public_folder, ".xlsx"):
+        excel_name = excel_file.name[:-len(".xlsx")]  # Sin extensión
+        excel_match = _EXCEL_CONSOLIDADO_RE.search(excel_name)
+        if excel_match:
+            prefix_to_excel[excel_match.group(1)] = excel_file.name
+    
+    if not prefix_to_excel:
+        return excel_files
+    
+    # Buscar en los JSONs estructurados para encontrar el request_id completo
+    try:
+        file_manager = get_file_manager()
+        base_output = file_manager.get_output_folder() or "./output"
+        api_folder = Path(base_output) / "api"
+        
+        json_paths = []
+        if api_folder.exists():
+            # Buscar en todas las carpetas api/{request_id}/structured/
+            with os.scandir(api_folder) as request_folders:
+                for request_folder in request_folders:
+                    if request_folder.is_dir():
+                        structured_folder = os.path.join(request_folder.path, "structured")
+                        json_paths.extend(
+                            json_file.path for json_file in _scan_files(structured_folder, "_structured.json")
+                        )
+        
+        json_request_ids = await asyncio.gather(
+            *(asyncio.to_thread(_read_structured_request_id, json_path) for json_path in json_paths)
         )
+        
+        # Una sola pasada: cada request_id se resuelve con un lookup por su prefijo
+        for json_request_id in json_request_ids:
+            excel_filename = prefix_to_excel.get(json_request_id[:8]) if json_request_id else None
+            if excel_filename:
+                # Encontramos el request_id completo
+                excel_files[json_request_id] = excel_filename
+    except Exception:
+        pass
     
-    return ProcessStatusResponse(
-            success=True,
-        request_id=job.request_id,
-        status=job.status,
-        progress=job.progress,
-        message=job.message,
-        pages_processed=job.pages_processed,
-        processing_time=job.processing_time,
-        download_url=job.download_url,
-        excel_download_url=job.excel_download_url,
-        error=job.error
-    )
+    return excel_files
 
 
-@app.get("/api/v1/uploaded-files", response_model=UploadedFilesResponse, tags=["Files"])
-async def get_uploaded_files():
+def _build_processed_file_info(f: Dict[str, Any], excel_files: Dict[str, str], direct: bool) -> UploadedFileInfo:
     """
-    Obtiene lista de archivos subidos (pendientes y procesados).
-    Solo muestra archivos de correos autorizados.
+    Construye el UploadedFileInfo de un archivo procesado.
     
+    Args:
+        f: Metadata del archivo (de upload_manager o de processed_tracker)
+        excel_files: Mapa request_id -> nombre_archivo_excel
+        direct: True si el archivo fue procesado directamente (sin upload previo)
+        
     Returns:
-        Lista de archivos subidos (pendientes y procesados, solo correos autorizados)
+        UploadedFileInfo con download_url y excel_download_url
     """
-    upload_manager = get_upload_manager()
-    # Mostrar tanto pendientes como procesados
-    files = upload_manager.list_uploaded_files(processed=None)
+    request_id = f.get("request_id")
+    # Buscar Excel por request_id en el mapa
+    if request_id and request_id in excel_files:
+        excel_url = f"/public/{excel_files[request_id]}"
+    # Si no se encontró en el mapa, intentar leer de la metadata
+    else:
+        excel_url = f.get("excel_download_url")
     
-    # Filtrar solo archivos de correos autorizados
-    file_info_list = [
-        UploadedFileInfo(
-            file_id=f["file_id"],
-            filename=f["filename"],
-            uploaded_at=f["uploaded_at"],
-            file_size_bytes=f["file_size_bytes"],
-            metadata=f["metadata"],
-            processed=f.get("processed", False)
-        )
-        for f in files
+    if direct:
+        file_id = f.get("request_id", "unknown")  # Usar request_id como file_id
+        uploaded_at = f.get("processed_at", "")  # Usar processed_at como uploaded_at
+        file_size_bytes = 0  # No tenemos info de tamaño
+    else:
+        file_id = f["file_id"]
+        uploaded_at = f["uploaded_at"]
+        file_size_bytes = f["file_size_bytes"]
+    
+    # model_construct: la metadata viene del UploadManager/ProcessedTracker, no se re-valida
+    return UploadedFileInfo.model_construct(
+        file_id=file_id,
+        filename=f["filename"],
+        uploaded_at=uploaded_at,
+        file_size_bytes=file_size_bytes,
+        metadata=f["metadata"],
+        processed=True,
+        processed_at=f.get("processed_at"),
+        download_url=f.get("download_url"),
+        request_id=request_id,
+        excel_download_url=excel_url
+    )
+
+
+def _get_existing_excels(excel_index, public_folder: Path, request_ids: List[Optional[str]]) -> Dict[str, str]:
+    """
+    Obtiene del índice los Excels de los request_id dados, descartando los que ya no existen en disco
+    (bloqueante, para usar en threadpool).
+    
+    Las entradas obsoletas se eliminan del índice, con lo que también cambia su firma (y el ETag).
+    
+    Args:
+        excel_index: Índice persistente de Excels
+        public_folder: Carpeta public/ donde están los Excels
+        request_ids: IDs completos de los requests a consultar
+        
+    Returns:
+        Diccionario request_id -> nombre de Excel (solo los que existen)
+    """
+    excel_files = excel_index.get_many(request_ids)
+    missing = [
+        request_id for request_id, excel_filename in excel_files.items()
+        if not (public_folder / excel_filename).is_file()
     ]
+    if missing:
+        logger.info(f"Eliminando {len(missing)} Excel(s) inexistentes del índice")
+        excel_index.delete_many(missing)
+        for request_id in missing:
+            del excel_files[request_id]
+    return excel_files
+
+
+def _processed_files_signature(upload_manager, processed_tracker) -> Tuple[Any, ...]:
+    """
+    Obtiene la firma de los datos de /processed-files (bloqueante, para usar en threadpool).
     
-    return UploadedFilesResponse(
-        success=True,
-        total=len(file_info_list),
-        files=file_info_list
+    Args:
+        upload_manager: Gestor de PDFs subidos
+        processed_tracker: Tracker de archivos procesados directamente
+        
+    Returns:
+        Tupla con las firmas de la metadata de uploads, del tracking y del índice de Excels
+    """
+    try:
+        excel_signature = get_excel_index().get_signature()
+    except Exception:
+        excel_signature = None
+    return (
+        upload_manager.get_metadata_signature(),
+        processed_tracker.get_signature(),
+        excel_signature
     )
 
 
 @app.get("/api/v1/processed-files", response_model=ProcessedFilesResponse, tags=["Files"])
-async def get_processed_files(limit: int = 10):
+async def get_processed_files(request: Request, limit: int = 10):
     """
     Obtiene lista de archivos que han sido procesados con sus enlaces de descarga.
     Solo muestra archivos de correos autorizados.
@@ -3665,7 +3990,11 @@ async def get_processed_files(limit: int = 10):
     - Archivos procesados desde upload-pdf (con file_id)
     - Archivos procesados directamente (sin file_id)
     
+    La respuesta lleva un ETag derivado del estado de la metadata, del tracking y del
+    índice de Excels; con If-None-Match se responde 304 sin leer los JSONs si nada cambió.
+    
     Args:
+        request: Request de FastAPI (para leer If-None-Match)
         limit: Número máximo de archivos a retornar (default: 10, los más recientes)
     
     Returns:
@@ -3675,122 +4004,59 @@ async def get_processed_files(limit: int = 10):
     processed_tracker = get_processed_tracker()
     archive_manager = get_archive_manager()
     
-    # Archivos procesados desde upload-pdf
-    uploaded_files = upload_manager.list_uploaded_files(processed=True)
-    
-    # Archivos procesados directamente (sin upload previo)
-    direct_files = processed_tracker.get_processed_files()
+    # La firma se calcula antes de listar (ver get_uploaded_files)
+    etag = _signature_etag(
+        "processed-files", limit,
+        await asyncio.to_thread(_processed_files_signature, upload_manager, processed_tracker)
+    )
+    if _etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    # Archivos procesados desde upload-pdf y directamente (sin upload previo).
+    # Sin ordenar: abajo se seleccionan los N más recientes de ambas listas a la vez.
+    # La lectura de metadata es bloqueante: se hace en el threadpool, ambas en paralelo
+    uploaded_files, direct_files = await asyncio.gather(
+        asyncio.to_thread(upload_manager.list_uploaded_files, processed=True, order_by=None),
+        asyncio.to_thread(processed_tracker.get_processed_files, ordered=False)
+    )
     
-    # Buscar archivos Excel en la carpeta pública y mapearlos por request_id
-    public_folder = archive_manager.public_folder
-    excel_files = {}  # Mapa: request_id -> nombre_archivo_excel
-    if public_folder.exists():
-        # Buscar todos los archivos Excel
-        for excel_file in public_folder.glob("*.xlsx"):
-            # Formato: {pdf_name}_consolidado_{timestamp}_{request_id[:8]}.xlsx
-            # Extraer request_id del nombre del archivo
-            excel_name = excel_file.stem  # Sin extensión
-            if "_consolidado_" in excel_name:
-                # El formato es: ..._consolidado_{timestamp}_{request_id[:8]}
-                # Extraer el request_id[:8] (último segmento antes de .xlsx)
-                parts = excel_name.split("_")
-                if len(parts) >= 2:
-                    request_id_prefix = parts[-1]  # Último segmento es request_id[:8]
-                    
-                    # Buscar en los JSONs estructurados para encontrar el request_id completo
-                    try:
-                        file_manager = get_file_manager()
-                        base_output = file_manager.get_output_folder() or "./output"
-                        api_folder = Path(base_output) / "api"
-                        
-                        if api_folder.exists() and request_id_prefix:
-                            # Buscar en todas las carpetas api/{request_id}/structured/
-                            for request_folder in api_folder.iterdir():
-                                if request_folder.is_dir():
-                                    structured_folder = request_folder / "structured"
-                                    if structured_folder.exists():
-                                        # Buscar JSONs en esta carpeta específica
-                                        for json_file in structured_folder.glob("*_structured.json"):
-                                            try:
-                                                with open(json_file, 'r', encoding='utf-8') as jf:
-                                                    json_data = json.load(jf)
-                                                metadata = json_data.get("metadata", {})
-                                                json_request_id = metadata.get("request_id", "")
-                                                if json_request_id and json_request_id[:8] == request_id_prefix:
-                                                    # Encontramos el request_id completo
-                                                    excel_files[json_request_id] = excel_file.name
-                                                    break
-                                            except Exception:
-                                                continue
-                    except Exception:
-                        pass
+    # Archivos de upload-pdf y archivos procesados directamente: (metadata, direct)
+    candidates = [(f, False) for f in uploaded_files] + [(f, True) for f in direct_files]
+    total_files = len(candidates)  # Total real (antes de limitar)
     
-    file_info_list = []
-    
-    # Agregar archivos de upload-pdf
-    for f in uploaded_files:
-        request_id = f.get("request_id")
-        excel_url = None
-        # Buscar Excel por request_id en el mapa
-        if request_id and request_id in excel_files:
-            excel_url = f"/public/{excel_files[request_id]}"
-        # Si no se encontró en el mapa, intentar leer de la metadata
-        elif not excel_url:
-            excel_url = f.get("excel_download_url")
-        
-        file_info_list.append(
-            UploadedFileInfo(
-                file_id=f["file_id"],
-                filename=f["filename"],
-                uploaded_at=f["uploaded_at"],
-                file_size_bytes=f["file_size_bytes"],
-                metadata=f["metadata"],
-                processed=True,
-                processed_at=f.get("processed_at"),
-                download_url=f.get("download_url"),
-                request_id=request_id,
-                excel_download_url=excel_url
-            )
-        )
+    # Seleccionar los N más recientes por fecha de procesamiento (sin ordenar la lista completa)
+    # y construir UploadedFileInfo solo para esos
+    top_candidates = heapq.nlargest(limit, candidates, key=lambda c: c[0].get("processed_at") or "")
     
-    # Agregar archivos procesados directamente
-    for f in direct_files:
-        request_id = f.get("request_id")
-        excel_url = None
-        # Buscar Excel por request_id en el mapa
-        if request_id and request_id in excel_files:
-            excel_url = f"/public/{excel_files[request_id]}"
-        # Si no se encontró en el mapa, intentar leer de la metadata
-        elif not excel_url:
-            excel_url = f.get("excel_download_url")
-        
-        file_info_list.append(
-            UploadedFileInfo(
-                file_id=f.get("request_id", "unknown"),  # Usar request_id como file_id
-                filename=f["filename"],
-                uploaded_at=f.get("processed_at", ""),  # Usar processed_at como uploaded_at
-                file_size_bytes=0,  # No tenemos info de tamaño
-                metadata=f["metadata"],
-                processed=True,
-                processed_at=f.get("processed_at"),
-                download_url=f.get("download_url"),
-                request_id=request_id,
-                excel_download_url=excel_url
-            )
+    # Mapa request_id -> Excel desde el índice persistente, solo para los archivos a retornar
+    # (la primera vez se importan los Excels existentes escaneando disco)
+    # Las consultas y commits de SQLite son bloqueantes: se hacen en el threadpool
+    try:
+        excel_index = get_excel_index()
+        if not await asyncio.to_thread(excel_index.is_bootstrapped):
+            excel_map = await _scan_excel_request_map(archive_manager.public_folder)
+            await asyncio.to_thread(excel_index.set_many, excel_map)
+            await asyncio.to_thread(excel_index.mark_bootstrapped)
+        excel_files = await asyncio.to_thread(
+            _get_existing_excels, excel_index, archive_manager.public_folder,
+            [f.get("request_id") for f, _ in top_candidates]
         )
+    except Exception as e:
+        logger.warning(f"Índice de Excels no disponible, escaneando disco: {e}")
+        excel_files = await _scan_excel_request_map(archive_manager.public_folder)
     
-    # Ordenar por fecha de procesamiento (más reciente primero)
-    file_info_list.sort(key=lambda x: x.processed_at or "", reverse=True)
-    
-    # Limitar a los N más recientes
-    total_files = len(file_info_list)
-    file_info_list = file_info_list[:limit]
+    file_info_list = [
+        _build_processed_file_info(f, excel_files, direct=direct) for f, direct in top_candidates
+    ]
     
-    return ProcessedFilesResponse(
+    # Serializar una sola vez con el core de Pydantic (sin re-validar contra el response_model)
+    response = _model_json_response(ProcessedFilesResponse(
         success=True,
-        total=total_files,  # Total real (antes de limitar)
-        files=file_info_list  # Lista limitada
-    )
+        total=total_files,
+        files=file_info_list
+    ))
+    response.headers["ETag"] = etag
+    return response
 
 
 # ===== Learning System Endpoints =====
@@ -3817,8 +4083,9 @@ async def get_learning_errors(limit: int = 100):
     try:
         errors = error_tracker.get_recent_errors(limit=limit)
         
+        # model_construct: los errores los registra el propio ErrorTracker, no se re-validan
         error_list = [
-            ErrorInfo(
+            ErrorInfo.model_construct(
                 error_id=err.get("error_id", ""),
                 timestamp=err.get("timestamp", ""),
                 pdf_name=err.get("pdf_name", ""),
@@ -3831,11 +4098,11 @@ async def get_learning_errors(limit: int = 100):
             for err in errors
         ]
         
-        return ErrorsResponse(
+        return _model_json_response(ErrorsResponse(
             success=True,
             total=len(error_list),
             errors=error_list
-        )
+        ))
     
     except Exception as e:
         logger.exception(f"Error obteniendo errores: {e}")
@@ -3864,8 +4131,9 @@ async def get_learning_errors_summary():
     try:
         summary = error_tracker.get_errors_summary()
         
+        # model_construct: los errores los registra el propio ErrorTracker, no se re-validan
         error_list = [
-            ErrorInfo(
+            ErrorInfo.model_construct(
                 error_id=err.get("error_id", ""),
                 timestamp=err.get("timestamp", ""),
                 pdf_name=err.get("pdf_name", ""),
@@ -3976,7 +4244,8 @@ async def get_learning_prompts(history_limit: int = 10):
         current_version_info = prompt_manager.get_current_version_info()
         history = prompt_manager.get_history(limit=history_limit)
         
-        current_version = PromptVersionInfo(
+        # model_construct: los datos vienen del historial que escribe el PromptManager
+        current_version = PromptVersionInfo.model_construct(
             version=current_version_info.get("version", 1),
             created_at=current_version_info.get("created_at", ""),
             description=current_version_info.get("description", ""),
@@ -3985,7 +4254,7 @@ async def get_learning_prompts(history_limit: int = 10):
         )
         
         history_list = [
-            PromptVersionInfo(
+            PromptVersionInfo.model_construct(
                 version=h.get("version", 1),
                 created_at=h.get("created_at", ""),
                 description=h.get("description", ""),
@@ -3995,11 +4264,11 @@ async def get_learning_prompts(history_limit: int = 10):
             for h in history
         ]
         
-        return PromptsResponse(
+        return _model_json_response(PromptsResponse(
             success=True,
             current_version=current_version,
             history=history_list
-        )
+        ))
     
     except Exception as e:
         logger.exception(f"Error obteniendo prompts: {e}")
@@ -4058,13 +4327,37 @@ async def apply_new_prompt(
         )
 
 
-@app.get("/api/v1/learning/suggestions", tags=["Learning"])
-async def get_learning_suggestions():
+@functools.lru_cache(maxsize=512)
+def _load_suggestion_summary(path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
     """
-    Obtiene sugerencias de mejora generadas por el sistema.
+    Lee un archivo de sugerencias (analysis_*.json) y extrae su resumen.
     
+    Se cachea por (ruta, mtime, tamaño): los análisis no cambian una vez escritos,
+    y si el archivo se reescribe cambia la clave y se vuelve a leer.
+    
+    Args:
+        path: Ruta al archivo de sugerencias
+        mtime_ns: mtime del archivo (parte de la clave del cache)
+        size: Tamaño del archivo (parte de la clave del cache)
+        
     Returns:
-        Lista de archivos de sugerencias disponibles
+        Diccionario con analyzed_at, errors_analyzed y analysis
+    """
+    suggestion_data = load_structured_json(path)
+    return {
+        "analyzed_at": suggestion_data.get("analyzed_at", ""),
+        "errors_analyzed": suggestion_data.get("errors_analyzed", 0),
+        "analysis": suggestion_data.get("analysis", {})
+    }
+
+
+@app.get("/api/v1/learning/suggestions", tags=["Learning"])
+async def get_learning_suggestions():
+    """
+    Obtiene sugerencias de mejora generadas por el sistema.
+    
+    Returns:
+        Lista de archivos de sugerencias disponibles
     """
     _, _, learning_service = get_learning_system()
     
@@ -4084,20 +4377,18 @@ async def get_learning_suggestions():
                 "suggestions": []
             }
         
-        suggestion_files = sorted(suggestions_folder.glob("analysis_*.json"), reverse=True)
+        suggestion_files = sorted(
+            _scan_files(suggestions_folder, ".json", prefix="analysis_"),
+            key=lambda entry: entry.name,
+            reverse=True
+        )
         
         suggestions_list = []
         for sf in suggestion_files[:10]:  # Últimas 10 sugerencias
             try:
-                import json
-                with open(sf, 'r', encoding='utf-8') as f:
-                    suggestion_data = json.load(f)
-                    suggestions_list.append({
-                        "file": sf.name,
-                        "analyzed_at": suggestion_data.get("analyzed_at", ""),
-                        "errors_analyzed": suggestion_data.get("errors_analyzed", 0),
-                        "analysis": suggestion_data.get("analysis", {})
-                    })
+                sf_stat = sf.stat()
+                summary = _load_suggestion_summary(sf.path, sf_stat.st_mtime_ns, sf_stat.st_size)
+                suggestions_list.append({"file": sf.name, **summary})
             except Exception:
                 continue
         
@@ -4116,7 +4407,23 @@ async def get_learning_suggestions():
 
 
 # Función movida a excel_generator.py para evitar problemas de imports
-from .excel_generator import generate_excel_for_request as _generate_excel_for_request
+from .excel_generator import generate_excel_stream_for_request_sync as _generate_excel_stream_for_request_sync
+
+
+def _attachment_content_disposition(filename: str) -> str:
+    """
+    Construye el header Content-Disposition para descargar un archivo.
+    
+    Args:
+        filename: Nombre del archivo (puede tener caracteres no ASCII, p. ej. "Página")
+        
+    Returns:
+        Valor del header (con filename* codificado en UTF-8 si hace falta)
+    """
+    quoted_filename = quote(filename)
+    if quoted_filename != filename:
+        return f"attachment; filename*=utf-8''{quoted_filename}"
+    return f'attachment; filename="{filename}"'
 
 
 @app.get("/api/v1/export-zip/{request_id}", tags=["Export"])
@@ -4149,21 +4456,17 @@ async def export_zip(
     email_found = None
     
     # Buscar en archivos procesados desde upload-pdf
-    uploaded_files = upload_manager.list_uploaded_files(processed=True)
-    for f in uploaded_files:
-        if f.get("request_id") == request_id:
-            zip_filename = f.get("zip_filename")
-            email_found = f.get("metadata", {}).get("email", "")
-            break
+    f = upload_manager.get_by_request_id(request_id)
+    if f:
+        zip_filename = f.get("zip_filename")
+        email_found = f.get("metadata", {}).get("email", "")
     
     # Si no se encontró, buscar en archivos procesados directamente
     if not zip_filename:
-        direct_files = processed_tracker.get_processed_files()
-        for f in direct_files:
-            if f.get("request_id") == request_id:
-                zip_filename = f.get("zip_filename")
-                email_found = f.get("metadata", {}).get("email", "")
-                break
+        f = processed_tracker.get_by_request_id(request_id)
+        if f:
+            zip_filename = f.get("zip_filename")
+            email_found = f.get("metadata", {}).get("email", "")
     
     # Si no se encontró el zip_filename
     if not zip_filename:
@@ -4184,6 +4487,43 @@ async def export_zip(
     return RedirectResponse(url=f"/public/{zip_filename}", status_code=302)
 
 
+def _find_export_files(upload_manager, processed_tracker, request_ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    Busca el ZIP y el Excel de cada request_id a exportar (bloqueante, para usar en threadpool).
+    
+    Cada request_id se resuelve con los índices por request_id de los gestores
+    (primero archivos de upload-pdf, luego procesados directamente), sin recorrer
+    todos los archivos procesados.
+    
+    Args:
+        upload_manager: Gestor de PDFs subidos
+        processed_tracker: Tracker de archivos procesados directamente
+        request_ids: IDs de los requests a exportar
+        
+    Returns:
+        Lista de dicts con request_id, filename, zip_filename y excel_filename
+    """
+    archivos = []
+    for request_id in dict.fromkeys(request_ids):
+        if not request_id:
+            continue
+        for f in (upload_manager.get_by_request_id(request_id),
+                  processed_tracker.get_by_request_id(request_id)):
+            if not f:
+                continue
+            zip_filename = f.get("zip_filename")
+            excel_filename = f.get("excel_filename")
+            if zip_filename or excel_filename:
+                archivos.append({
+                    "request_id": request_id,
+                    "filename": f.get("filename", "unknown"),
+                    "zip_filename": zip_filename,
+                    "excel_filename": excel_filename
+                })
+                break
+    return archivos
+
+
 @app.post("/api/v1/export-bulk", tags=["Export"])
 async def export_bulk_files(request: BulkExportRequest):
     """
@@ -4215,43 +4555,9 @@ async def export_bulk_files(request: BulkExportRequest):
         )
     
     # Buscar zip_filename y excel_filename para cada request_id
-    archivos_para_exportar = []
-    
-    # Buscar en archivos procesados desde upload-pdf
-    uploaded_files = upload_manager.list_uploaded_files(processed=True)
-    for f in uploaded_files:
-        request_id = f.get("request_id")
-        if request_id and request_id in request_ids:
-            zip_filename = f.get("zip_filename")
-            excel_filename = f.get("excel_filename")
-            filename = f.get("filename", "unknown")
-            
-            if zip_filename or excel_filename:
-                archivos_para_exportar.append({
-                    "request_id": request_id,
-                    "filename": filename,
-                    "zip_filename": zip_filename,
-                    "excel_filename": excel_filename
-                })
-    
-    # Buscar también en archivos procesados directamente (por si acaso)
-    direct_files = processed_tracker.get_processed_files()
-    for f in direct_files:
-        request_id = f.get("request_id")
-        if request_id and request_id in request_ids:
-            # Verificar que no esté ya en la lista
-            if not any(a["request_id"] == request_id for a in archivos_para_exportar):
-                zip_filename = f.get("zip_filename")
-                excel_filename = f.get("excel_filename")
-                filename = f.get("filename", "unknown")
-                
-                if zip_filename or excel_filename:
-                    archivos_para_exportar.append({
-                        "request_id": request_id,
-                        "filename": filename,
-                        "zip_filename": zip_filename,
-                        "excel_filename": excel_filename
-                    })
+    archivos_para_exportar = await asyncio.to_thread(
+        _find_export_files, upload_manager, processed_tracker, request_ids
+    )
     
     if not archivos_para_exportar:
         raise HTTPException(
@@ -4336,7 +4642,7 @@ async def export_structured_to_excel(
     Redirige a la descarga del Excel consolidado para un request_id.
     
     Busca el excel_filename en la metadata (igual que el ZIP) y redirige a /public/{excel_filename}.
-    Si no existe, intenta generarlo.
+    Si no existe, lo genera (queda guardado en /public) y lo retorna directamente.
     
     Args:
         request_id: ID del procesamiento (obtener de la respuesta de /api/v1/process-pdf)
@@ -4358,28 +4664,30 @@ async def export_structured_to_excel(
     email_found = None
     pdf_name = None
     
-    # Buscar en archivos procesados desde upload-pdf
-    uploaded_files = upload_manager.list_uploaded_files(processed=True)
-    for f in uploaded_files:
-        if f.get("request_id") == request_id:
+    # Buscar en archivos procesados desde upload-pdf y en archivos procesados
+    # directamente a la vez (fuera del event loop); el upload tiene prioridad
+    f_upload, f_processed = await asyncio.gather(
+        asyncio.to_thread(upload_manager.get_by_request_id, request_id),
+        asyncio.to_thread(processed_tracker.get_by_request_id, request_id)
+    )
+    
+    f = f_upload
+    if f:
+        excel_filename = f.get("excel_filename")
+        email_found = f.get("metadata", {}).get("email", "")
+        filename = f.get("filename", "")
+        if filename:
+            pdf_name = Path(filename).stem
+    
+    # Si no se encontró, usar el de archivos procesados directamente
+    if not excel_filename:
+        f = f_processed
+        if f:
             excel_filename = f.get("excel_filename")
             email_found = f.get("metadata", {}).get("email", "")
             filename = f.get("filename", "")
             if filename:
                 pdf_name = Path(filename).stem
-            break
-    
-    # Si no se encontró, buscar en archivos procesados directamente
-    if not excel_filename:
-        direct_files = processed_tracker.get_processed_files()
-        for f in direct_files:
-            if f.get("request_id") == request_id:
-                excel_filename = f.get("excel_filename")
-                email_found = f.get("metadata", {}).get("email", "")
-                filename = f.get("filename", "")
-                if filename:
-                    pdf_name = Path(filename).stem
-                break
     
     # Si se encontró el excel_filename, redirigir a /public/{excel_filename}
     if excel_filename:
@@ -4396,14 +4704,20 @@ async def export_structured_to_excel(
         pdf_name = "unknown"
     
     # Generar Excel usando la función helper (generará Excel vacío si no hay JSONs)
+    # Se genera en memoria y se responde con esos bytes (también queda guardado en /public).
+    # Las descargas simultáneas del mismo request_id comparten una sola generación
+    # (un doble clic no genera dos Excels), y si el cliente se desconecta la
+    # generación termina igual y las siguientes descargas redirigen al archivo.
     file_manager = get_file_manager()
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    excel_filename, excel_download_url = await _generate_excel_for_request(
-        request_id=request_id,
-        pdf_name=pdf_name,
-        timestamp=timestamp,
-        archive_manager=archive_manager,
-        file_manager=file_manager
+    excel_filename, excel_buffer = await _single_flight(
+        ("export-excel", request_id),
+        _generate_excel_stream_for_request_sync,
+        request_id,
+        pdf_name,
+        timestamp,
+        archive_manager,
+        file_manager
     )
     
     if not excel_filename:
@@ -4412,27 +4726,40 @@ async def export_structured_to_excel(
             detail={"error": f"Error generando Excel para request_id '{request_id}'"}
         )
     
-    # Redirigir a /public/{excel_filename}
-    return RedirectResponse(url=f"/public/{excel_filename}", status_code=302)
+    # Descarga directa del Excel recién generado (sin redirigir ni releerlo del disco)
+    return Response(
+        content=excel_buffer.getvalue(),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": _attachment_content_disposition(excel_filename)}
+    )
 
 
 @app.get("/public/{filename}", tags=["Public"])
-async def serve_public_file(filename: str):
+async def serve_public_file(filename: str, request: Request):
     """
     Endpoint para servir archivos públicos (zips y excels) para descarga.
     
+    Envía un ETag derivado del mtime/tamaño del archivo; si el cliente ya tiene esa
+    versión (If-None-Match) responde 304 sin cuerpo.
+    
     Args:
         filename: Nombre del archivo a descargar
         
     Returns:
-        Archivo para descarga
+        Archivo para descarga (o 304 si no cambió)
     """
     from fastapi.responses import FileResponse
     
     archive_manager = get_archive_manager()
     file_path = archive_manager.public_folder / filename
     
-    if not file_path.exists():
+    # Un solo stat: se reutiliza en FileResponse para no repetirlo al enviar
+    try:
+        file_stat = file_path.stat()
+    except OSError:
+        file_stat = None
+    
+    if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail={"error": f"Archivo no encontrado: {filename}"}
@@ -4445,69 +4772,13 @@ async def serve_public_file(filename: str):
             detail={"error": "Solo se permiten archivos .zip o .xlsx"}
         )
     
-    # Buscar el correo asociado a este archivo (ZIP o Excel)
-    upload_manager = get_upload_manager()
-    processed_tracker = get_processed_tracker()
-    file_manager = get_file_manager()
-    
-    email_found = None
-    
-    # Si es un Excel, extraer request_id del nombre del archivo
-    # Formato: {pdf_name}_consolidado_{timestamp}_{request_id[:8]}.xlsx
-    if filename.lower().endswith('.xlsx'):
-        # Intentar extraer request_id del nombre
-        parts = filename.replace('.xlsx', '').split('_')
-        if len(parts) >= 3:
-            # El request_id está en los últimos caracteres (8 caracteres)
-            potential_request_id_short = parts[-1]
-            # Buscar request_id en los JSONs estructurados (buscar en todas las carpetas api/{request_id}/structured/)
-            base_output = file_manager.get_output_folder() or "./output"
-            api_folder = Path(base_output) / "api"
-            
-            if api_folder.exists():
-                # Buscar en todas las carpetas api/{request_id}/structured/
-                for request_folder in api_folder.iterdir():
-                    if request_folder.is_dir():
-                        structured_folder = request_folder / "structured"
-                        if structured_folder.exists():
-                            all_json_files = structured_folder.glob("*_structured.json")
-                            for json_file in all_json_files:
-                                try:
-                                    with open(json_file, 'r', encoding='utf-8') as f:
-                                        json_data = json.load(f)
-                                    metadata = json_data.get("metadata", {})
-                                    request_id = metadata.get("request_id", "")
-                                    if request_id and request_id[:8] == potential_request_id_short:
-                                        email_found = metadata.get("email", "")
-                                        break
-                                except Exception:
-                                    continue
-                        if email_found:
-                            break
-    
-    # Buscar en archivos procesados desde upload-pdf (para ZIPs y Excel)
-    if not email_found:
-        uploaded_files = upload_manager.list_uploaded_files(processed=True)
-        for f in uploaded_files:
-            # Verificar si es el ZIP o el Excel
-            if (f.get("zip_filename") == filename or 
-                f.get("excel_filename") == filename or 
-                f.get("download_url", "").endswith(filename) or
-                f.get("excel_download_url", "").endswith(filename)):
-                email_found = f.get("metadata", {}).get("email", "")
-                break
-    
-    # Si no se encontró, buscar en archivos procesados directamente
-    if not email_found:
-        direct_files = processed_tracker.get_processed_files()
-        for f in direct_files:
-            # Verificar si es el ZIP o el Excel
-            if (f.get("zip_filename") == filename or 
-                f.get("excel_filename") == filename or 
-                f.get("download_url", "").endswith(filename) or
-                f.get("excel_download_url", "").endswith(filename)):
-                email_found = f.get("metadata", {}).get("email", "")
-                break
+    # Los nombres públicos llevan timestamp/ID, por lo que el contenido no cambia
+    cache_headers = {
+        "ETag": _signature_etag("public", filename, file_stat.st_mtime_ns, file_stat.st_size),
+        "Cache-Control": "public, max-age=3600"
+    }
+    if _etag_matches(request, cache_headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
     
     # Determinar media type según extensión
     if filename.lower().endswith('.xlsx'):
@@ -4515,15 +4786,22 @@ async def serve_public_file(filename: str):
     else:
         media_type = "application/zip"
     
+    # FileResponse envía el archivo con sendfile/pathsend cuando el servidor lo soporta
+    # y atiende peticiones Range (Accept-Ranges: bytes) para reanudar descargas
     return FileResponse(
         path=str(file_path),
         filename=filename,
-        media_type=media_type
+        media_type=media_type,
+        stat_result=file_stat,
+        headers=cache_headers
     )
 
 
 # ===== Dashboard Endpoints =====
 
+_DASHBOARD_MOCK_PATH = Path(__file__).parent.parent.parent.parent / "config" / "dashboard_mock_data.json"
+
+
 def _load_dashboard_mock_data() -> Dict[str, Any]:
     """
     Carga los datos mockeados del dashboard desde JSON.
@@ -4532,10 +4810,10 @@ def _load_dashboard_mock_data() -> Dict[str, Any]:
         Diccionario con todos los datos mockeados
     """
     try:
-        config_path = Path(__file__).parent.parent.parent.parent / "config" / "dashboard_mock_data.json"
+        config_path = _DASHBOARD_MOCK_PATH
         if config_path.exists():
-            with open(config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(config_path, 'rb') as f:
+                return orjson.loads(f.read())
         else:
             logger.warning(f"Archivo de mock data no encontrado: {config_path}. Usando valores por defecto.")
             return {}
@@ -4544,6 +4822,150 @@ def _load_dashboard_mock_data() -> Dict[str, Any]:
         return {}
 
 
+def _parse_date_filter(fecha: Optional[str]) -> Optional[date]:
+    """
+    Parsea un filtro de fecha (YYYY-MM-DD) de los endpoints del dashboard.
+    
+    Args:
+        fecha: Fecha recibida en el query string
+        
+    Returns:
+        Fecha parseada o None si no se envió o no es válida (el filtro se ignora)
+    """
+    if not fecha:
+        return None
+    try:
+        return date.fromisoformat(fecha[:10])
+    except ValueError:
+        logger.warning(f"Filtro de fecha inválido, se ignora: {fecha}")
+        return None
+
+
+# Valores por defecto de analytics cuando dashboard_mock_data.json no los define
+_MOCK_ANALYTICS_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "offshore": {
+        "departamentos": {
+            "Engineering": 850000.00,
+            "Procurement": 320000.00,
+            "Construction": 180000.00,
+            "Project Management": 95000.00,
+            "Quality Control": 45000.00,
+            "Health & Safety": 35000.00,
+            "Environmental": 28000.00,
+            "Logistics": 22000.00,
+            "Other Services": 100000.50
+        },
+        "disciplinas": {
+            "Procurement": 1800.00,
+            "Engineering": 1450.00,
+            "Construction": 1200.00,
+            "Project Management": 950.00,
+            "Quality Control": 680.00
+        },
+        "total_gasto": 1450000.50,
+        "total_horas": 1125.25,
+        "total_disciplinas": 12
+    },
+    "onshore": {
+        "departamentos": {
+            "Engineering": 450000.00,
+            "Operations": 280000.00,
+            "Maintenance": 150000.00,
+            "Safety": 85000.00,
+            "Environmental": 45000.00,
+            "Human Resources": 35000.00,
+            "Finance": 28000.00,
+            "IT Services": 22000.00,
+            "Other Services": 120000.25
+        },
+        "disciplinas": {
+            "Engineering": 1250.00,
+            "Operations": 980.00,
+            "Maintenance": 720.00,
+            "Safety": 550.00,
+            "Environmental": 420.00
+        },
+        "total_gasto": 1000000.25,
+        "total_horas": 750.25,
+        "total_disciplinas": 10
+    }
+}
+
+# Cache de la respuesta de analytics: mtime del JSON de mock data -> respuesta ya serializada
+_mock_analytics_cache: Dict[str, Any] = {"key": None, "body": None}
+
+
+def _percentage_items(values: Dict[str, float], item_cls):
+    """
+    Convierte valores absolutos por label en items con su porcentaje, de mayor a menor.
+    
+    Los labels y porcentajes se calculan y ordenan como tuplas; los modelos
+    Pydantic se crean una sola vez, ya en el orden final.
+    
+    Args:
+        values: Diccionario label -> valor absoluto
+        item_cls: Modelo a construir (DepartamentoItem o DisciplinaItem)
+        
+    Returns:
+        Lista de item_cls ordenada por porcentaje descendente
+    """
+    total = sum(values.values())
+    percentages = [(label, round((valor / total) * 100, 2)) for label, valor in values.items()]
+    percentages.sort(key=lambda item: item[1], reverse=True)
+    return [item_cls(label=label, value=value) for label, value in percentages]
+
+
+def _build_mock_analytics_item(mock: Dict[str, Any], defaults: Dict[str, Any]) -> AnalyticsItem:
+    """
+    Construye un AnalyticsItem a partir de los valores absolutos mockeados.
+    
+    Args:
+        mock: Sección offshore/onshore de dashboard_mock_data.json
+        defaults: Valores por defecto de la misma sección
+        
+    Returns:
+        AnalyticsItem con departamentos y disciplinas en porcentaje, de mayor a menor
+    """
+    departamentos = _percentage_items(mock.get("departamentos", defaults["departamentos"]), DepartamentoItem)
+    disciplinas = _percentage_items(mock.get("disciplinas", defaults["disciplinas"]), DisciplinaItem)
+    
+    return AnalyticsItem(
+        total_gasto=mock.get("total_gasto", defaults["total_gasto"]),
+        total_horas=mock.get("total_horas", defaults["total_horas"]),
+        total_disciplinas=mock.get("total_disciplinas", defaults["total_disciplinas"]),
+        distribucion_departamento=departamentos,
+        top_5_disciplinas=disciplinas
+    )
+
+
+def _get_mock_analytics_body() -> bytes:
+    """
+    Obtiene la respuesta de analytics mockeada, ya serializada a JSON.
+    
+    Los items (porcentajes, orden, modelos) y la respuesta completa se construyen
+    y serializan una vez, y se reutilizan mientras dashboard_mock_data.json no cambie.
+    
+    Returns:
+        Cuerpo JSON de DashboardAnalyticsResponse
+    """
+    try:
+        cache_key = _DASHBOARD_MOCK_PATH.stat().st_mtime_ns
+    except OSError:
+        cache_key = None
+    
+    if _mock_analytics_cache["body"] is None or _mock_analytics_cache["key"] != cache_key:
+        analytics_mock = _load_dashboard_mock_data().get("analytics", {})
+        response = DashboardAnalyticsResponse(
+            success=True,
+            offshore=_build_mock_analytics_item(analytics_mock.get("offshore", {}), _MOCK_ANALYTICS_DEFAULTS["offshore"]),
+            onshore=_build_mock_analytics_item(analytics_mock.get("onshore", {}), _MOCK_ANALYTICS_DEFAULTS["onshore"])
+        )
+        _mock_analytics_cache["key"] = cache_key
+        _mock_analytics_cache["body"] = response.model_dump_json().encode()
+    
+    return _mock_analytics_cache["body"]
+
+
 @app.get("/api/v1/dashboard/stats", response_model=DashboardStatsResponse, tags=["Dashboard"])
 async def get_dashboard_stats(
     fecha_inicio: Optional[str] = Query(None, description="Fecha inicio (YYYY-MM-DD)"),
@@ -4591,63 +5013,38 @@ async def get_dashboard_stats(
         # ============================================================
         
         # Intentar leer de JSONs reales primero
-        file_manager = get_file_manager()
-        base_output = file_manager.get_output_folder() or "./output"
-        api_folder = Path(base_output) / "api"
-        
         monto_total = 0.0
         total_horas = 0.0
-        has_real_data = False
         
         # TEMPORAL: Leer todos los JSONs estructurados desde todas las carpetas api/{request_id}/structured/
+        # (vía índice en memoria: solo se re-parsean los JSONs nuevos o modificados)
         # TODO: Migrar a SQL Server cuando tengas conexión a BD
-        if api_folder.exists():
-            # Buscar en todas las carpetas api/{request_id}/structured/
-            for request_folder in api_folder.iterdir():
-                if request_folder.is_dir():
-                    structured_folder = request_folder / "structured"
-                    if structured_folder.exists():
-                        for json_file in structured_folder.glob("*_structured.json"):
-                            try:
-                                with open(json_file, 'r', encoding='utf-8') as f:
-                                    json_data = json.load(f)
-                                
-                                has_real_data = True
-                                
-                                # Aplicar filtros aquí si es necesario
-                                metadata = json_data.get("metadata", {})
-                                
-                                # Filtrar por fecha si se proporciona
-                                if fecha_inicio or fecha_fin:
-                                    processed_at = metadata.get("processed_at", "")
-                                    if processed_at:
-                                        # TODO: Implementar filtro de fechas
-                                        # Cuando tengas BD: WHERE fEmision BETWEEN fecha_inicio AND fecha_fin
-                                        pass
-                                
-                                # Extraer montos y horas (las tablas ahora están en el nivel raíz)
-                                # TODO: Cuando tengas BD, esto vendrá de:
-                                # - MCOMPROBANTE.nPrecioTotal
-                                # - MJORNADA.nTotalHoras
-                                
-                                # Buscar en mcomprobante
-                                comprobantes = json_data.get("mcomprobante", [])
-                                for comp in comprobantes:
-                                    if isinstance(comp, dict):
-                                        precio_total = comp.get("nPrecioTotal", 0)
-                                        if precio_total:
-                                            monto_total += float(precio_total)
-                                
-                                # Buscar en mjornada
-                                jornadas = json_data.get("mjornada", [])
-                                for jornada in jornadas:
-                                    if isinstance(jornada, dict):
-                                        horas = jornada.get("nTotalHoras", 0)
-                                        if horas:
-                                            total_horas += float(horas)
-                            except Exception as e:
-                                logger.warning(f"Error leyendo {json_file}: {e}")
-                    continue
+        structured_index = get_structured_index()
+        await asyncio.to_thread(structured_index.refresh)
+        structured_entries = structured_index.get_entries()
+        has_real_data = bool(structured_entries)
+        
+        # Parsear los filtros de fecha una sola vez (no por archivo)
+        fecha_inicio_date = _parse_date_filter(fecha_inicio)
+        fecha_fin_date = _parse_date_filter(fecha_fin)
+        
+        for entry in structured_entries:
+            # Filtrar por fecha de procesamiento si se proporciona (ya parseada en el índice)
+            # TODO: Cuando tengas BD: WHERE fEmision BETWEEN fecha_inicio AND fecha_fin
+            if fecha_inicio_date or fecha_fin_date:
+                processed_date = entry["processed_date"]
+                if processed_date:
+                    if fecha_inicio_date and processed_date < fecha_inicio_date:
+                        continue
+                    if fecha_fin_date and processed_date > fecha_fin_date:
+                        continue
+            
+            # Montos y horas ya sumados por archivo en el índice
+            # TODO: Cuando tengas BD, esto vendrá de:
+            # - MCOMPROBANTE.nPrecioTotal
+            # - MJORNADA.nTotalHoras
+            monto_total += entry["monto_total"]
+            total_horas += entry["total_horas"]
         
         # Si no hay datos reales, usar datos mockeados para pruebas
         if not has_real_data:
@@ -4694,125 +5091,8 @@ async def get_dashboard_analytics(
         # TODO: Reemplazar con lectura real de JSONs o SQL Server
         # ============================================================
         
-        # Cargar datos mockeados desde JSON
-        mock_data = _load_dashboard_mock_data()
-        analytics_mock = mock_data.get("analytics", {})
-        
-        # Datos mockeados para Offshore
-        offshore_mock = analytics_mock.get("offshore", {})
-        offshore_dept_values = offshore_mock.get("departamentos", {
-            "Engineering": 850000.00,
-            "Procurement": 320000.00,
-            "Construction": 180000.00,
-            "Project Management": 95000.00,
-            "Quality Control": 45000.00,
-            "Health & Safety": 35000.00,
-            "Environmental": 28000.00,
-            "Logistics": 22000.00,
-            "Other Services": 100000.50
-        })
-        
-        # Calcular total de departamentos y convertir a porcentajes
-        offshore_dept_total = sum(offshore_dept_values.values())
-        offshore_departamentos = [
-            DepartamentoItem(
-                label=label,
-                value=round((valor / offshore_dept_total) * 100, 2)
-            )
-            for label, valor in offshore_dept_values.items()
-        ]
-        # Ordenar de mayor a menor por porcentaje
-        offshore_departamentos.sort(key=lambda x: x.value, reverse=True)
-        
-        # Valores absolutos de disciplinas
-        offshore_disc_values = offshore_mock.get("disciplinas", {
-            "Procurement": 1800.00,
-            "Engineering": 1450.00,
-            "Construction": 1200.00,
-            "Project Management": 950.00,
-            "Quality Control": 680.00
-        })
-        
-        # Calcular total de disciplinas y convertir a porcentajes
-        offshore_disc_total = sum(offshore_disc_values.values())
-        offshore_disciplinas = [
-            DisciplinaItem(
-                label=label,
-                value=round((valor / offshore_disc_total) * 100, 2)
-            )
-            for label, valor in offshore_disc_values.items()
-        ]
-        # Ordenar de mayor a menor por porcentaje
-        offshore_disciplinas.sort(key=lambda x: x.value, reverse=True)
-        
-        offshore_item = AnalyticsItem(
-            total_gasto=offshore_mock.get("total_gasto", 1450000.50),
-            total_horas=offshore_mock.get("total_horas", 1125.25),
-            total_disciplinas=offshore_mock.get("total_disciplinas", 12),
-            distribucion_departamento=offshore_departamentos,
-            top_5_disciplinas=offshore_disciplinas
-        )
-        
-        # Datos mockeados para Onshore
-        onshore_mock = analytics_mock.get("onshore", {})
-        onshore_dept_values = onshore_mock.get("departamentos", {
-            "Engineering": 450000.00,
-            "Operations": 280000.00,
-            "Maintenance": 150000.00,
-            "Safety": 85000.00,
-            "Environmental": 45000.00,
-            "Human Resources": 35000.00,
-            "Finance": 28000.00,
-            "IT Services": 22000.00,
-            "Other Services": 120000.25
-        })
-        
-        # Calcular total de departamentos y convertir a porcentajes
-        onshore_dept_total = sum(onshore_dept_values.values())
-        onshore_departamentos = [
-            DepartamentoItem(
-                label=label,
-                value=round((valor / onshore_dept_total) * 100, 2)
-            )
-            for label, valor in onshore_dept_values.items()
-        ]
-        # Ordenar de mayor a menor por porcentaje
-        onshore_departamentos.sort(key=lambda x: x.value, reverse=True)
-        
-        # Valores absolutos de disciplinas
-        onshore_disc_values = onshore_mock.get("disciplinas", {
-            "Engineering": 1250.00,
-            "Operations": 980.00,
-            "Maintenance": 720.00,
-            "Safety": 550.00,
-            "Environmental": 420.00
-        })
-        
-        # Calcular total de disciplinas y convertir a porcentajes
-        onshore_disc_total = sum(onshore_disc_values.values())
-        onshore_disciplinas = [
-            DisciplinaItem(
-                label=label,
-                value=round((valor / onshore_disc_total) * 100, 2)
-            )
-            for label, valor in onshore_disc_values.items()
-        ]
-        # Ordenar de mayor a menor por porcentaje
-        onshore_disciplinas.sort(key=lambda x: x.value, reverse=True)
-        
-        onshore_item = AnalyticsItem(
-            total_gasto=onshore_mock.get("total_gasto", 1000000.25),
-            total_horas=onshore_mock.get("total_horas", 750.25),
-            total_disciplinas=onshore_mock.get("total_disciplinas", 10),
-            distribucion_departamento=onshore_departamentos,
-            top_5_disciplinas=onshore_disciplinas
-        )
-        
-        return DashboardAnalyticsResponse(
-            success=True,
-            offshore=offshore_item,
-            onshore=onshore_item
-        )
+        # La respuesta se arma y serializa una sola vez; se recalcula solo si cambia el JSON de mock data
+        return Response(content=_get_mock_analytics_body(), media_type="application/json")
     
     except Exception as e:
         logger.exception(f"Error obteniendo analytics: {e}")
@@ -4898,67 +5178,231 @@ async def get_rejected_concepts(
 
 # ===== Periodos Endpoints =====
 
-@app.post("/api/v1/periodos", response_model=PeriodoResponse, tags=["Periodos"])
-@limiter.limit("10/minute")  # Máximo 10 requests por minuto por IP
-async def create_periodo(
-    request: Request, 
-    periodo_data: CreatePeriodoRequest,
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
-):
+# Fecha ISO canónica (la que escribe datetime.isoformat()): AAAA-MM-DDTHH:MM:SS[.ffffff][Z|±HH:MM]
+_ISO_DATETIME_RE = re.compile(
+    r"(\d{4})-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])T([01]\d|2[0-3]):([0-5]\d)"
+    r"(?::[0-5]\d(?:\.\d{1,6})?)?(?:Z|[+-]\d{2}:?\d{2})?"
+)
+
+
+@functools.lru_cache(maxsize=8192)
+def _format_periodo_date(date_str: Optional[str]) -> Optional[str]:
     """
-    Crea un nuevo periodo.
+    Formatea una fecha ISO de un periodo a formato DD/MM/YYYY, HH:MM.
+    
+    Se cachea por texto: las mismas fechas (created_at, ultimo_procesamiento) se
+    repiten en cada listado, así que solo se parsean la primera vez. El formato
+    canónico se reordena directamente desde el match (sin crear un datetime ni
+    usar strftime); los demás formatos pasan por datetime.fromisoformat.
     
     Args:
-        request: Request de FastAPI (para rate limiting)
-        periodo_data: Datos del periodo a crear (periodo: "MM/AAAA", tipo: "onshore"|"offshore")
+        date_str: Fecha ISO (puede terminar en "Z")
         
     Returns:
-        Periodo creado
+        Fecha formateada, None si no hay fecha, o el texto original si no es ISO válido
     """
-    # Verificar autenticación y estado del usuario
-    get_current_user_email(credentials)
-    
+    if not date_str:
+        return None
+    match = _ISO_DATETIME_RE.fullmatch(date_str)
+    if match:
+        year, month, day, hour, minute = match.groups()
+        return f"{day}/{month}/{year}, {hour}:{minute}"
     try:
-        periodo_manager = get_periodo_manager()
-        
-        # Validación adicional: asegurar que periodo no esté vacío (ya validado por Pydantic, pero por seguridad)
-        if not periodo_data.periodo or not periodo_data.periodo.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="El campo 'Periodo' es obligatorio y no puede estar vacío"
-            )
-        
-        # Validar tipo (ya validado por Pydantic, pero por seguridad)
-        if periodo_data.tipo.lower() not in ["onshore", "offshore"]:
-            raise HTTPException(
+        if date_str[-1] == 'Z':
+            date_str = date_str[:-1] + '+00:00'
+        return datetime.fromisoformat(date_str).strftime("%d/%m/%Y, %H:%M")
+    except Exception:
+        return date_str  # Si falla, retornar original
+
+
+# IDs de periodo válidos: "AAAA-MM-tipo" o el formato de respaldo de PeriodoManager
+# (nunca contienen separadores de ruta ni caracteres de control)
+_PERIODO_ID_RE = re.compile(r"[^/\\\x00-\x1f]{1,256}")
+
+
+async def validate_periodo_id(periodo_id: str) -> str:
+    """
+    Dependencia que valida el periodo_id del path antes de consultar el gestor.
+
+    Es async porque solo hace un match de regex: así FastAPI la ejecuta en el
+    event loop en lugar de enviarla al threadpool.
+
+    Args:
+        periodo_id: ID del periodo (parámetro de path)
+
+    Returns:
+        El mismo periodo_id
+
+    Raises:
+        HTTPException 422: Si el ID no tiene un formato válido
+    """
+    if not _PERIODO_ID_RE.fullmatch(periodo_id):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="periodo_id inválido"
+        )
+    return periodo_id
+
+
+def _handle_periodo_errors(error_message: str):
+    """
+    Decorador para endpoints de periodos: convierte excepciones no controladas
+    en un HTTPException 500 con el mensaje indicado (las HTTPException se propagan).
+
+    Reemplaza el bloque try/except repetido en cada endpoint y mantiene el mismo
+    formato de respuesta ({"detail": "<mensaje>: <error>"}).
+
+    Args:
+        error_message: Prefijo del detalle del error (ej: "Error al actualizar periodo")
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.exception(f"{error_message}: {e}")
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"{error_message}: {str(e)}"
+                )
+        return wrapper
+    return decorator
+
+
+# periodo_id -> (ETag del consolidado, respuesta de resumen PS ya serializada)
+_resumen_ps_cache: Dict[str, Tuple[str, bytes]] = {}
+
+# Clave -> tarea en curso de _single_flight
+_inflight: Dict[Any, asyncio.Task] = {}
+
+
+async def _single_flight(key: Any, func, *args, **kwargs) -> Any:
+    """
+    Ejecuta func en un thread, compartiendo el resultado entre llamadas simultáneas.
+    
+    Si ya hay una ejecución en curso para la misma clave, se espera esa en lugar de
+    lanzar otra (las excepciones también se comparten). Cancelar un request no
+    cancela la ejecución compartida.
+    
+    Args:
+        key: Clave que identifica la operación (ej: ("periodo", periodo_id))
+        func: Función bloqueante a ejecutar
+        *args, **kwargs: Argumentos de func
+        
+    Returns:
+        Resultado de func
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+def _periodo_not_found(periodo_id: str) -> Response:
+    """
+    Respuesta 404 para un periodo inexistente.
+
+    Se retorna directamente (sin lanzar HTTPException) para no pasar por el
+    re-raise de los endpoints y el exception handler de FastAPI. El cuerpo es el
+    mismo que el de HTTPException: {"detail": "..."}.
+
+    Args:
+        periodo_id: ID del periodo solicitado
+
+    Returns:
+        Response JSON con status 404
+    """
+    return _orjson_response(
+        {"detail": f"Periodo {periodo_id} no encontrado"},
+        status_code=status.HTTP_404_NOT_FOUND
+    )
+
+
+def _model_json_response(model: BaseModel) -> Response:
+    """
+    Serializa un modelo de respuesta directamente a JSON.
+
+    El modelo ya fue validado al construirse, así que se serializa una sola vez con
+    el core de Pydantic (model_dump_json) en lugar de que FastAPI lo vuelva a pasar
+    por el response_model. El response_model del endpoint se mantiene para OpenAPI.
+
+    Args:
+        model: Modelo de respuesta ya construido
+
+    Returns:
+        Response JSON con el modelo serializado
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json")
+
+
+def _periodo_json_response(periodo_info: PeriodoInfo) -> Response:
+    """
+    Serializa un PeriodoResponse directamente a JSON.
+
+    Args:
+        periodo_info: Periodo a retornar
+
+    Returns:
+        Response JSON con {"success": true, "periodo": {...}}
+    """
+    return _model_json_response(PeriodoResponse(success=True, periodo=periodo_info))
+
+
+@app.post("/api/v1/periodos", response_model=PeriodoResponse, tags=["Periodos"])
+@limiter.limit("10/minute")  # Máximo 10 requests por minuto por IP
+async def create_periodo(
+    request: Request, 
+    periodo_data: CreatePeriodoRequest,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+):
+    """
+    Crea un nuevo periodo.
+    
+    Args:
+        request: Request de FastAPI (para rate limiting)
+        periodo_data: Datos del periodo a crear (periodo: "MM/AAAA", tipo: "onshore"|"offshore")
+        
+    Returns:
+        Periodo creado
+    """
+    # Verificar autenticación y estado del usuario
+    get_current_user_email(credentials)
+    
+    try:
+        periodo_manager = get_periodo_manager()
+        
+        # Validación adicional: asegurar que periodo no esté vacío (ya validado por Pydantic, pero por seguridad)
+        if not periodo_data.periodo or not periodo_data.periodo.strip():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El campo 'Periodo' es obligatorio y no puede estar vacío"
+            )
+        
+        # Validar tipo (ya validado por Pydantic, pero por seguridad)
+        if periodo_data.tipo.lower() not in ["onshore", "offshore"]:
+            raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Tipo debe ser 'onshore' o 'offshore'"
             )
         
-        periodo_data_result = periodo_manager.create_periodo(periodo_data.periodo, periodo_data.tipo)
+        periodo_data_result = await asyncio.to_thread(periodo_manager.create_periodo, periodo_data.periodo, periodo_data.tipo)
         
-        # Función helper para formatear fechas
-        def format_date(date_str: Optional[str]) -> Optional[str]:
-            """Formatea fecha ISO a formato DD/MM/YYYY, HH:MM"""
-            if not date_str:
-                return None
-            try:
-                dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                return dt.strftime("%d/%m/%Y, %H:%M")
-            except Exception:
-                return date_str  # Si falla, retornar original
-        
-        periodo_info = PeriodoInfo(
+        periodo_info = PeriodoInfo.model_construct(
             periodo_id=periodo_data_result["periodo_id"],
             periodo=periodo_data_result["periodo"],
             tipo=periodo_data_result["tipo"],
             estado=periodo_data_result["estado"],
             registros=periodo_data_result["registros"],
-            ultimo_procesamiento=format_date(periodo_data_result.get("ultimo_procesamiento")),
-            created_at=format_date(periodo_data_result.get("created_at"))
+            ultimo_procesamiento=_format_periodo_date(periodo_data_result.get("ultimo_procesamiento")),
+            created_at=_format_periodo_date(periodo_data_result.get("created_at"))
         )
         
-        return PeriodoResponse(success=True, periodo=periodo_info)
+        return _periodo_json_response(periodo_info)
     
     except ValueError as e:
         raise HTTPException(
@@ -5002,7 +5446,7 @@ async def list_periodos(
         import math
         
         periodo_manager = get_periodo_manager()
-        periodos_data = periodo_manager.list_periodos(tipo=tipo, estado=estado, search=search)
+        periodos_data = await asyncio.to_thread(periodo_manager.list_periodos, tipo=tipo, estado=estado, search=search)
         
         # Calcular paginación (page empieza desde 1)
         total_periodos = len(periodos_data)
@@ -5012,20 +5456,10 @@ async def list_periodos(
         # Aplicar paginación
         periodos_data = periodos_data[offset:offset + limit]
         
-        # Función helper para formatear fechas
-        def format_date(date_str: Optional[str]) -> Optional[str]:
-            """Formatea fecha ISO a formato DD/MM/YYYY, HH:MM"""
-            if not date_str:
-                return None
-            try:
-                dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                return dt.strftime("%d/%m/%Y, %H:%M")
-            except Exception:
-                return date_str  # Si falla, retornar original
-        
         # Calcular estado dinámicamente para cada periodo
+        # La lectura de metadata es bloqueante: se hace en el threadpool
         upload_manager = get_upload_manager()
-        uploaded_files = upload_manager.list_uploaded_files(processed=False)
+        uploaded_files = await asyncio.to_thread(upload_manager.list_uploaded_files, processed=False)
         
         # Crear diccionario de periodo_id -> cantidad de archivos pendientes
         periodo_pendientes = {}
@@ -5081,23 +5515,23 @@ async def list_periodos(
                     estado_calculado = "pendiente"
             
             periodos.append(
-                PeriodoInfo(
+                PeriodoInfo.model_construct(
                     periodo_id=periodo_id,
                     periodo=p["periodo"],
                     tipo=p["tipo"],
                     estado=estado_calculado,
                     registros=registros_calculados,  # Usar registros calculados dinámicamente
-                    ultimo_procesamiento=format_date(p.get("ultimo_procesamiento")),
-                    created_at=format_date(p.get("created_at"))
+                    ultimo_procesamiento=_format_periodo_date(p.get("ultimo_procesamiento")),
+                    created_at=_format_periodo_date(p.get("created_at"))
                 )
             )
         
-        return PeriodosListResponse(
+        return _model_json_response(PeriodosListResponse(
             success=True,
             totalPeriodos=total_periodos,
             paginas=paginas,
             periodos=periodos
-        )
+        ))
     
     except Exception as e:
         logger.exception(f"Error listando periodos: {e}")
@@ -5107,204 +5541,85 @@ async def list_periodos(
         )
 
 
-@app.get("/api/v1/periodos/{periodo_id}", response_model=PeriodoDetailResponse, tags=["Periodos"])
-@limiter.limit("30/minute")  # Máximo 30 requests por minuto por IP
-async def get_periodo_detail(
-    request: Request, 
+def _build_periodo_archivos(
     periodo_id: str,
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
-):
+    periodo_data: Dict[str, Any],
+    periodo_manager,
+    upload_manager,
+    processed_tracker,
+    structured_index,
+    jobs_activos: List[Any]
+) -> Tuple[List[PeriodoArchivoInfo], str]:
     """
-    Obtiene el detalle completo de un periodo incluyendo sus archivos.
-    Requiere autenticación.
+    Arma la lista de archivos de un periodo y calcula su estado
+    (bloqueante: lee la metadata de uploads, para usar en threadpool).
     
     Args:
         periodo_id: ID del periodo
+        periodo_data: Datos guardados del periodo
+        periodo_manager: Gestor de periodos
+        upload_manager: Gestor de PDFs subidos
+        processed_tracker: Tracker de archivos procesados directamente
+        structured_index: Índice de JSONs estructurados (ya sincronizado con refresh())
+        jobs_activos: Jobs del periodo en el worker
         
     Returns:
-        Detalle del periodo con lista de archivos
+        Tupla (archivos del periodo, estado calculado)
     """
-    try:
-        periodo_manager = get_periodo_manager()
-        periodo_data = periodo_manager.get_periodo(periodo_id)
-        
-        if not periodo_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Periodo {periodo_id} no encontrado"
+    # Obtener archivos asociados
+    request_ids = periodo_manager.get_archivos_from_periodo(periodo_id)
+    archivos = []
+    
+    # Buscar información de cada archivo
+    # Primero en el índice de JSONs estructurados, luego en processed_tracking.json
+    for request_id in request_ids:
+        archivo_info = None
+    
+        # Obtener metadata del archivo subido para file_size_bytes y uploaded_at
+        uploaded_file_metadata = None
+        try:
+            uploaded_file_metadata = upload_manager.get_uploaded_metadata(request_id)
+        except Exception:
+            pass
+    
+        file_size_bytes = None
+        uploaded_at = None
+        if uploaded_file_metadata:
+            file_size_bytes = uploaded_file_metadata.get("file_size_bytes")
+            uploaded_at = uploaded_file_metadata.get("uploaded_at")
+    
+        # 1. Buscar en JSONs estructurados (el índice también resuelve los batches del request_id)
+        # job_no, source_reference, etc. salen del primer registro de mresumen o mcomprobante
+        entry = structured_index.get_by_request_id(request_id)
+        if entry:
+            archivo_info = PeriodoArchivoInfo(
+                archivo_id=request_id[:8],
+                request_id=request_id,
+                filename=entry["filename"],
+                estado="procesado",
+                job_no=entry["job_no"],
+                type=entry["document_type"],
+                source_reference=entry["source_reference"],
+                source_ref_id=entry["source_reference"],
+                entered_curr=entry["entered_curr"],
+                entered_amount=entry["entered_amount"],
+                total_usd=entry["total_usd"],
+                fecha_valoracion=entry["fecha_valoracion"],
+                processed_at=entry["processed_at"] or None,
+                file_size_bytes=file_size_bytes,
+                uploaded_at=uploaded_at
             )
-        
-        # Obtener archivos asociados
-        request_ids = periodo_manager.get_archivos_from_periodo(periodo_id)
-        archivos = []
-        
-        # Buscar información de cada archivo
-        # Primero en JSONs estructurados, luego en processed_tracking.json
-        file_manager = get_file_manager()
-        base_output = file_manager.get_output_folder() or "./output"
-        processed_tracker = get_processed_tracker()
-        upload_manager = get_upload_manager()
-        
-        for request_id in request_ids:
-            archivo_info = None
-            
-            # Obtener metadata del archivo subido para file_size_bytes y uploaded_at
-            uploaded_file_metadata = None
+    
+        # 2. Si no se encontró en JSONs estructurados, buscar en processed_tracking.json
+        if not archivo_info:
             try:
-                uploaded_file_metadata = upload_manager.get_uploaded_metadata(request_id)
-            except Exception:
-                pass
-            
-            # 1. Buscar en JSONs estructurados en la carpeta específica por request_id
-            # Para batch jobs, extraer el request_id maestro (antes de _batch_)
-            request_id_to_search = request_id
-            if "_batch_" in request_id:
-                request_id_to_search = request_id.split("_batch_")[0]
-            
-            # Truncar request_id para buscar en la carpeta (mismo truncamiento que al crear)
-            request_id_folder = truncate_request_id_for_folder(request_id_to_search)
-            
-            structured_folder = Path(base_output) / "api" / request_id_folder / "structured"
-            if structured_folder.exists():
-                # Buscar todos los JSONs en esta carpeta específica
-                json_files = list(structured_folder.glob("*_structured.json"))
-                if json_files:
-                    # Usar el primer JSON encontrado (todos tienen la misma metadata)
-                    json_file = json_files[0]
-                    try:
-                        with open(json_file, 'r', encoding='utf-8') as f:
-                            json_data = json.load(f)
-                        metadata = json_data.get("metadata", {})
-                        # Verificar que el request_id coincide (puede ser el maestro o un batch)
-                        json_request_id = metadata.get("request_id", "")
-                        if json_request_id == request_id or json_request_id.startswith(request_id + "_batch_"):
-                            # Extraer información del archivo
-                            # Las tablas ahora están en el nivel raíz, no en additional_data
-                            # Extraer job_no, type, etc. del nivel raíz si están disponibles
-                            mresumen = json_data.get("mresumen", [])
-                            mcomprobante = json_data.get("mcomprobante", [])
-                            
-                            job_no = None
-                            source_ref = None
-                            entered_curr = None
-                            entered_amount = None
-                            total_usd = None
-                            fecha_valoracion = None
-                            
-                            # Intentar extraer de mresumen o mcomprobante
-                            if mresumen:
-                                first_item = mresumen[0]
-                                job_no = first_item.get("job_no")
-                                source_ref = first_item.get("source_reference")
-                                entered_curr = first_item.get("entered_curr")
-                                entered_amount = first_item.get("entered_amount")
-                                total_usd = first_item.get("total_usd")
-                                fecha_valoracion = first_item.get("fecha_valoracion")
-                            elif mcomprobante:
-                                first_item = mcomprobante[0]
-                                job_no = first_item.get("job_no")
-                                source_ref = first_item.get("source_reference")
-                                entered_curr = first_item.get("entered_curr")
-                                entered_amount = first_item.get("entered_amount")
-                                total_usd = first_item.get("total_usd")
-                                fecha_valoracion = first_item.get("fecha_valoracion")
-                            
-                            # Obtener file_size_bytes y uploaded_at del metadata del archivo subido
-                            file_size_bytes = None
-                            uploaded_at = None
-                            if uploaded_file_metadata:
-                                file_size_bytes = uploaded_file_metadata.get("file_size_bytes")
-                                uploaded_at = uploaded_file_metadata.get("uploaded_at")
-                            
-                            archivo_info = PeriodoArchivoInfo(
-                                archivo_id=request_id[:8],
-                                request_id=request_id,
-                                filename=metadata.get("filename", "unknown"),
-                                estado="procesado",
-                                job_no=job_no,
-                                type=metadata.get("document_type"),
-                                source_reference=source_ref,
-                                source_ref_id=source_ref,
-                                entered_curr=entered_curr,
-                                entered_amount=entered_amount,
-                                total_usd=total_usd,
-                                fecha_valoracion=fecha_valoracion,
-                                processed_at=metadata.get("processed_at"),
-                                file_size_bytes=file_size_bytes,
-                                uploaded_at=uploaded_at
-                            )
-                            break
-                    except Exception:
-                        continue
-            
-            # 2. Si no se encontró en JSONs estructurados, buscar en processed_tracking.json
-            if not archivo_info:
-                try:
-                    tracking_file = Path("./processed_tracking.json")
-                    if tracking_file.exists():
-                        with open(tracking_file, 'r', encoding='utf-8') as f:
-                            tracking_data = json.load(f)
-                        
-                        if request_id in tracking_data:
-                            file_data = tracking_data[request_id]
-                            # Obtener file_size_bytes y uploaded_at del metadata del archivo subido
-                            file_size_bytes = None
-                            uploaded_at = None
-                            if uploaded_file_metadata:
-                                file_size_bytes = uploaded_file_metadata.get("file_size_bytes")
-                                uploaded_at = uploaded_file_metadata.get("uploaded_at")
-                            
-                            archivo_info = PeriodoArchivoInfo(
-                                archivo_id=request_id[:8],
-                                request_id=request_id,
-                                filename=file_data.get("filename", "unknown"),
-                                estado="procesado",
-                                job_no=None,
-                                type=None,
-                                source_reference=None,
-                                source_ref_id=None,
-                                entered_curr=None,
-                                entered_amount=None,
-                                total_usd=None,
-                                fecha_valoracion=None,
-                                processed_at=file_data.get("processed_at"),
-                                file_size_bytes=file_size_bytes,
-                                uploaded_at=uploaded_at
-                            )
-                except Exception:
-                    pass
-            
-            if archivo_info:
-                archivos.append(archivo_info)
-        
-        # Agregar archivos subidos (pendientes y procesados) que tengan este periodo_id en metadata
-        upload_manager = get_upload_manager()
-        # Mostrar tanto pendientes como procesados
-        uploaded_files = upload_manager.list_uploaded_files(processed=None)
-        
-        # Obtener request_ids ya incluidos para evitar duplicados
-        request_ids_incluidos = {archivo.request_id for archivo in archivos}
-        
-        for uploaded_file in uploaded_files:
-            file_metadata = uploaded_file.get("metadata", {})
-            file_periodo_id = file_metadata.get("periodo_id")
-            
-            # Incluir si el periodo_id coincide (tanto pendientes como procesados)
-            if file_periodo_id == periodo_id:
-                file_id = uploaded_file.get("file_id")
-                filename = uploaded_file.get("filename", "unknown")
-                is_processed = uploaded_file.get("processed", False)
-                
-                # Verificar que no esté ya en la lista
-                if file_id not in request_ids_incluidos:
-                    # Determinar estado: si está procesado, usar "procesado", sino "pendiente"
-                    estado_archivo = "procesado" if is_processed else "pendiente"
-                    
+                file_data = processed_tracker.get_by_request_id(request_id)
+                if file_data:
                     archivo_info = PeriodoArchivoInfo(
-                        archivo_id=file_id[:8] if len(file_id) >= 8 else file_id,
-                        request_id=file_id,  # Usar file_id como identificador
-                        filename=filename,
-                        estado=estado_archivo,
+                        archivo_id=request_id[:8],
+                        request_id=request_id,
+                        filename=file_data.get("filename", "unknown"),
+                        estado="procesado",
                         job_no=None,
                         type=None,
                         source_reference=None,
@@ -5313,115 +5628,227 @@ async def get_periodo_detail(
                         entered_amount=None,
                         total_usd=None,
                         fecha_valoracion=None,
-                        processed_at=uploaded_file.get("processed_at") if is_processed else None,
-                        file_size_bytes=uploaded_file.get("file_size_bytes"),
-                        uploaded_at=uploaded_file.get("uploaded_at")
+                        processed_at=file_data.get("processed_at"),
+                        file_size_bytes=file_size_bytes,
+                        uploaded_at=uploaded_at
                     )
-                    archivos.append(archivo_info)
-                    request_ids_incluidos.add(file_id)
+            except Exception:
+                pass
+    
+        if archivo_info:
+            archivos.append(archivo_info)
+    
+    # Agregar archivos subidos (pendientes y procesados) que tengan este periodo_id en metadata
+    # Mostrar tanto pendientes como procesados
+    uploaded_files = upload_manager.list_uploaded_files(processed=None)
+    
+    # Obtener request_ids ya incluidos para evitar duplicados
+    request_ids_incluidos = {archivo.request_id for archivo in archivos}
+    
+    for uploaded_file in uploaded_files:
+        file_metadata = uploaded_file.get("metadata", {})
+        file_periodo_id = file_metadata.get("periodo_id")
+    
+        # Incluir si el periodo_id coincide (tanto pendientes como procesados)
+        if file_periodo_id == periodo_id:
+            file_id = uploaded_file.get("file_id")
+            filename = uploaded_file.get("filename", "unknown")
+            is_processed = uploaded_file.get("processed", False)
+    
+            # Verificar que no esté ya en la lista
+            if file_id not in request_ids_incluidos:
+                # Determinar estado: si está procesado, usar "procesado", sino "pendiente"
+                estado_archivo = "procesado" if is_processed else "pendiente"
+    
+                archivo_info = PeriodoArchivoInfo(
+                    archivo_id=file_id[:8] if len(file_id) >= 8 else file_id,
+                    request_id=file_id,  # Usar file_id como identificador
+                    filename=filename,
+                    estado=estado_archivo,
+                    job_no=None,
+                    type=None,
+                    source_reference=None,
+                    source_ref_id=None,
+                    entered_curr=None,
+                    entered_amount=None,
+                    total_usd=None,
+                    fecha_valoracion=None,
+                    processed_at=uploaded_file.get("processed_at") if is_processed else None,
+                    file_size_bytes=uploaded_file.get("file_size_bytes"),
+                    uploaded_at=uploaded_file.get("uploaded_at")
+                )
+                archivos.append(archivo_info)
+                request_ids_incluidos.add(file_id)
+    
+    # Calcular estado del periodo basado en los 4 estados posibles
+    # 1. "procesando" - si hay jobs activos (queued/processing)
+    # 2. "procesado" - si todos los archivos están completados
+    # 3. "pendiente" - si hay archivos subidos pero no procesados
+    # 4. "subiendo" - si hay archivos recién subidos (menos de 5 segundos desde upload)
+
+
+    # Contar estados de archivos
+    archivos_procesados = sum(1 for a in archivos if a.estado == "procesado")
+    archivos_pendientes = sum(1 for a in archivos if a.estado == "pendiente")
+    total_archivos = len(archivos)
+    
+    # Verificar si hay archivos "subiendo" (subidos pero sin job creado aún)
+    # Un archivo está "subiendo" si:
+    # - Está subido (en uploaded_files)
+    # - No tiene job activo asociado
+    # - No está procesado
+    archivos_subiendo = 0
+    file_ids_subidos = {uf.get("file_id") for uf in uploaded_files 
+                       if uf.get("metadata", {}).get("periodo_id") == periodo_id}
+    file_ids_con_job = {job.file_id for job in jobs_activos}
+    
+    for file_id in file_ids_subidos:
+        # Si el archivo está subido pero no tiene job, está "subiendo"
+        if file_id not in file_ids_con_job:
+            metadata_file = upload_manager.get_uploaded_metadata(file_id)
+            if metadata_file and not metadata_file.get("processed", False):
+                archivos_subiendo += 1
+    
+    # Verificar si hay jobs activos (queued o processing)
+    tiene_jobs_activos = any(
+        job.status in ["queued", "processing"] 
+        for job in jobs_activos
+    )
+    
+    # Verificar primero si el periodo está "cerrado" en la base de datos
+    # Si está cerrado, no calcular dinámicamente, usar "cerrado" directamente
+    estado_guardado = periodo_data.get("estado", "")
+    
+    # CRÍTICO: SIEMPRE respetar el estado "cerrado" - no calcular dinámicamente
+    # El estado "cerrado" tiene prioridad absoluta sobre cualquier cálculo dinámico
+    if estado_guardado and estado_guardado.lower() == "cerrado":
+        # Si el periodo está cerrado, usar "cerrado" directamente sin calcular
+        estado_calculado = "cerrado"
+        logger.info(f"Periodo {periodo_id} está CERRADO - usando estado 'cerrado' sin calcular")
+    else:
+        # Calcular estado según prioridad (según requerimientos del usuario):
+        # 1. Si no hay archivos → "vacio"
+        # 2. Si hay al menos uno pendiente → "pendiente"
+        # 3. Si todos están procesados → "procesado"
+        estado_calculado = "pendiente"
+        if total_archivos == 0:
+            # No hay archivos
+            estado_calculado = "vacio"
+        elif archivos_subiendo > 0:
+            # Hay archivos recién subidos (estado "subiendo")
+            estado_calculado = "subiendo"
+        elif tiene_jobs_activos:
+            # Hay jobs en cola o procesando
+            estado_calculado = "procesando"
+        elif archivos_pendientes > 0:
+            # Hay al menos un archivo pendiente
+            estado_calculado = "pendiente"
+        elif archivos_procesados == total_archivos and archivos_procesados > 0:
+            # Todos los archivos están procesados
+            estado_calculado = "procesado"
+        else:
+            # Fallback: si hay archivos pero no se pudo determinar el estado, asumir pendiente
+            estado_calculado = "pendiente" if total_archivos > 0 else "vacio"
+    
+    return archivos, estado_calculado
+
+
+
+def _periodo_detail_signature(periodo_manager, upload_manager, processed_tracker) -> Tuple[Any, ...]:
+    """
+    Obtiene la firma de los archivos de los que depende el detalle de un periodo
+    (bloqueante, para usar en threadpool).
+    
+    Args:
+        periodo_manager: Gestor de periodos
+        upload_manager: Gestor de PDFs subidos
+        processed_tracker: Tracker de archivos procesados directamente
         
-        # Calcular estado del periodo basado en los 4 estados posibles
-        # 1. "procesando" - si hay jobs activos (queued/processing)
-        # 2. "procesado" - si todos los archivos están completados
-        # 3. "pendiente" - si hay archivos subidos pero no procesados
-        # 4. "subiendo" - si hay archivos recién subidos (menos de 5 segundos desde upload)
+    Returns:
+        Tupla con las firmas del tracking de periodos, de la metadata de uploads y del tracking
+    """
+    return (
+        periodo_manager.get_signature(),
+        upload_manager.get_metadata_signature(),
+        processed_tracker.get_signature()
+    )
+
+
+@app.get("/api/v1/periodos/{periodo_id}", response_model=PeriodoDetailResponse, tags=["Periodos"])
+@limiter.limit("30/minute")  # Máximo 30 requests por minuto por IP
+async def get_periodo_detail(
+    request: Request, 
+    periodo_id: str = Depends(validate_periodo_id),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+):
+    """
+    Obtiene el detalle completo de un periodo incluyendo sus archivos.
+    Requiere autenticación.
+    
+    Envía un ETag calculado con las firmas de los datos de los que depende el detalle
+    (periodos, JSONs estructurados, uploads, tracking y jobs del periodo); si el
+    cliente ya tiene esa versión (If-None-Match) responde 304 sin armar la respuesta.
+    
+    Args:
+        periodo_id: ID del periodo
         
-        worker_manager = get_worker_manager()
-        jobs_activos = worker_manager.get_jobs_by_periodo_id(periodo_id)
+    Returns:
+        Detalle del periodo con lista de archivos (o 304 si no cambió)
+    """
+    try:
+        periodo_manager = get_periodo_manager()
+        periodo_data = await asyncio.to_thread(periodo_manager.get_periodo, periodo_id)
         
-        # Contar estados de archivos
-        archivos_procesados = sum(1 for a in archivos if a.estado == "procesado")
-        archivos_pendientes = sum(1 for a in archivos if a.estado == "pendiente")
-        total_archivos = len(archivos)
+        if not periodo_data:
+            return _periodo_not_found(periodo_id)
         
-        # Verificar si hay archivos "subiendo" (subidos pero sin job creado aún)
-        # Un archivo está "subiendo" si:
-        # - Está subido (en uploaded_files)
-        # - No tiene job activo asociado
-        # - No está procesado
-        archivos_subiendo = 0
-        file_ids_subidos = {uf.get("file_id") for uf in uploaded_files 
-                           if uf.get("metadata", {}).get("periodo_id") == periodo_id}
-        file_ids_con_job = {job.file_id for job in jobs_activos}
+        processed_tracker = get_processed_tracker()
+        upload_manager = get_upload_manager()
+        structured_index = get_structured_index()
+        await asyncio.to_thread(structured_index.refresh)
         
-        for file_id in file_ids_subidos:
-            # Si el archivo está subido pero no tiene job, está "subiendo"
-            if file_id not in file_ids_con_job:
-                metadata_file = upload_manager.get_uploaded_metadata(file_id)
-                if metadata_file and not metadata_file.get("processed", False):
-                    archivos_subiendo += 1
+        # Jobs del periodo (en memoria): su estado también define el estado del periodo
+        worker_manager = get_worker_manager()
+        jobs_activos = worker_manager.get_jobs_by_periodo_id(periodo_id)
         
-        # Verificar si hay jobs activos (queued o processing)
-        tiene_jobs_activos = any(
-            job.status in ["queued", "processing"] 
-            for job in jobs_activos
+        # La firma se calcula antes de armar la respuesta: si algo cambia mientras tanto,
+        # el ETag enviado queda desactualizado y el siguiente request recibe el detalle nuevo
+        etag = _signature_etag(
+            "periodo-detail", periodo_id,
+            await asyncio.to_thread(_periodo_detail_signature, periodo_manager, upload_manager, processed_tracker),
+            structured_index.get_signature(),
+            sorted((job.file_id, job.status) for job in jobs_activos)
         )
+        if _etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
         
-        # Verificar primero si el periodo está "cerrado" en la base de datos
-        # Si está cerrado, no calcular dinámicamente, usar "cerrado" directamente
-        estado_guardado = periodo_data.get("estado", "")
-        
-        # CRÍTICO: SIEMPRE respetar el estado "cerrado" - no calcular dinámicamente
-        # El estado "cerrado" tiene prioridad absoluta sobre cualquier cálculo dinámico
-        if estado_guardado and estado_guardado.lower() == "cerrado":
-            # Si el periodo está cerrado, usar "cerrado" directamente sin calcular
-            estado_calculado = "cerrado"
-            logger.info(f"Periodo {periodo_id} está CERRADO - usando estado 'cerrado' sin calcular")
-        else:
-            # Calcular estado según prioridad (según requerimientos del usuario):
-            # 1. Si no hay archivos → "vacio"
-            # 2. Si hay al menos uno pendiente → "pendiente"
-            # 3. Si todos están procesados → "procesado"
-            estado_calculado = "pendiente"
-            if total_archivos == 0:
-                # No hay archivos
-                estado_calculado = "vacio"
-            elif archivos_subiendo > 0:
-                # Hay archivos recién subidos (estado "subiendo")
-                estado_calculado = "subiendo"
-            elif tiene_jobs_activos:
-                # Hay jobs en cola o procesando
-                estado_calculado = "procesando"
-            elif archivos_pendientes > 0:
-                # Hay al menos un archivo pendiente
-                estado_calculado = "pendiente"
-            elif archivos_procesados == total_archivos and archivos_procesados > 0:
-                # Todos los archivos están procesados
-                estado_calculado = "procesado"
-            else:
-                # Fallback: si hay archivos pero no se pudo determinar el estado, asumir pendiente
-                estado_calculado = "pendiente" if total_archivos > 0 else "vacio"
-        
-        # Función helper para formatear fechas
-        def format_date(date_str: Optional[str]) -> Optional[str]:
-            """Formatea fecha ISO a formato DD/MM/YYYY, HH:MM"""
-            if not date_str:
-                return None
-            try:
-                dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                return dt.strftime("%d/%m/%Y, %H:%M")
-            except Exception:
-                return date_str  # Si falla, retornar original
+        # Archivos y estado del periodo: lee la metadata de uploads, se hace en el threadpool
+        archivos, estado_calculado = await asyncio.to_thread(
+            _build_periodo_archivos, periodo_id, periodo_data, periodo_manager,
+            upload_manager, processed_tracker, structured_index, jobs_activos
+        )
         
         # Calcular registros dinámicamente: total de archivos (procesados + pendientes)
-        registros_calculados = total_archivos
+        registros_calculados = len(archivos)
         
-        periodo_info = PeriodoInfo(
+        periodo_info = PeriodoInfo.model_construct(
             periodo_id=periodo_data["periodo_id"],
             periodo=periodo_data["periodo"],
             tipo=periodo_data["tipo"],
             estado=estado_calculado,  # Usar estado calculado o "cerrado" si está bloqueado
             registros=registros_calculados,  # Usar registros calculados dinámicamente
-            ultimo_procesamiento=format_date(periodo_data.get("ultimo_procesamiento")),
-            created_at=format_date(periodo_data.get("created_at"))
+            ultimo_procesamiento=_format_periodo_date(periodo_data.get("ultimo_procesamiento")),
+            created_at=_format_periodo_date(periodo_data.get("created_at"))
         )
         
-        return PeriodoDetailResponse(
+        response = _model_json_response(PeriodoDetailResponse(
             success=True,
             periodo=periodo_info,
             archivos=archivos,
             total_archivos=len(archivos)
-        )
+        ))
+        response.headers["ETag"] = etag
+        return response
     
     except HTTPException:
         raise
@@ -5435,10 +5862,11 @@ async def get_periodo_detail(
 
 @app.put("/api/v1/periodos/{periodo_id}", response_model=PeriodoResponse, tags=["Periodos"])
 @limiter.limit("20/minute")  # Máximo 20 requests por minuto por IP
+@_handle_periodo_errors("Error al actualizar periodo")
 async def update_periodo(
     request: Request, 
-    periodo_id: str, 
-    updates: Dict[str, Any],
+    updates: UpdatePeriodoRequest,
+    periodo_id: str = Depends(validate_periodo_id),
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ):
     """
@@ -5450,56 +5878,33 @@ async def update_periodo(
         
     Returns:
         Periodo actualizado
-    """
-    # Verificar autenticación y estado del usuario
-    get_current_user_email(credentials)
-    
-    try:
-        periodo_manager = get_periodo_manager()
-        periodo_data = periodo_manager.update_periodo(periodo_id, updates)
-        
-        if not periodo_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Periodo {periodo_id} no encontrado"
-            )
-        
-        # Función helper para formatear fechas
-        def format_date(date_str: Optional[str]) -> Optional[str]:
-            """Formatea fecha ISO a formato DD/MM/YYYY, HH:MM"""
-            if not date_str:
-                return None
-            try:
-                dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                return dt.strftime("%d/%m/%Y, %H:%M")
-            except Exception:
-                return date_str  # Si falla, retornar original
-        
-        periodo_info = PeriodoInfo(
-            periodo_id=periodo_data["periodo_id"],
-            periodo=periodo_data["periodo"],
-            tipo=periodo_data["tipo"],
-            estado=periodo_data["estado"],
-            registros=periodo_data["registros"],
-            ultimo_procesamiento=format_date(periodo_data.get("ultimo_procesamiento")),
-            created_at=format_date(periodo_data.get("created_at"))
-        )
-        
-        return PeriodoResponse(success=True, periodo=periodo_info)
+    """
+    # Verificar autenticación y estado del usuario
+    get_current_user_email(credentials)
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.exception(f"Error actualizando periodo: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error al actualizar periodo: {str(e)}"
-        )
+    periodo_manager = get_periodo_manager()
+    periodo_data = await asyncio.to_thread(periodo_manager.update_periodo, periodo_id, updates.model_dump(exclude_unset=True))
+    
+    if not periodo_data:
+        return _periodo_not_found(periodo_id)
+    
+    periodo_info = PeriodoInfo.model_construct(
+        periodo_id=periodo_data["periodo_id"],
+        periodo=periodo_data["periodo"],
+        tipo=periodo_data["tipo"],
+        estado=periodo_data["estado"],
+        registros=periodo_data["registros"],
+        ultimo_procesamiento=_format_periodo_date(periodo_data.get("ultimo_procesamiento")),
+        created_at=_format_periodo_date(periodo_data.get("created_at"))
+    )
+    
+    return _periodo_json_response(periodo_info)
 
 
 @app.delete("/api/v1/periodos/{periodo_id}", tags=["Periodos"])
+@_handle_periodo_errors("Error al eliminar periodo")
 async def delete_periodo(
-    periodo_id: str,
+    periodo_id: str = Depends(validate_periodo_id),
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ):
     """
@@ -5519,45 +5924,108 @@ async def delete_periodo(
     # Verificar autenticación y estado del usuario
     get_current_user_email(credentials)
     
-    try:
-        periodo_manager = get_periodo_manager()
-        upload_manager = get_upload_manager()
-        
-        # Eliminar periodo y eliminar archivos físicos asociados
-        deleted = periodo_manager.delete_periodo(
-            periodo_id, 
-            upload_manager=upload_manager, 
-            delete_files=True  # Eliminar archivos físicos y metadatas
-        )
+    periodo_manager = get_periodo_manager()
+    upload_manager = get_upload_manager()
+    
+    # Eliminar periodo y eliminar archivos físicos asociados
+    deleted = await asyncio.to_thread(
+        periodo_manager.delete_periodo,
+        periodo_id, 
+        upload_manager=upload_manager, 
+        delete_files=True  # Eliminar archivos físicos y metadatas
+    )
+    
+    if not deleted:
+        return _periodo_not_found(periodo_id)
+    _resumen_ps_cache.pop(periodo_id, None)
+    
+    return _json_bytes_response(_PERIODO_DELETED_TEMPLATE % orjson.dumps(f"Periodo {periodo_id} eliminado"))
+
+
+def _resumen_ps_items(items_data: List[Dict[str, Any]], periodo_tipo: str) -> List[Dict[str, Any]]:
+    """
+    Convierte los items de un consolidado al formato PeriodoResumenPSItem.
+    
+    Args:
+        items_data: Items de consolidado["resumen_ps"][tipo]
+        periodo_tipo: "onshore" | "offshore" (en minúsculas)
         
-        if not deleted:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Periodo {periodo_id} no encontrado"
-            )
+    Returns:
+        Lista de items para PeriodoResumenPSResponse
+    """
+    items = []
+    for item in items_data:
+        if periodo_tipo == "onshore":
+            # Para OnShore, incluir todos los campos
+            items.append({
+                "department": item.get("department", "---"),
+                "discipline": item.get("discipline", "---"),
+                "total_us": item.get("total_us", 0.0),
+                "total_horas": item.get("total_hours", 0.0),  # Mapear total_hours a total_horas
+                "ratios_edp": (item.get("total_us", 0.0) / item.get("total_hours", 1.0)) if item.get("total_hours", 0.0) > 0 else 0.0,
+                "job_no": item.get("job_no", "---"),
+                "wages": item.get("wages", 0.0),
+                "expatriate_allowances": item.get("expatriate_allowances", 0.0),
+                "multiplier": item.get("multiplier", 0.0),
+                "odc": item.get("odc", 0.0),
+                "epp": item.get("epp", 0.0),
+                "total_hours": item.get("total_hours", 0.0)
+            })
+        else:
+            # Para OffShore
+            items.append({
+                "department": item.get("department", "---"),
+                "discipline": item.get("discipline", "---"),
+                "total_us": item.get("total_us", 0.0),
+                "total_horas": item.get("total_horas", 0.0),
+                "ratios_edp": item.get("ratios_edp", 0.0)
+            })
+    return items
+
+
+def _build_resumen_ps_body(consolidator, periodo_id: str, periodo_tipo: str) -> Optional[bytes]:
+    """
+    Lee el consolidado de un periodo y serializa su PeriodoResumenPSResponse.
+    
+    Args:
+        consolidator: ResumenConsolidator del output configurado
+        periodo_id: ID del periodo
+        periodo_tipo: "onshore" | "offshore" (en minúsculas)
         
-        return {"success": True, "message": f"Periodo {periodo_id} eliminado"}
+    Returns:
+        JSON de la respuesta, o None si el consolidado no existe o no se pudo leer
+    """
+    consolidado = consolidator.load_consolidado(periodo_id)
+    if not consolidado:
+        return None
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.exception(f"Error eliminando periodo: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error al eliminar periodo: {str(e)}"
-        )
+    items = _resumen_ps_items(consolidado.get("resumen_ps", {}).get(periodo_tipo, []), periodo_tipo)
+    resumen = PeriodoResumenPSResponse(
+        success=True,
+        periodo_id=periodo_id,
+        tipo=periodo_tipo,
+        items=items,
+        total=len(items)
+    )
+    return resumen.model_dump_json().encode()
 
 
 @app.get("/api/v1/periodos/{periodo_id}/resumen-ps", response_model=PeriodoResumenPSResponse, tags=["Periodos"])
+@_handle_periodo_errors("Error al obtener resumen PS")
 async def get_periodo_resumen_ps(
-    periodo_id: str,
+    request: Request,
+    periodo_id: str = Depends(validate_periodo_id),
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ):
     """
     Obtiene el resumen PS (Off-Shore/On-Shore) de un periodo.
     
+    Si el consolidado ya existe, la respuesta lleva un ETag (derivado del mtime y
+    tamaño del consolidado) y se responde 304 si el cliente ya tiene esa versión.
+    
     Args:
         periodo_id: ID del periodo
+        request: Request de FastAPI (para If-None-Match)
         
     Returns:
         Resumen PS con Department, Discipline, Total US $, Total Horas, Ratios EDP
@@ -5565,129 +6033,142 @@ async def get_periodo_resumen_ps(
     # Verificar autenticación y estado del usuario
     get_current_user_email(credentials)
     
+    periodo_manager = get_periodo_manager()
+    # Requests simultáneos por el mismo periodo comparten una sola lectura
+    periodo_data = await _single_flight(("periodo", periodo_id), periodo_manager.get_periodo, periodo_id)
+    
+    if not periodo_data:
+        return _periodo_not_found(periodo_id)
+    
+    # Intentar cargar consolidado desde archivo
+    from ..services.resumen_consolidator import ResumenConsolidator
+    from ..api.dependencies import get_file_manager
+    
+    file_manager = get_file_manager()
+    consolidator = ResumenConsolidator(output_folder=file_manager.get_output_folder() or Path("./output"))
+    
+    # ETag del consolidado en disco: si el cliente ya lo tiene, no se lee ni se serializa
+    periodo_tipo = periodo_data.get("tipo", "offshore").lower()
     try:
-        periodo_manager = get_periodo_manager()
-        periodo_data = periodo_manager.get_periodo(periodo_id)
-        
-        if not periodo_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Periodo {periodo_id} no encontrado"
-            )
-        
-        # Intentar cargar consolidado desde archivo
-        from ..services.resumen_consolidator import ResumenConsolidator
-        from ..api.dependencies import get_file_manager
-        
-        file_manager = get_file_manager()
-        consolidator = ResumenConsolidator(output_folder=file_manager.get_output_folder() or Path("./output"))
-        consolidado = consolidator.load_consolidado(periodo_id)
+        consolidado_stat = consolidator.get_consolidado_path(periodo_id).stat()
+    except OSError:
+        consolidado_stat = None
+    if consolidado_stat is not None:
+        etag = _signature_etag(
+            "resumen-ps", periodo_id, periodo_tipo, consolidado_stat.st_mtime_ns, consolidado_stat.st_size
+        )
+        if _etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        # Respuesta ya serializada para esta versión del consolidado
+        cached = _resumen_ps_cache.get(periodo_id)
+        if cached and cached[0] == etag:
+            return Response(content=cached[1], media_type="application/json", headers={"ETag": etag})
+        
+        # Leer y serializar el consolidado una sola vez aunque lleguen varios requests a la vez;
+        # mientras el consolidado no cambie se reutiliza tal cual
+        body = await _single_flight(
+            ("resumen-ps", periodo_id, etag),
+            _build_resumen_ps_body, consolidator, periodo_id, periodo_tipo
+        )
+        if body is not None:
+            _resumen_ps_cache[periodo_id] = (etag, body)
+            return Response(content=body, media_type="application/json", headers={"ETag": etag})
+    
+    # Si no hay consolidado, intentar consolidar ahora (puede que los JSONs aún existan)
+    request_ids = await asyncio.to_thread(periodo_manager.get_archivos_from_periodo, periodo_id)
+    if request_ids:
+        periodo_tipo = periodo_data.get("tipo", "offshore")
+        # La consolidación lee todos los JSONs estructurados del periodo: se ejecuta en un
+        # thread (sin bloquear el event loop) y una sola vez aunque lleguen varios requests
+        consolidado = await _single_flight(
+            ("consolidar-ps", periodo_id),
+            consolidator.consolidate_periodo,
+            periodo_id=periodo_id,
+            periodo_tipo=periodo_tipo,
+            request_ids=request_ids
+        )
         
-        if consolidado:
-            # Convertir consolidado a formato de respuesta
-            periodo_tipo = periodo_data.get("tipo", "offshore").lower()
-            items_data = consolidado.get("resumen_ps", {}).get(periodo_tipo, [])
-            
-            # Convertir items a formato PeriodoResumenPSItem
-            items = []
-            for item in items_data:
-                if periodo_tipo == "onshore":
-                    # Para OnShore, incluir todos los campos
-                    items.append({
-                        "department": item.get("department", "---"),
-                        "discipline": item.get("discipline", "---"),
-                        "total_us": item.get("total_us", 0.0),
-                        "total_horas": item.get("total_hours", 0.0),  # Mapear total_hours a total_horas
-                        "ratios_edp": (item.get("total_us", 0.0) / item.get("total_hours", 1.0)) if item.get("total_hours", 0.0) > 0 else 0.0,
-                        "job_no": item.get("job_no", "---"),
-                        "wages": item.get("wages", 0.0),
-                        "expatriate_allowances": item.get("expatriate_allowances", 0.0),
-                        "multiplier": item.get("multiplier", 0.0),
-                        "odc": item.get("odc", 0.0),
-                        "epp": item.get("epp", 0.0),
-                        "total_hours": item.get("total_hours", 0.0)
-                    })
-                else:
-                    # Para OffShore
-                    items.append({
-                        "department": item.get("department", "---"),
-                        "discipline": item.get("discipline", "---"),
-                        "total_us": item.get("total_us", 0.0),
-                        "total_horas": item.get("total_horas", 0.0),
-                        "ratios_edp": item.get("ratios_edp", 0.0)
-                    })
-            
-            return PeriodoResumenPSResponse(
-                success=True,
-                periodo_id=periodo_id,
-                tipo=periodo_tipo,
-                items=items,
-                total=len(items)
-            )
-        else:
-            # Si no hay consolidado, intentar consolidar ahora (puede que los JSONs aún existan)
-            request_ids = periodo_manager.get_archivos_from_periodo(periodo_id)
-            if request_ids:
-                periodo_tipo = periodo_data.get("tipo", "offshore")
-                consolidado = consolidator.consolidate_periodo(
-                    periodo_id=periodo_id,
-                    periodo_tipo=periodo_tipo,
-                    request_ids=request_ids
-                )
-                
-                # Convertir y retornar
-                items_data = consolidado.get("resumen_ps", {}).get(periodo_tipo.lower(), [])
-                items = []
-                for item in items_data:
-                    if periodo_tipo.lower() == "onshore":
-                        items.append({
-                            "department": item.get("department", "---"),
-                            "discipline": item.get("discipline", "---"),
-                            "total_us": item.get("total_us", 0.0),
-                            "total_horas": item.get("total_hours", 0.0),
-                            "ratios_edp": (item.get("total_us", 0.0) / item.get("total_hours", 1.0)) if item.get("total_hours", 0.0) > 0 else 0.0,
-                            "job_no": item.get("job_no", "---"),
-                            "wages": item.get("wages", 0.0),
-                            "expatriate_allowances": item.get("expatriate_allowances", 0.0),
-                            "multiplier": item.get("multiplier", 0.0),
-                            "odc": item.get("odc", 0.0),
-                            "epp": item.get("epp", 0.0),
-                            "total_hours": item.get("total_hours", 0.0)
-                        })
-                    else:
-                        items.append({
-                            "department": item.get("department", "---"),
-                            "discipline": item.get("discipline", "---"),
-                            "total_us": item.get("total_us", 0.0),
-                            "total_horas": item.get("total_horas", 0.0),
-                            "ratios_edp": item.get("ratios_edp", 0.0)
-                        })
-                
-                return PeriodoResumenPSResponse(
-                    success=True,
-                    periodo_id=periodo_id,
-                    tipo=periodo_tipo.lower(),
-                    items=items,
-                    total=len(items)
-                )
+        # Convertir y retornar
+        items_data = consolidado.get("resumen_ps", {}).get(periodo_tipo.lower(), [])
+        items = _resumen_ps_items(items_data, periodo_tipo.lower())
         
-        # Si no hay archivos procesados, retornar vacío
-        return PeriodoResumenPSResponse(
+        return _model_json_response(PeriodoResumenPSResponse(
             success=True,
             periodo_id=periodo_id,
-            tipo=periodo_data.get("tipo", "offshore"),
-            items=[],
-            total=0
-        )
+            tipo=periodo_tipo.lower(),
+            items=items,
+            total=len(items)
+        ))
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.exception(f"Error obteniendo resumen PS: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error al obtener resumen PS: {str(e)}"
-        )
+    # Si no hay archivos procesados, retornar vacío
+    return _model_json_response(PeriodoResumenPSResponse(
+        success=True,
+        periodo_id=periodo_id,
+        tipo=periodo_data.get("tipo", "offshore"),
+        items=[],
+        total=0
+    ))
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """
+    Destino no seekable para zipfile: acumula lo escrito hasta que se consume con pop().
+    """
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def pop(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_zip_stream(archivos: List[Tuple[Path, str]], log_prefix: str = "", chunk_size: int = 1 << 20) -> Iterator[bytes]:
+    """
+    Genera un ZIP por partes a partir de archivos en disco.
+    
+    Los archivos se guardan sin recomprimir (ZIP_STORED): son ZIPs y Excels, que ya
+    están comprimidos. Se lee y envía de a chunk_size bytes, así que la memoria
+    usada no depende del tamaño del periodo. Es un generador síncrono:
+    StreamingResponse lo consume en el threadpool.
+    
+    Args:
+        archivos: Lista de (ruta en disco, nombre dentro del ZIP)
+        log_prefix: Prefijo para los logs
+        chunk_size: Bytes leídos por lectura
+        
+    Yields:
+        Bytes del ZIP
+    """
+    import zipfile
+    
+    buffer = _ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as zip_stream:
+        for ruta, nombre in archivos:
+            try:
+                zinfo = zipfile.ZipInfo.from_file(ruta, nombre)
+                src = open(ruta, 'rb')
+            except OSError as e:
+                # El archivo desapareció desde que se listó: se omite (la respuesta ya empezó)
+                logger.warning(f"{log_prefix} No se pudo agregar {nombre}: {e}")
+                continue
+            with src, zip_stream.open(zinfo, 'w') as dest:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    yield buffer.pop()
+            yield buffer.pop()
+    yield buffer.pop()
 
 
 @app.post("/api/v1/periodos/{periodo_id}/exportar", tags=["Periodos"])
@@ -5708,21 +6189,18 @@ async def exportar_periodo(
         periodo_id: ID del periodo (ej: "2025-11-onshore")
         
     Returns:
-        Redirección a /public/{periodo_id}_export_{timestamp}.zip
+        ZIP {periodo_id}_export_{timestamp}.zip generado en streaming
     """
     # Verificar autenticación y estado del usuario
     get_current_user_email(credentials)
     
-    from fastapi.responses import RedirectResponse
-    import zipfile
-    
     periodo_manager = get_periodo_manager()
     upload_manager = get_upload_manager()
     processed_tracker = get_processed_tracker()
     archive_manager = get_archive_manager()
     
     # 1. Verificar que el periodo existe
-    periodo_data = periodo_manager.get_periodo(periodo_id)
+    periodo_data = await asyncio.to_thread(periodo_manager.get_periodo, periodo_id)
     if not periodo_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -5730,7 +6208,7 @@ async def exportar_periodo(
         )
     
     # 2. Obtener todos los request_ids de archivos procesados del periodo
-    request_ids = periodo_manager.get_archivos_from_periodo(periodo_id)
+    request_ids = await asyncio.to_thread(periodo_manager.get_archivos_from_periodo, periodo_id)
     
     if not request_ids:
         raise HTTPException(
@@ -5739,43 +6217,9 @@ async def exportar_periodo(
         )
     
     # 3. Buscar zip_filename y excel_filename para cada request_id
-    archivos_para_exportar = []
-    
-    # Buscar en archivos procesados desde upload-pdf
-    uploaded_files = upload_manager.list_uploaded_files(processed=True)
-    for f in uploaded_files:
-        request_id = f.get("request_id")
-        if request_id and request_id in request_ids:
-            zip_filename = f.get("zip_filename")
-            excel_filename = f.get("excel_filename")
-            filename = f.get("filename", "unknown")
-            
-            if zip_filename or excel_filename:
-                archivos_para_exportar.append({
-                    "request_id": request_id,
-                    "filename": filename,
-                    "zip_filename": zip_filename,
-                    "excel_filename": excel_filename
-                })
-    
-    # Buscar también en archivos procesados directamente (por si acaso)
-    direct_files = processed_tracker.get_processed_files()
-    for f in direct_files:
-        request_id = f.get("request_id")
-        if request_id and request_id in request_ids:
-            # Verificar que no esté ya en la lista
-            if not any(a["request_id"] == request_id for a in archivos_para_exportar):
-                zip_filename = f.get("zip_filename")
-                excel_filename = f.get("excel_filename")
-                filename = f.get("filename", "unknown")
-                
-                if zip_filename or excel_filename:
-                    archivos_para_exportar.append({
-                        "request_id": request_id,
-                        "filename": filename,
-                        "zip_filename": zip_filename,
-                        "excel_filename": excel_filename
-                    })
+    archivos_para_exportar = await asyncio.to_thread(
+        _find_export_files, upload_manager, processed_tracker, request_ids
+    )
     
     if not archivos_para_exportar:
         raise HTTPException(
@@ -5783,72 +6227,40 @@ async def exportar_periodo(
             detail=f"No se encontraron archivos ZIP/Excel para exportar del periodo '{periodo_id}'"
         )
     
-    # 4. Crear ZIP maestro con todos los archivos
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    zip_maestro_filename = f"{periodo_id}_export_{timestamp}.zip"
-    zip_maestro_path = archive_manager.public_folder / zip_maestro_filename
-    
-    archivos_agregados = 0
+    # 4. Verificar qué archivos existen en disco
+    archivos_zip = []
     archivos_no_encontrados = []
+    for archivo_info in archivos_para_exportar:
+        for tipo, key in (("ZIP", "zip_filename"), ("Excel", "excel_filename")):
+            nombre = archivo_info.get(key)
+            if not nombre:
+                continue
+            ruta = archive_manager.public_folder / nombre
+            if ruta.is_file():
+                # En la raíz del ZIP maestro, sin subcarpetas
+                archivos_zip.append((ruta, nombre))
+            else:
+                archivos_no_encontrados.append(f"{tipo}: {nombre}")
     
-    try:
-        with zipfile.ZipFile(zip_maestro_path, 'w', zipfile.ZIP_DEFLATED) as zip_maestro:
-            for archivo_info in archivos_para_exportar:
-                # Agregar ZIP si existe
-                if archivo_info.get("zip_filename"):
-                    zip_filename = archivo_info["zip_filename"]
-                    zip_path = archive_manager.public_folder / zip_filename
-                    
-                    if zip_path.exists():
-                        # Agregar al ZIP maestro (en la raíz, sin subcarpetas)
-                        zip_maestro.write(zip_path, zip_filename)
-                        archivos_agregados += 1
-                        logger.info(f"[Export {periodo_id}] Agregado ZIP: {zip_filename}")
-                    else:
-                        archivos_no_encontrados.append(f"ZIP: {zip_filename}")
-                
-                # Agregar Excel si existe
-                if archivo_info.get("excel_filename"):
-                    excel_filename = archivo_info["excel_filename"]
-                    excel_path = archive_manager.public_folder / excel_filename
-                    
-                    if excel_path.exists():
-                        # Agregar al ZIP maestro (en la raíz, sin subcarpetas)
-                        zip_maestro.write(excel_path, excel_filename)
-                        archivos_agregados += 1
-                        logger.info(f"[Export {periodo_id}] Agregado Excel: {excel_filename}")
-                    else:
-                        archivos_no_encontrados.append(f"Excel: {excel_filename}")
-        
-        if archivos_agregados == 0:
-            # Si no se agregó ningún archivo, eliminar el ZIP vacío
-            zip_maestro_path.unlink()
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"No se encontraron archivos físicos para exportar del periodo '{periodo_id}'. Archivos no encontrados: {', '.join(archivos_no_encontrados)}"
-            )
-        
-        logger.info(f"[Export {periodo_id}] ZIP maestro creado: {zip_maestro_filename} ({archivos_agregados} archivos)")
-        
-        if archivos_no_encontrados:
-            logger.warning(f"[Export {periodo_id}] Algunos archivos no se encontraron: {', '.join(archivos_no_encontrados)}")
-        
-        # 5. Redirigir a la descarga del ZIP maestro
-        return RedirectResponse(url=f"/public/{zip_maestro_filename}", status_code=302)
-    
-    except Exception as e:
-        logger.exception(f"Error exportando periodo {periodo_id}: {e}")
-        # Limpiar ZIP maestro si se creó parcialmente
-        if zip_maestro_path.exists():
-            try:
-                zip_maestro_path.unlink()
-            except Exception:
-                pass
-        
+    if not archivos_zip:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error creando exportación del periodo: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No se encontraron archivos físicos para exportar del periodo '{periodo_id}'. Archivos no encontrados: {', '.join(archivos_no_encontrados)}"
         )
+    
+    if archivos_no_encontrados:
+        logger.warning(f"[Export {periodo_id}] Algunos archivos no se encontraron: {', '.join(archivos_no_encontrados)}")
+    
+    # 5. Enviar el ZIP maestro a medida que se arma (sin escribirlo completo en disco ni en memoria)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    zip_maestro_filename = f"{periodo_id}_export_{timestamp}.zip"
+    logger.info(f"[Export {periodo_id}] Enviando ZIP maestro: {zip_maestro_filename} ({len(archivos_zip)} archivos)")
+    
+    return StreamingResponse(
+        _iter_zip_stream(archivos_zip, log_prefix=f"[Export {periodo_id}]"),
+        media_type="application/zip",
+        headers={"Content-Disposition": _attachment_content_disposition(zip_maestro_filename)}
+    )
 
 
 @app.get("/api/v1/periodos/{periodo_id}/resumen-ps/exportar-excel", tags=["Periodos"])
@@ -5875,13 +6287,10 @@ async def exportar_resumen_ps_excel(
         from openpyxl.utils import get_column_letter
         
         periodo_manager = get_periodo_manager()
-        periodo_data = periodo_manager.get_periodo(periodo_id)
+        periodo_data = await asyncio.to_thread(periodo_manager.get_periodo, periodo_id)
         
         if not periodo_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Periodo {periodo_id} no encontrado"
-            )
+            return _periodo_not_found(periodo_id)
         
         # Cargar consolidado
         from ..services.resumen_consolidator import ResumenConsolidator
@@ -5889,7 +6298,7 @@ async def exportar_resumen_ps_excel(
         
         file_manager = get_file_manager()
         consolidator = ResumenConsolidator(output_folder=file_manager.get_output_folder() or Path("./output"))
-        consolidado = consolidator.load_consolidado(periodo_id)
+        consolidado = await asyncio.to_thread(consolidator.load_consolidado, periodo_id)
         
         if not consolidado:
             raise HTTPException(
@@ -6020,8 +6429,9 @@ async def exportar_resumen_ps_excel(
 
 
 @app.post("/api/v1/periodos/{periodo_id}/bloquear", response_model=PeriodoResponse, tags=["Periodos"])
+@_handle_periodo_errors("Error al bloquear periodo")
 async def bloquear_periodo(
-    periodo_id: str,
+    periodo_id: str = Depends(validate_periodo_id),
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
 ):
     """
@@ -6037,62 +6447,35 @@ async def bloquear_periodo(
     # Verificar autenticación y estado del usuario
     get_current_user_email(credentials)
     
-    try:
-        periodo_manager = get_periodo_manager()
-        
-        # Cargar apartados actuales antes de bloquear para guardar snapshot
-        maestros_data = load_maestros_data()
-        apartados_actuales = maestros_data.get("apartados", [])
-        
-        # Actualizar estado a "cerrado"
-        periodo_data = periodo_manager.update_periodo(periodo_id, {"estado": "cerrado"})
-        
-        if not periodo_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Periodo {periodo_id} no encontrado"
-            )
-        
-        # Guardar snapshot de apartados para este periodo
-        if apartados_actuales:
-            periodo_manager.save_apartados_snapshot(periodo_id, apartados_actuales)
-            logger.info(f"Snapshot de apartados guardado para periodo cerrado {periodo_id}")
-        
-        # Asegurar que el estado sea "cerrado" en la respuesta
-        periodo_data["estado"] = "cerrado"
-        
-        # Función helper para formatear fechas
-        def format_date(date_str: Optional[str]) -> Optional[str]:
-            """Formatea fecha ISO a formato DD/MM/YYYY, HH:MM"""
-            if not date_str:
-                return None
-            try:
-                dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                return dt.strftime("%d/%m/%Y, %H:%M")
-            except Exception:
-                return date_str  # Si falla, retornar original
-        
-        # Construir respuesta con el periodo actualizado
-        periodo_info = PeriodoInfo(
-            periodo_id=periodo_data["periodo_id"],
-            periodo=periodo_data["periodo"],
-            tipo=periodo_data["tipo"],
-            estado="cerrado",  # Asegurar que el estado sea "cerrado"
-            registros=periodo_data.get("registros", 0),
-            ultimo_procesamiento=format_date(periodo_data.get("ultimo_procesamiento")),
-            created_at=format_date(periodo_data.get("created_at"))
-        )
-        
-        return PeriodoResponse(success=True, periodo=periodo_info)
+    periodo_manager = get_periodo_manager()
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.exception(f"Error bloqueando periodo: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error al bloquear periodo: {str(e)}"
+    # Cargar apartados actuales antes de bloquear para guardar snapshot
+    maestros_data = load_maestros_data()
+    apartados_actuales = maestros_data.get("apartados", [])
+    
+    # Cambiar estado a "cerrado" y guardar snapshot de apartados en una sola escritura
+    periodo_data = await asyncio.to_thread(periodo_manager.close_periodo, periodo_id, apartados_actuales)
+    
+    if not periodo_data:
+        return _periodo_not_found(periodo_id)
+    
+    # Construir respuesta con el periodo actualizado
+    periodo_info = PeriodoInfo.model_construct(
+        periodo_id=periodo_data["periodo_id"],
+        periodo=periodo_data["periodo"],
+        tipo=periodo_data["tipo"],
+        estado="cerrado",  # Asegurar que el estado sea "cerrado"
+        registros=periodo_data.get("registros", 0),
+        ultimo_procesamiento=_format_periodo_date(periodo_data.get("ultimo_procesamiento")),
+        created_at=_format_periodo_date(periodo_data.get("created_at"))
     )
+    
+    return _periodo_json_response(periodo_info)
+
+
+# Incluir el detalle de la excepción en las respuestas 500 (se lee una vez al importar)
+_DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+_DEBUG_DETAILS_MAX_LENGTH = 512
 
 
 @app.exception_handler(Exception)
@@ -6101,13 +6484,13 @@ async def global_exception_handler(request: Request, exc: Exception):
     Handler global para excepciones no capturadas.
     """
     logger.exception(f"Excepción no capturada: {exc}")
-    return JSONResponse(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content={
+    return _orjson_response(
+        {
             "success": False,
             "error": "Error interno del servidor",
-            "details": str(exc) if os.getenv("DEBUG", "false").lower() == "true" else None
-        }
+            "details": str(exc)[:_DEBUG_DETAILS_MAX_LENGTH] if _DEBUG else None
+        },
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
     )
 
 
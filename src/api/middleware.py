@@ -125,3 +125,43 @@ def _validate_token_real(token: str) -> bool:
     # TODO: Implementar cuando se active autenticación
     return False
 
+
+
+class CacheControlMiddleware:
+    """
+    Middleware ASGI que agrega Cache-Control a las respuestas GET con ETag.
+    
+    Las respuestas de la API requieren token, así que no deben guardarse en caches
+    compartidos (proxy/CDN): se marcan como "private, no-cache" para que el navegador
+    las guarde y las revalide con If-None-Match (el endpoint responde 304 si no
+    cambiaron). No modifica respuestas que ya traen Cache-Control.
+    
+    Es ASGI puro (no BaseHTTPMiddleware) para no envolver las respuestas en streaming.
+    """
+    
+    def __init__(self, app, path_prefix: str = "/api/", cache_control: str = "private, no-cache"):
+        """
+        Args:
+            app: Aplicación ASGI
+            path_prefix: Solo se procesan rutas con este prefijo
+            cache_control: Valor del header Cache-Control
+        """
+        self.app = app
+        self.path_prefix = path_prefix
+        self.cache_control = cache_control.encode("latin-1")
+    
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] not in ("GET", "HEAD")
+                or not scope["path"].startswith(self.path_prefix)):
+            await self.app(scope, receive, send)
+            return
+        
+        async def send_with_cache_control(message):
+            if message["type"] == "http.response.start" and message["status"] in (200, 304):
+                headers = message.get("headers", [])
+                names = {name.lower() for name, _ in headers}
+                if b"etag" in names and b"cache-control" not in names:
+                    message["headers"] = [*headers, (b"cache-control", self.cache_control)]
+            await send(message)
+        
+        await self.app(scope, receive, send_with_cache_control)
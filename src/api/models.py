@@ -3,7 +3,7 @@ API Models - Modelos Pydantic para requests y responses
 Responsabilidad: Definir estructura de datos de la API
 """
 
-from pydantic import BaseModel, EmailStr, Field, validator
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, validator
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
@@ -433,6 +433,22 @@ class CreatePeriodoRequest(BaseModel):
         return v_lower
 
 
+class UpdatePeriodoRequest(BaseModel):
+    """
+    Campos a actualizar de un periodo (solo se aplican los enviados).
+    
+    Valida el tipo de los campos conocidos con el core de Pydantic; se aceptan
+    campos adicionales tal cual, como antes.
+    """
+    model_config = ConfigDict(extra="allow")
+    
+    periodo: Optional[str] = None
+    tipo: Optional[str] = None
+    estado: Optional[str] = None  # "vacio" | "pendiente" | "procesando" | "procesado" | "subiendo" | "cerrado"
+    registros: Optional[int] = None
+    ultimo_procesamiento: Optional[str] = None
+
+
 class PeriodoResponse(BaseModel):
     """Respuesta de un periodo."""
     success: bool
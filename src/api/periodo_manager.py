@@ -5,14 +5,30 @@ Responsabilidad: Gestionar periodos y sus archivos asociados usando archivos JSO
 
 import json
 import logging
+import functools
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from threading import RLock
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from uuid import uuid4
 
 logger = logging.getLogger(__name__)
 
 
+def _synchronized(method):
+    """
+    Ejecuta un método del gestor con su lock tomado.
+
+    Los métodos leen, modifican y reescriben el JSON completo; el lock evita que
+    dos threads (endpoints en el threadpool o workers de procesamiento) pisen sus cambios.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class PeriodoManager:
     """
     Gestor de periodos usando archivos JSON.
@@ -31,6 +47,14 @@ class PeriodoManager:
             tracking_file = Path("./periodos_tracking.json")
         
         self.tracking_file = tracking_file
+        self._lock = RLock()
+        # periodo_id -> periodo, válido mientras el archivo no cambie (mtime, tamaño)
+        self._index_key: Optional[Tuple[int, int]] = None
+        self._periodo_index: Dict[str, Dict[str, Any]] = {}
+        # Mismos periodos ordenados por created_at (más reciente primero), con la misma validez
+        self._sorted_periodos: List[Dict[str, Any]] = []
+        # True si algún periodo tiene un tipo distinto al de su periodo_id (hay que corregir)
+        self._has_tipo_mismatch = False
         self._ensure_tracking_file()
     
     def _ensure_tracking_file(self):
@@ -50,6 +74,68 @@ class PeriodoManager:
             logger.error(f"Error cargando periodos: {e}")
             return {"periodos": []}
     
+    def _get_periodo_index(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtiene el índice periodo_id -> periodo, recargándolo solo si el archivo
+        de tracking cambió (mtime o tamaño).
+        
+        Los periodos retornados se comparten entre llamadas: no deben modificarse.
+        
+        Returns:
+            Diccionario periodo_id -> periodo
+        """
+        try:
+            stat_result = self.tracking_file.stat()
+            index_key = (stat_result.st_mtime_ns, stat_result.st_size)
+        except OSError:
+            self._index_key, self._periodo_index = None, {}
+            self._sorted_periodos, self._has_tipo_mismatch = [], False
+            return self._periodo_index
+        
+        if index_key != self._index_key:
+            data = self._load_periodos()
+            periodos = data.get("periodos", [])
+            self._periodo_index = {
+                periodo.get("periodo_id"): periodo
+                for periodo in periodos
+            }
+            # El orden del listado se calcula al recargar, no en cada página
+            self._sorted_periodos = sorted(periodos, key=lambda x: x.get("created_at", ""), reverse=True)
+            self._has_tipo_mismatch = any(self._tipo_mismatch(periodo) for periodo in periodos)
+            self._index_key = index_key
+        return self._periodo_index
+    
+    @staticmethod
+    def _tipo_mismatch(periodo: Dict[str, Any]) -> Optional[str]:
+        """
+        Verifica si el tipo de un periodo coincide con el de su periodo_id ("AAAA-MM-tipo").
+        
+        Args:
+            periodo: Periodo a verificar
+            
+        Returns:
+            Tipo correcto si hay inconsistencia, None si coincide o no se puede deducir
+        """
+        partes = periodo.get("periodo_id", "").split("-")
+        if len(partes) >= 3:
+            tipo_correcto = partes[-1].lower()
+            if tipo_correcto in ["onshore", "offshore"] and periodo.get("tipo", "") != tipo_correcto:
+                return tipo_correcto
+        return None
+    
+    def get_signature(self) -> Optional[Tuple[int, int]]:
+        """
+        Obtiene una firma del archivo de tracking (para validar respuestas cacheadas).
+        
+        Returns:
+            Tupla (mtime_ns, tamaño) o None si el archivo no existe
+        """
+        try:
+            stat_result = self.tracking_file.stat()
+        except OSError:
+            return None
+        return (stat_result.st_mtime_ns, stat_result.st_size)
+    
     def _save_periodos(self, data: Dict[str, Any]):
         """Guarda los periodos en el archivo JSON."""
         try:
@@ -59,6 +145,26 @@ class PeriodoManager:
         except Exception as e:
             logger.error(f"Error guardando periodos: {e}")
             raise
+        finally:
+            # Invalidar el índice aunque el mtime no cambie (filesystems con resolución gruesa
+            # pueden dejar igual mtime y tamaño, p. ej. estado "abierto" -> "cerrado")
+            self._index_key = None
+    
+    @staticmethod
+    def _copy_periodo(periodo: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Copia un periodo del índice para retornarlo (el índice se comparte entre llamadas).
+        
+        Args:
+            periodo: Periodo indexado
+            
+        Returns:
+            Copia del periodo (con su propia lista de archivos asociados)
+        """
+        copia = dict(periodo)
+        if isinstance(copia.get("archivos_asociados"), list):
+            copia["archivos_asociados"] = list(copia["archivos_asociados"])
+        return copia
     
     def _generate_periodo_id(self, periodo: str, tipo: str) -> str:
         """
@@ -80,6 +186,7 @@ class PeriodoManager:
             # Si no tiene formato correcto, usar timestamp
             return f"{periodo.replace('/', '-')}-{tipo.lower()}-{uuid4().hex[:8]}"
     
+    @_synchronized
     def create_periodo(self, periodo: str, tipo: str) -> Dict[str, Any]:
         """
         Crea un nuevo periodo.
@@ -116,11 +223,21 @@ class PeriodoManager:
         logger.info(f"Periodo creado: {periodo_id}")
         return nuevo_periodo
     
+    @_synchronized
     def get_periodo(self, periodo_id: str) -> Optional[Dict[str, Any]]:
         """
         Obtiene un periodo por su ID.
         Valida y corrige automáticamente si hay inconsistencia entre periodo_id y tipo.
         """
+        # Camino rápido: periodo ya indexado y sin corrección pendiente
+        periodo = self._get_periodo_index().get(periodo_id)
+        if periodo is None:
+            return None
+        partes = periodo_id.split("-")
+        tipo_correcto = partes[-1].lower() if len(partes) >= 3 else ""
+        if tipo_correcto not in ["onshore", "offshore"] or periodo.get("tipo", "") == tipo_correcto:
+            return self._copy_periodo(periodo)
+        
         data = self._load_periodos()
         for periodo in data.get("periodos", []):
             if periodo.get("periodo_id") == periodo_id:
@@ -139,6 +256,7 @@ class PeriodoManager:
                 return periodo
         return None
     
+    @_synchronized
     def list_periodos(
         self, 
         tipo: Optional[str] = None,
@@ -149,35 +267,32 @@ class PeriodoManager:
         Lista periodos con filtros opcionales.
         Valida y corrige automáticamente inconsistencias entre periodo_id y tipo.
         
+        La lista ordenada se reutiliza mientras el archivo de tracking no cambie: cada
+        llamada solo aplica los filtros y copia los periodos que retorna.
+        
         Args:
             tipo: Filtrar por tipo ("onshore" | "offshore")
             estado: Filtrar por estado
             search: Buscar en periodo, periodo_id, etc.
             
         Returns:
-            Lista de periodos
+            Lista de periodos (más reciente primero)
         """
-        data = self._load_periodos()
-        periodos = data.get("periodos", [])
-        
-        # Validar y corregir tipos inconsistentes
-        needs_save = False
-        for periodo in periodos:
-            periodo_id = periodo.get("periodo_id", "")
-            tipo_actual = periodo.get("tipo", "")
-            
-            # Extraer tipo del periodo_id (formato: "AAAA-MM-tipo")
-            if "-" in periodo_id:
-                partes = periodo_id.split("-")
-                if len(partes) >= 3:
-                    tipo_correcto = partes[-1].lower()
-                    if tipo_correcto in ["onshore", "offshore"] and tipo_actual != tipo_correcto:
-                        logger.warning(f"Corrigiendo tipo inconsistente en periodo {periodo_id}: '{tipo_actual}' -> '{tipo_correcto}'")
-                        periodo["tipo"] = tipo_correcto
-                        needs_save = True
-        
-        if needs_save:
+        self._get_periodo_index()
+        
+        # Validar y corregir tipos inconsistentes (solo se relee el archivo si hay alguno)
+        if self._has_tipo_mismatch:
+            data = self._load_periodos()
+            for periodo in data.get("periodos", []):
+                tipo_correcto = self._tipo_mismatch(periodo)
+                if tipo_correcto:
+                    logger.warning(f"Corrigiendo tipo inconsistente en periodo {periodo.get('periodo_id', '')}: '{periodo.get('tipo', '')}' -> '{tipo_correcto}'")
+                    periodo["tipo"] = tipo_correcto
             self._save_periodos(data)
+            self._get_periodo_index()
+        
+        # Ordenados por created_at (más reciente primero); los filtros conservan el orden
+        periodos = list(self._sorted_periodos)
         
         # Aplicar filtros
         if tipo:
@@ -194,11 +309,9 @@ class PeriodoManager:
                 or search_lower in p.get("periodo_id", "").lower()
             ]
         
-        # Ordenar por created_at (más reciente primero)
-        periodos.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-        
-        return periodos
+        return [self._copy_periodo(p) for p in periodos]
     
+    @_synchronized
     def update_periodo(self, periodo_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Actualiza un periodo.
@@ -236,6 +349,7 @@ class PeriodoManager:
         
         return None
     
+    @_synchronized
     def delete_periodo(self, periodo_id: str, upload_manager=None, delete_files: bool = True) -> bool:
         """
         Elimina un periodo y limpia/elimina los archivos asociados.
@@ -285,6 +399,7 @@ class PeriodoManager:
         logger.info(f"Periodo eliminado: {periodo_id}")
         return True
     
+    @_synchronized
     def add_archivo_to_periodo(self, periodo_id: str, request_id: str) -> bool:
         """
         Asocia un archivo procesado (request_id) a un periodo.
@@ -318,6 +433,7 @@ class PeriodoManager:
         
         return False
     
+    @_synchronized
     def remove_archivo_from_periodo(self, periodo_id: str, request_id: str) -> bool:
         """
         Desasocia un archivo de un periodo.
@@ -348,6 +464,7 @@ class PeriodoManager:
         
         return False
     
+    @_synchronized
     def get_archivos_from_periodo(self, periodo_id: str) -> List[str]:
         """
         Obtiene la lista de request_ids asociados a un periodo.
@@ -360,9 +477,10 @@ class PeriodoManager:
         """
         periodo = self.get_periodo(periodo_id)
         if periodo:
-            return periodo.get("archivos_asociados", [])
+            return list(periodo.get("archivos_asociados", []))
         return []
     
+    @_synchronized
     def save_apartados_snapshot(self, periodo_id: str, apartados: List[Dict[str, Any]]) -> bool:
         """
         Guarda un snapshot de apartados para un periodo específico.
@@ -394,6 +512,38 @@ class PeriodoManager:
         
         return False
     
+    @_synchronized
+    def close_periodo(self, periodo_id: str, apartados: Optional[List[Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Cierra un periodo (estado "cerrado") y guarda el snapshot de apartados
+        en una sola lectura/escritura del archivo de tracking.
+        
+        Args:
+            periodo_id: ID del periodo
+            apartados: Apartados vigentes a guardar como snapshot (None o vacío = no guardar)
+            
+        Returns:
+            Periodo actualizado o None si no existe
+        """
+        data = self._load_periodos()
+        
+        for periodo in data.get("periodos", []):
+            if periodo.get("periodo_id") == periodo_id:
+                periodo["estado"] = "cerrado"
+                if apartados:
+                    import copy
+                    periodo["apartados_snapshot"] = copy.deepcopy(apartados)
+                    periodo["apartados_snapshot_created_at"] = datetime.now().isoformat()
+                
+                self._save_periodos(data)
+                logger.info(f"Periodo cerrado: {periodo_id}")
+                if apartados:
+                    logger.info(f"Snapshot de apartados guardado para periodo {periodo_id} ({len(apartados)} apartados)")
+                return periodo
+        
+        return None
+    
+    @_synchronized
     def get_apartados_snapshot(self, periodo_id: str) -> Optional[List[Dict[str, Any]]]:
         """
         Obtiene el snapshot de apartados de un periodo si existe.
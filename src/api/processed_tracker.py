@@ -5,7 +5,8 @@ Responsabilidad: Rastrear archivos procesados directamente (sin upload previo)
 
 import json
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from threading import Lock
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 
 
@@ -25,6 +26,12 @@ class ProcessedTracker:
         """
         self.tracking_file = Path(tracking_file)
         self.tracking_file.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Cache del tracking para búsquedas: (mtime_ns, tamaño) -> datos e índice por nombre de ZIP/Excel
+        self._cache_lock = Lock()
+        self._cache_key: Optional[Tuple[int, int]] = None
+        self._cache_data: Dict[str, Any] = {}
+        self._filename_index: Dict[str, str] = {}
     
     def add_processed_file(self, request_id: str, filename: str, zip_filename: str, 
                           download_url: str, metadata: Dict[str, Any],
@@ -62,10 +69,14 @@ class ProcessedTracker:
         
         self._save_tracking(tracking_data)
     
-    def get_processed_files(self) -> List[Dict[str, Any]]:
+    def get_processed_files(self, ordered: bool = True) -> List[Dict[str, Any]]:
         """
         Obtiene todos los archivos procesados.
         
+        Args:
+            ordered: Si True, ordena por fecha de procesamiento (más reciente primero).
+                     False para los llamadores que seleccionan su propio top-N.
+        
         Returns:
             Lista de archivos procesados
         """
@@ -73,10 +84,85 @@ class ProcessedTracker:
         files = list(tracking_data.values())
         
         # Ordenar por fecha (más reciente primero)
-        files.sort(key=lambda x: x.get("processed_at", ""), reverse=True)
+        if ordered:
+            files.sort(key=lambda x: x.get("processed_at", ""), reverse=True)
         
         return files
     
+    def get_signature(self) -> Optional[Tuple[int, int]]:
+        """
+        Obtiene una firma del archivo de tracking (para validar respuestas cacheadas).
+        
+        Returns:
+            Tupla (mtime_ns, tamaño) o None si el archivo no existe
+        """
+        try:
+            stat_result = self.tracking_file.stat()
+        except OSError:
+            return None
+        return (stat_result.st_mtime_ns, stat_result.st_size)
+    
+    def get_by_request_id(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene un archivo procesado por su request_id.
+        
+        Args:
+            request_id: ID de la request
+            
+        Returns:
+            Entrada del tracking o None si no existe
+        """
+        data, _ = self._get_cached()
+        return data.get(request_id)
+    
+    def get_by_filename(self, filename: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene el archivo procesado que generó un ZIP o Excel.
+        
+        Args:
+            filename: Nombre del ZIP o Excel en public/
+            
+        Returns:
+            Entrada del tracking o None si no existe
+        """
+        data, filename_index = self._get_cached()
+        request_id = filename_index.get(filename)
+        return data.get(request_id) if request_id else None
+    
+    def _get_cached(self) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Obtiene el tracking y su índice por nombre de archivo, recargándolos
+        solo si el archivo cambió (mtime o tamaño).
+        
+        Returns:
+            Tupla (tracking, nombre de ZIP/Excel -> request_id)
+        """
+        try:
+            stat_result = self.tracking_file.stat()
+            cache_key = (stat_result.st_mtime_ns, stat_result.st_size)
+        except OSError:
+            cache_key = None
+        
+        with self._cache_lock:
+            if cache_key is None:
+                self._cache_key, self._cache_data, self._filename_index = None, {}, {}
+            elif cache_key != self._cache_key:
+                data = self._load_tracking()
+                # Ordenar por fecha ascendente para que, ante duplicados, gane el más reciente
+                entries = sorted(data.items(), key=lambda item: item[1].get("processed_at", ""))
+                filename_index = {}
+                for request_id, entry in entries:
+                    names = [entry.get("zip_filename"), entry.get("excel_filename")]
+                    for url_key in ("download_url", "excel_download_url"):
+                        url = entry.get(url_key)
+                        if url:
+                            names.append(url.rsplit("/", 1)[-1])
+                    for name in names:
+                        if name:
+                            filename_index[name] = request_id
+                self._cache_key, self._cache_data, self._filename_index = cache_key, data, filename_index
+            return self._cache_data, self._filename_index
+    
     def _load_tracking(self) -> Dict[str, Any]:
         """Carga el archivo de tracking."""
         if not self.tracking_file.exists():
@@ -3,6 +3,7 @@ Processing Worker - Sistema de workers para procesamiento asíncrono de PDFs
 Responsabilidad: Gestionar pool de workers y cola de procesamiento
 """
 
+import os
 import threading
 import queue
 import time
@@ -17,6 +18,29 @@ from ..core.file_manager import truncate_pdf_name_base, truncate_filename_for_pa
 logger = logging.getLogger(__name__)
 
 
+def _list_structured_jsons(structured_folder: Path) -> List[Path]:
+    """
+    Lista los JSONs estructurados (*_structured.json) de una carpeta.
+
+    Usa os.scandir en lugar de Path.glob (sin traducción fnmatch); el tipo de
+    cada entrada viene del propio listado del directorio.
+
+    Args:
+        structured_folder: Carpeta structured/ de un request
+
+    Returns:
+        Rutas de los JSONs estructurados (lista vacía si la carpeta no existe)
+    """
+    try:
+        with os.scandir(structured_folder) as entries:
+            return [
+                Path(entry.path) for entry in entries
+                if entry.name.endswith("_structured.json") and entry.is_file()
+            ]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
 class ProcessingJob:
     """Representa un job de procesamiento."""
     
@@ -276,9 +300,10 @@ class ProcessingWorkerManager:
             if job.save_files:
                 archive_manager = get_archive_manager()
                 api_folder = Path(base_output) / job.output_folder
-                json_files = list(api_folder.rglob("*.json")) if api_folder.exists() else []
+                # Solo importa si hay algún JSON: se corta en el primero encontrado
+                has_json_files = api_folder.exists() and next(api_folder.rglob("*.json"), None) is not None
                 
-                if json_files:
+                if has_json_files:
                     # Si es un lote, solo guardar JSONs y verificar si todos los lotes terminaron
                     if job.is_batch_job and job.batch_id:
                         # Este es un lote, verificar si todos los lotes terminaron
@@ -319,9 +344,7 @@ class ProcessingWorkerManager:
                         db_saved_successfully = False
                         
                         structured_folder = api_folder / "structured"
-                        structured_json_files = []
-                        if structured_folder.exists():
-                            structured_json_files = list(structured_folder.glob("*_structured.json"))
+                        structured_json_files = _list_structured_jsons(structured_folder)
                         
                         if structured_json_files:
                             try:
@@ -471,9 +494,7 @@ class ProcessingWorkerManager:
             db_saved_successfully = False
             
             structured_folder = api_folder / "structured"
-            structured_json_files = []
-            if structured_folder.exists():
-                structured_json_files = list(structured_folder.glob("*_structured.json"))
+            structured_json_files = _list_structured_jsons(structured_folder)
             
             if structured_json_files:
                 try:
@@ -0,0 +1,405 @@
+"""
+Structured Index - Índice en memoria de los JSONs estructurados
+Responsabilidad: Evitar re-leer y re-parsear output/api/{request_id}/structured/*_structured.json
+en cada request, manteniendo un resumen por archivo que solo se recalcula cuando el archivo cambia
+(y que se persiste en disco para no re-parsear todo al reiniciar)
+"""
+
+import os
+import json
+import hashlib
+import logging
+import orjson
+from pathlib import Path
+from datetime import datetime, date
+from threading import Lock
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def load_structured_json(path) -> Any:
+    """
+    Lee y parsea un JSON estructurado con orjson.
+
+    Si orjson lo rechaza (por ejemplo NaN/Infinity escritos por json.dump),
+    se vuelve a parsear con json estándar.
+
+    Args:
+        path: Ruta al JSON
+
+    Returns:
+        Contenido del JSON
+    """
+    data = Path(path).read_bytes()
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return json.loads(data)
+
+
+def _sum_field(rows: List[Any], field: str) -> float:
+    """
+    Suma un campo numérico de una tabla del JSON estructurado.
+
+    La reducción se hace con sum() sobre un generador (en C) en lugar de
+    acumular con += en un bucle de Python. Se ignoran filas que no son dict
+    y valores vacíos.
+
+    Args:
+        rows: Filas de la tabla (p. ej. mcomprobante)
+        field: Campo a sumar (p. ej. nPrecioTotal)
+
+    Returns:
+        Suma del campo
+
+    Raises:
+        ValueError/TypeError: Si algún valor no es numérico
+    """
+    values = (row.get(field) for row in rows if isinstance(row, dict))
+    return sum(map(float, filter(None, values)), 0.0)
+
+
+def build_structured_entry(path: str, folder_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Lee un JSON estructurado y construye su resumen.
+
+    Es una función de módulo para poder ejecutarse en un ProcessPoolExecutor.
+
+    Args:
+        path: Ruta al JSON estructurado
+        folder_name: Nombre de la carpeta api/{request_id} que lo contiene
+
+    Returns:
+        Diccionario con metadata y totales, o None si el JSON no se pudo leer
+    """
+    try:
+        json_data = load_structured_json(path)
+    except Exception as e:
+        logger.warning(f"Error leyendo {path}: {e}")
+        return None
+
+    # Un JSON con otra estructura se omite (no debe romper el índice de los demás)
+    if not isinstance(json_data, dict):
+        logger.warning(f"JSON estructurado inválido (no es un objeto), se omite: {path}")
+        return None
+    metadata = json_data.get("metadata") or {}
+    if not isinstance(metadata, dict):
+        logger.warning(f"JSON estructurado con metadata inválida, se omite: {path}")
+        return None
+
+    # Extraer montos y horas (las tablas están en el nivel raíz)
+    # - mcomprobante[].nPrecioTotal
+    # - mjornada[].nTotalHoras
+    monto_total = 0.0
+    total_horas = 0.0
+    try:
+        monto_total = _sum_field(json_data.get("mcomprobante", []), "nPrecioTotal")
+        total_horas = _sum_field(json_data.get("mjornada", []), "nTotalHoras")
+    except Exception as e:
+        logger.warning(f"Error leyendo {path}: {e}")
+
+    # Primer registro de mresumen (o de mcomprobante) para el detalle de archivos del periodo
+    first_rows = json_data.get("mresumen") or json_data.get("mcomprobante") or []
+    first_item = first_rows[0] if isinstance(first_rows, list) and first_rows and isinstance(first_rows[0], dict) else {}
+
+    # Fecha de procesamiento ya parseada (para filtrar por fecha sin re-parsear en cada request)
+    processed_at = metadata.get("processed_at")
+    if not isinstance(processed_at, str):
+        processed_at = ""
+    processed_date: Optional[date] = None
+    if processed_at:
+        try:
+            processed_date = datetime.fromisoformat(processed_at.replace('Z', '+00:00')).date()
+        except (ValueError, TypeError, AttributeError):
+            processed_date = None
+
+    request_id = metadata.get("request_id")
+
+    return {
+        "path": path,
+        "folder": folder_name,
+        "request_id": request_id if isinstance(request_id, str) else "",
+        "email": metadata.get("email", ""),
+        "filename": metadata.get("filename", "unknown"),
+        "document_type": metadata.get("document_type"),
+        "processed_at": processed_at,
+        "processed_date": processed_date,
+        "monto_total": monto_total,
+        "total_horas": total_horas,
+        "job_no": first_item.get("job_no"),
+        "source_reference": first_item.get("source_reference"),
+        "entered_curr": first_item.get("entered_curr"),
+        "entered_amount": first_item.get("entered_amount"),
+        "total_usd": first_item.get("total_usd"),
+        "fecha_valoracion": first_item.get("fecha_valoracion")
+    }
+
+
+def _entries_signature(entries: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Calcula una firma determinista de los JSONs indexados.
+
+    No usa hash() (salteado por proceso) para que todos los workers generen el mismo ETag.
+
+    Args:
+        entries: Diccionario ruta del JSON -> resumen (con mtime_ns y size)
+
+    Returns:
+        Digest hexadecimal de los (ruta, mtime_ns, tamaño) ordenados por ruta
+    """
+    items = sorted((path, entry["mtime_ns"], entry["size"]) for path, entry in entries.items())
+    return hashlib.blake2b(repr(items).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class StructuredIndex:
+    """
+    Índice de JSONs estructurados por archivo.
+
+    Responsabilidades:
+    - Detectar JSONs nuevos, modificados o eliminados (por mtime y tamaño)
+    - Parsear solo los JSONs que cambiaron
+    - Exponer un resumen por archivo (metadata y totales de montos/horas)
+    - Persistir los resúmenes para que al reiniciar solo se parseen los JSONs que cambiaron
+    """
+
+    STRUCTURED_SUFFIX = "_structured.json"
+    # Cantidad mínima de JSONs por parsear para usar el pool de procesos
+    PARALLEL_THRESHOLD = 64
+    # Cantidad mínima de JSONs por parsear para leerlos con el pool de threads
+    # (lotes chicos: solapa la espera de disco sin el costo de arrancar procesos)
+    THREAD_THRESHOLD = 8
+    # Máximo de archivos leídos a la vez por el pool de threads
+    THREAD_WORKERS = 16
+    # Versión del formato de los resúmenes persistidos; subirla al cambiar los campos
+    # de build_structured_entry para que el cache anterior se descarte
+    CACHE_VERSION = 1
+
+    def __init__(self, api_folder: str = "output/api", max_workers: Optional[int] = None,
+                 cache_file: Optional[str] = None):
+        """
+        Inicializa el índice.
+
+        Args:
+            api_folder: Carpeta output/api que contiene las carpetas {request_id}/structured/
+            max_workers: Procesos del pool de parseo (None = núcleos disponibles)
+            cache_file: Archivo donde se persisten los resúmenes (None = solo en memoria)
+        """
+        self.api_folder = Path(api_folder)
+        self.max_workers = max_workers
+        self.cache_file = Path(cache_file) if cache_file else None
+        # Los resúmenes persistidos se cargan en el primer refresh()
+        self._cache_loaded = False
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._thread_executor: Optional[ThreadPoolExecutor] = None
+        self._lock = Lock()
+        # Ruta del JSON -> resumen del archivo
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # request_id (y request_id maestro de cada batch) -> resumen
+        self._by_request_id: Dict[str, Dict[str, Any]] = {}
+        # Firma del contenido indexado (cambia cuando se agrega, modifica o elimina un JSON)
+        self._signature: str = _entries_signature({})
+
+    def refresh(self):
+        """
+        Sincroniza el índice con el disco.
+
+        Solo se parsean los JSONs nuevos o cuyo mtime/tamaño cambió; los eliminados
+        se quitan del índice. Si hay muchos JSONs por parsear (p. ej. al arrancar),
+        se reparten en un pool de procesos.
+        """
+        with self._lock:
+            if not self._cache_loaded:
+                self._cache_loaded = True
+                self._load_cache()
+
+            seen = set()
+            # (ruta, carpeta, stat) de los JSONs nuevos o modificados
+            changed = []
+
+            try:
+                with os.scandir(self.api_folder) as request_folders:
+                    for request_folder in request_folders:
+                        if not request_folder.is_dir():
+                            continue
+                        structured_folder = os.path.join(request_folder.path, "structured")
+                        try:
+                            with os.scandir(structured_folder) as json_files:
+                                for json_file in json_files:
+                                    if not json_file.name.endswith(self.STRUCTURED_SUFFIX) or not json_file.is_file():
+                                        continue
+
+                                    path = json_file.path
+                                    seen.add(path)
+                                    try:
+                                        stat_result = json_file.stat()
+                                    except OSError:
+                                        continue
+
+                                    cached = self._entries.get(path)
+                                    if (cached and cached["mtime_ns"] == stat_result.st_mtime_ns
+                                            and cached["size"] == stat_result.st_size):
+                                        continue
+
+                                    changed.append((path, request_folder.name, stat_result))
+                        except (FileNotFoundError, NotADirectoryError):
+                            continue
+            except (FileNotFoundError, NotADirectoryError):
+                pass
+
+            entries = self._parse_entries(changed)
+            for (path, _, stat_result), entry in zip(changed, entries):
+                if entry is None:
+                    self._entries.pop(path, None)
+                    continue
+                entry["mtime_ns"] = stat_result.st_mtime_ns
+                entry["size"] = stat_result.st_size
+                self._entries[path] = entry
+
+            # Quitar archivos que ya no existen
+            removed = [path for path in self._entries if path not in seen]
+            for path in removed:
+                del self._entries[path]
+
+            if changed or removed:
+                self._rebuild_lookups()
+                self._save_cache()
+
+    def _load_cache(self):
+        """
+        Carga los resúmenes persistidos (requiere _lock).
+
+        Cada resumen guarda el mtime/tamaño de su JSON, así que refresh() vuelve a
+        parsear solo los que cambiaron mientras el proceso estaba detenido. Un cache
+        de otra versión se ignora (se vuelven a parsear todos los JSONs).
+        """
+        if self.cache_file is None:
+            return
+        try:
+            data = orjson.loads(self.cache_file.read_bytes())
+            if data.get("version") != self.CACHE_VERSION:
+                logger.info("Cache de JSONs estructurados de otra versión, se reconstruye")
+                return
+            entries = data["entries"]
+            for entry in entries.values():
+                processed_date = entry.get("processed_date")
+                entry["processed_date"] = date.fromisoformat(processed_date) if processed_date else None
+                # orjson guarda NaN como null
+                for total_key in ("monto_total", "total_horas"):
+                    if entry[total_key] is None:
+                        entry[total_key] = float("nan")
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Cache de JSONs estructurados inválido, se reconstruye: {e}")
+            return
+        self._entries = entries
+        self._rebuild_lookups()
+
+    def _save_cache(self):
+        """
+        Persiste los resúmenes en cache_file (requiere _lock).
+
+        Se escribe a un archivo temporal y se reemplaza, para no dejar un cache a medio escribir.
+        """
+        if self.cache_file is None:
+            return
+        tmp_path = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        try:
+            tmp_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(orjson.dumps({"version": self.CACHE_VERSION, "entries": self._entries}))
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el cache de JSONs estructurados: {e}")
+
+    def _rebuild_lookups(self):
+        """
+        Reconstruye el mapa por request_id (el primer JSON indexado gana).
+        """
+        by_request_id: Dict[str, Dict[str, Any]] = {}
+        for entry in self._entries.values():
+            request_id = entry["request_id"]
+            if not request_id:
+                continue
+            by_request_id.setdefault(request_id, entry)
+            # Los JSONs de un batch también se encuentran por el request_id maestro
+            if "_batch_" in request_id:
+                by_request_id.setdefault(request_id.split("_batch_")[0], entry)
+        self._by_request_id = by_request_id
+        self._signature = _entries_signature(self._entries)
+
+    def _parse_entries(self, changed: List[tuple]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Construye el resumen de los JSONs indicados.
+
+        Desde PARALLEL_THRESHOLD se usa un ProcessPoolExecutor (el parseo es CPU-bound
+        y el GIL impide aprovechar varios núcleos con threads). Entre THREAD_THRESHOLD
+        y PARALLEL_THRESHOLD se usa un pool de threads acotado, que solapa la lectura
+        de disco de los archivos; por debajo se parsean secuencialmente.
+
+        Args:
+            changed: Lista de (ruta, carpeta, stat) a parsear
+
+        Returns:
+            Lista de resúmenes (o None) en el mismo orden que changed
+        """
+        paths = [item[0] for item in changed]
+        folders = [item[1] for item in changed]
+
+        if len(changed) >= self.PARALLEL_THRESHOLD:
+            try:
+                workers = self.max_workers or os.cpu_count() or 1
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=workers)
+                chunksize = max(1, len(changed) // (4 * workers))
+                return list(self._executor.map(build_structured_entry, paths, folders, chunksize=chunksize))
+            except Exception as e:
+                logger.warning(f"Error parseando JSONs en paralelo, se parsean secuencialmente: {e}")
+
+        if len(changed) >= self.THREAD_THRESHOLD:
+            if self._thread_executor is None:
+                self._thread_executor = ThreadPoolExecutor(
+                    max_workers=self.THREAD_WORKERS, thread_name_prefix="structured-index"
+                )
+            return list(self._thread_executor.map(build_structured_entry, paths, folders))
+
+        return [build_structured_entry(path, folder) for path, folder in zip(paths, folders)]
+
+    def get_by_request_id(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene el resumen de un JSON estructurado de un request_id.
+
+        Para un request_id maestro también se encuentran los JSONs de sus batches
+        ({request_id}_batch_N). No sincroniza con el disco; llamar antes a refresh().
+
+        Args:
+            request_id: ID completo del request
+
+        Returns:
+            Resumen del JSON (ver build_structured_entry) o None si no está indexado
+        """
+        with self._lock:
+            return self._by_request_id.get(request_id)
+
+    def get_signature(self) -> str:
+        """
+        Obtiene una firma del contenido indexado (para validar respuestas cacheadas).
+
+        No sincroniza con el disco; llamar antes a refresh().
+
+        Returns:
+            Hash blake2b de (ruta, mtime_ns, tamaño) de todos los JSONs indexados
+        """
+        with self._lock:
+            return self._signature
+
+    def get_entries(self) -> List[Dict[str, Any]]:
+        """
+        Obtiene el resumen de todos los JSONs estructurados indexados.
+
+        Returns:
+            Lista de resúmenes (ver build_structured_entry)
+        """
+        with self._lock:
+            return list(self._entries.values())
@@ -5,8 +5,10 @@ Responsabilidad: Guardar, recuperar y gestionar PDFs subidos con metadata
 
 import json
 import os
+import shutil
 from pathlib import Path
-from typing import Optional, Dict, Any
+from threading import Lock
+from typing import Optional, Dict, Any, BinaryIO, Tuple
 from datetime import datetime
 import uuid
 import logging
@@ -37,6 +39,15 @@ class UploadManager:
         # Subcarpeta para metadata
         self.metadata_folder = self.uploads_folder / "metadata"
         self.metadata_folder.mkdir(parents=True, exist_ok=True)
+        
+        # Índices en memoria de archivos procesados (se construyen en el primer uso)
+        # request_id -> file_id y nombre de ZIP/Excel -> file_id
+        # Se reconstruyen cuando cambia la firma de la carpeta de metadata, así que
+        # también ven la metadata escrita por otros procesos (varios workers)
+        self._index_lock = Lock()
+        self._index_key: Optional[Tuple[int, int, int, int]] = None
+        self._request_index: Dict[str, str] = {}
+        self._filename_index: Dict[str, str] = {}
     
     def save_uploaded_pdf(self, pdf_content: bytes, filename: str, 
                          metadata: Dict[str, Any]) -> str:
@@ -59,20 +70,68 @@ class UploadManager:
         with open(pdf_path, "wb") as f:
             f.write(pdf_content)
         
-        # Guardar metadata
+        self._save_upload_metadata(file_id, filename, metadata, len(pdf_content))
+        return file_id
+    
+    def save_uploaded_pdf_stream(self, source: BinaryIO, filename: str,
+                                 metadata: Dict[str, Any],
+                                 chunk_size: int = 1024 * 1024) -> Tuple[str, int]:
+        """
+        Guarda un PDF subido copiándolo por bloques desde un archivo abierto.
+        
+        A diferencia de save_uploaded_pdf, el PDF nunca se carga completo en
+        memoria: se copia en bloques de chunk_size bytes (p. ej. desde el
+        SpooledTemporaryFile de un UploadFile).
+        
+        Args:
+            source: Archivo binario abierto con el contenido del PDF
+            filename: Nombre original del archivo
+            metadata: Metadata (email, year, month)
+            chunk_size: Tamaño de cada bloque copiado
+            
+        Returns:
+            Tupla (file_id generado, tamaño en bytes del PDF guardado)
+        """
+        # Generar file_id único
+        file_id = str(uuid.uuid4())
+        
+        # Guardar PDF por bloques
+        pdf_path = self.uploads_folder / f"{file_id}.pdf"
+        source.seek(0)
+        try:
+            with open(pdf_path, "wb") as f:
+                shutil.copyfileobj(source, f, chunk_size)
+                file_size = f.tell()
+        except Exception:
+            # No dejar PDFs a medio escribir sin metadata
+            pdf_path.unlink(missing_ok=True)
+            raise
+        
+        self._save_upload_metadata(file_id, filename, metadata, file_size)
+        return file_id, file_size
+    
+    def _save_upload_metadata(self, file_id: str, filename: str,
+                              metadata: Dict[str, Any], file_size: int):
+        """
+        Guarda el JSON de metadata de un PDF subido.
+        
+        Args:
+            file_id: ID del archivo subido
+            filename: Nombre original del archivo
+            metadata: Metadata (email, year, month)
+            file_size: Tamaño del PDF en bytes
+        """
         metadata_data = {
             "file_id": file_id,
             "filename": filename,
             "uploaded_at": datetime.now().isoformat(),
             "metadata": metadata,
-            "file_size_bytes": len(pdf_content)
+            "file_size_bytes": file_size
         }
         
         metadata_path = self.metadata_folder / f"{file_id}_metadata.json"
         with open(metadata_path, 'w', encoding='utf-8') as f:
             json.dump(metadata_data, f, ensure_ascii=False, indent=2)
-        
-        return file_id
     
     def get_uploaded_pdf_path(self, file_id: str) -> Optional[Path]:
         """
@@ -160,12 +219,19 @@ class UploadManager:
         updated_count = 0
         
         # Buscar todos los archivos de metadata
-        if not self.metadata_folder.exists():
+        # (os.scandir + comparación de sufijo, como en list_uploaded_files)
+        try:
+            with os.scandir(self.metadata_folder) as entries:
+                metadata_paths = [
+                    entry.path for entry in entries
+                    if entry.name.endswith("_metadata.json") and entry.is_file()
+                ]
+        except (FileNotFoundError, NotADirectoryError):
             return 0
         
         files_to_delete = []  # Lista de file_ids a eliminar si delete_files es True
         
-        for metadata_file in self.metadata_folder.glob("*_metadata.json"):
+        for metadata_file in metadata_paths:
             try:
                 with open(metadata_file, 'r', encoding='utf-8') as f:
                     metadata_data = json.load(f)
@@ -237,6 +303,8 @@ class UploadManager:
             except Exception:
                 success = False
         
+        self._invalidate_index()
+        
         return success
     
     def file_exists(self, file_id: str) -> bool:
@@ -286,25 +354,166 @@ class UploadManager:
         metadata_path = self.metadata_folder / f"{file_id}_metadata.json"
         with open(metadata_path, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, ensure_ascii=False, indent=2)
+        
+        self._invalidate_index()
     
-    def list_uploaded_files(self, processed: Optional[bool] = None) -> list:
+    def get_by_request_id(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene la metadata del archivo procesado con un request_id.
+        
+        Args:
+            request_id: ID de la request de procesamiento
+            
+        Returns:
+            Metadata del archivo o None si no hay un archivo procesado con ese request_id
+        """
+        self._ensure_index()
+        with self._index_lock:
+            file_id = self._request_index.get(request_id)
+        return self._get_processed_metadata(file_id, lambda data: data.get("request_id") == request_id)
+    
+    def get_by_filename(self, filename: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene la metadata del archivo procesado que generó un ZIP o Excel.
+        
+        Args:
+            filename: Nombre del ZIP o Excel en public/
+            
+        Returns:
+            Metadata del archivo o None si ningún archivo procesado lo generó
+        """
+        self._ensure_index()
+        with self._index_lock:
+            file_id = self._filename_index.get(filename)
+        return self._get_processed_metadata(file_id, lambda data: filename in self._public_filenames(data))
+    
+    def _get_processed_metadata(self, file_id: Optional[str], matches) -> Optional[Dict[str, Any]]:
+        """
+        Lee la metadata de un file_id del índice y verifica que siga coincidiendo.
+        
+        Args:
+            file_id: ID del archivo (o None si no está en el índice)
+            matches: Función que valida la metadata leída
+            
+        Returns:
+            Metadata del archivo o None
+        """
+        if not file_id:
+            return None
+        data = self.get_uploaded_metadata(file_id)
+        if data and data.get("processed", False) and matches(data):
+            return data
+        return None
+    
+    @staticmethod
+    def _public_filenames(data: Dict[str, Any]) -> set:
+        """
+        Obtiene los nombres de ZIP/Excel públicos asociados a una metadata.
+        
+        Args:
+            data: Metadata del archivo subido
+            
+        Returns:
+            Conjunto de nombres de archivo
+        """
+        names = {data.get("zip_filename"), data.get("excel_filename")}
+        for url_key in ("download_url", "excel_download_url"):
+            url = data.get(url_key)
+            if url:
+                names.add(url.rsplit("/", 1)[-1])
+        names.discard(None)
+        names.discard("")
+        return names
+    
+    def _index_file(self, file_id: str, data: Dict[str, Any]):
+        """Agrega un archivo procesado a los índices (requiere _index_lock)."""
+        request_id = data.get("request_id")
+        if request_id:
+            self._request_index[request_id] = file_id
+        for name in self._public_filenames(data):
+            self._filename_index[name] = file_id
+    
+    def _invalidate_index(self):
+        """Fuerza la reconstrucción de los índices en la próxima búsqueda (tras escribir metadata)."""
+        with self._index_lock:
+            self._index_key = None
+    
+    def _ensure_index(self):
+        """
+        Construye los índices de archivos procesados si la carpeta de metadata cambió
+        desde la última construcción (incluye escrituras de otros procesos).
+        """
+        # La firma se toma antes de leer: si algo cambia mientras tanto, el próximo uso reconstruye
+        signature = self.get_metadata_signature()
+        with self._index_lock:
+            if self._index_key == signature:
+                return
+            self._request_index = {}
+            self._filename_index = {}
+            # Recorrer en orden inverso para que, ante duplicados, gane el más reciente (como en list_uploaded_files)
+            for data in reversed(self.list_uploaded_files(processed=True)):
+                file_id = data.get("file_id")
+                if file_id:
+                    self._index_file(file_id, data)
+            self._index_key = signature
+    
+    def get_metadata_signature(self) -> Tuple[int, int, int, int]:
+        """
+        Obtiene una firma del estado de la carpeta de metadata sin leer los JSONs.
+        
+        Cambia al subir, marcar como procesado o eliminar cualquier archivo (toda
+        escritura de metadata actualiza su mtime), así que sirve para validar
+        respuestas cacheadas de los listados (ETag).
+        
+        Returns:
+            Tupla (mtime_ns de la carpeta, cantidad de JSONs, mtime_ns más reciente, suma de tamaños)
+        """
+        count = latest_mtime_ns = total_size = 0
+        try:
+            folder_mtime_ns = os.stat(self.metadata_folder).st_mtime_ns
+            with os.scandir(self.metadata_folder) as entries:
+                for entry in entries:
+                    if not entry.name.endswith("_metadata.json"):
+                        continue
+                    try:
+                        stat_result = entry.stat()
+                    except OSError:
+                        continue
+                    count += 1
+                    total_size += stat_result.st_size
+                    latest_mtime_ns = max(latest_mtime_ns, stat_result.st_mtime_ns)
+        except OSError:
+            return (0, 0, 0, 0)
+        return (folder_mtime_ns, count, latest_mtime_ns, total_size)
+    
+    def list_uploaded_files(self, processed: Optional[bool] = None,
+                            order_by: Optional[str] = "uploaded_at") -> list:
         """
         Lista todos los archivos subidos.
         
         Args:
             processed: Si True, solo procesados. Si False, solo no procesados. Si None, todos.
+            order_by: Campo por el que se ordena (más reciente primero). None = sin ordenar,
+                      para los llamadores que seleccionan su propio top-N.
             
         Returns:
             Lista de metadata de archivos
         """
         files = []
         
-        if not self.metadata_folder.exists():
+        try:
+            # os.scandir + comparación de sufijo (más rápido que Path.glob con fnmatch)
+            with os.scandir(self.metadata_folder) as entries:
+                metadata_paths = [
+                    entry.path for entry in entries
+                    if entry.name.endswith("_metadata.json") and entry.is_file()
+                ]
+        except (FileNotFoundError, NotADirectoryError):
             return files
         
-        for metadata_file in self.metadata_folder.glob("*_metadata.json"):
+        for metadata_path in metadata_paths:
             try:
-                with open(metadata_file, 'r', encoding='utf-8') as f:
+                with open(metadata_path, 'r', encoding='utf-8') as f:
                     file_data = json.load(f)
                 
                 # Filtrar por estado de procesamiento
@@ -314,8 +523,9 @@ class UploadManager:
             except Exception:
                 continue
         
-        # Ordenar por fecha de subida (más reciente primero)
-        files.sort(key=lambda x: x.get("uploaded_at", ""), reverse=True)
+        # Ordenar por fecha (más reciente primero)
+        if order_by:
+            files.sort(key=lambda x: x.get(order_by) or "", reverse=True)
         
         return files
 
@@ -3,6 +3,7 @@ Resumen Consolidator - Servicio para consolidar resúmenes PS
 Responsabilidad: Consolidar datos de JSONs estructurados en resúmenes PS (OnShore/OffShore)
 """
 
+import os
 import json
 import logging
 from pathlib import Path
@@ -11,9 +12,31 @@ from datetime import datetime
 from collections import defaultdict
 from decimal import Decimal
 
+import orjson
+
 logger = logging.getLogger(__name__)
 
 
+def _load_json_file(path) -> Any:
+    """
+    Lee y parsea un JSON con orjson.
+    
+    Si orjson lo rechaza (por ejemplo NaN/Infinity escritos por json.dump),
+    se vuelve a parsear con json estándar.
+    
+    Args:
+        path: Ruta al JSON
+        
+    Returns:
+        Contenido del JSON
+    """
+    data = Path(path).read_bytes()
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return json.loads(data)
+
+
 class ResumenConsolidator:
     """
     Servicio para consolidar resúmenes PS desde JSONs estructurados.
@@ -28,8 +51,9 @@ class ResumenConsolidator:
         """
         if output_folder is None:
             output_folder = Path("./output")
-        self.output_folder = output_folder
-        self.consolidated_folder = output_folder / "consolidated"
+        # FileManager.get_output_folder() retorna str
+        self.output_folder = Path(output_folder)
+        self.consolidated_folder = self.output_folder / "consolidated"
         self.consolidated_folder.mkdir(parents=True, exist_ok=True)
     
     def consolidate_periodo(
@@ -76,12 +100,18 @@ class ResumenConsolidator:
                 continue
             
             # Buscar todos los JSONs en esta carpeta específica
-            json_files = list(structured_folder.glob("*_structured.json"))
+            # (os.scandir + comparación de sufijo en lugar de Path.glob)
+            try:
+                with os.scandir(structured_folder) as entries:
+                    json_files = [
+                        entry.path for entry in entries
+                        if entry.name.endswith("_structured.json") and entry.is_file()
+                    ]
+            except (FileNotFoundError, NotADirectoryError):
+                continue
             for json_file in json_files:
                 try:
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        json_data = json.load(f)
-                    json_data_list.append(json_data)
+                    json_data_list.append(_load_json_file(json_file))
                 except Exception as e:
                     logger.error(f"Error leyendo {json_file}: {e}")
                     continue
@@ -465,10 +495,13 @@ class ResumenConsolidator:
             }
         }
     
+    def get_consolidado_path(self, periodo_id: str) -> Path:
+        """Ruta del archivo JSON del consolidado de un periodo."""
+        return self.consolidated_folder / f"resumen_ps_{periodo_id}.json"
+    
     def _save_consolidado(self, periodo_id: str, consolidado: Dict[str, Any]):
         """Guarda el consolidado en un archivo JSON."""
-        filename = f"resumen_ps_{periodo_id}.json"
-        filepath = self.consolidated_folder / filename
+        filepath = self.get_consolidado_path(periodo_id)
         
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
@@ -480,15 +513,13 @@ class ResumenConsolidator:
     
     def load_consolidado(self, periodo_id: str) -> Optional[Dict[str, Any]]:
         """Carga un consolidado desde el archivo."""
-        filename = f"resumen_ps_{periodo_id}.json"
-        filepath = self.consolidated_folder / filename
+        filepath = self.get_consolidado_path(periodo_id)
         
         if not filepath.exists():
             return None
         
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return _load_json_file(filepath)
         except Exception as e:
             logger.error(f"Error cargando consolidado {filepath}: {e}")
             return None
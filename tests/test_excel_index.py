@@ -0,0 +1,29 @@
+"""
+Tests de regresión del índice de Excels (src/api/excel_index.py)
+"""
+
+from src.api.excel_index import ExcelIndex
+
+
+def test_delete_many_elimina_entradas_y_cambia_la_firma(tmp_path):
+    index = ExcelIndex(str(tmp_path / "index.db"))
+    index.set_many({"r1": "a.xlsx", "r2": "b.xlsx"})
+    signature = index.get_signature()
+
+    index.delete_many(["r1", None, "r1"])
+
+    assert index.get_all() == {"r2": "b.xlsx"}
+    assert index.get_signature() != signature
+
+
+def test_get_existing_excels_descarta_los_borrados_de_disco(tmp_path):
+    from src.api.main import _get_existing_excels
+
+    public_folder = tmp_path / "public"
+    public_folder.mkdir()
+    (public_folder / "b.xlsx").write_bytes(b"x")
+    index = ExcelIndex(str(tmp_path / "index.db"))
+    index.set_many({"r1": "a.xlsx", "r2": "b.xlsx"})
+
+    assert _get_existing_excels(index, public_folder, ["r1", "r2"]) == {"r2": "b.xlsx"}
+    assert index.get_all() == {"r2": "b.xlsx"}
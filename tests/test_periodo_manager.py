@@ -0,0 +1,36 @@
+"""
+Tests de regresión del gestor de periodos (src/api/periodo_manager.py)
+"""
+
+import os
+
+from src.api.periodo_manager import PeriodoManager
+
+
+def test_escritura_propia_invalida_el_indice_con_mismo_mtime_y_tamano(tmp_path):
+    manager = PeriodoManager(tmp_path / "periodos_tracking.json")
+    periodo_id = manager.create_periodo("01/2025", "onshore")["periodo_id"]
+    manager.update_periodo(periodo_id, {"estado": "abierto"})
+    assert manager.get_periodo(periodo_id)["estado"] == "abierto"
+
+    # Simular un filesystem con mtime grueso: misma marca de tiempo y mismo tamaño
+    stat_before = manager.tracking_file.stat()
+    manager.update_periodo(periodo_id, {"estado": "cerrado"})
+    os.utime(manager.tracking_file, ns=(stat_before.st_atime_ns, stat_before.st_mtime_ns))
+    assert manager.tracking_file.stat().st_size == stat_before.st_size
+
+    assert manager.get_periodo(periodo_id)["estado"] == "cerrado"
+
+
+def test_los_resultados_no_comparten_el_cache(tmp_path):
+    manager = PeriodoManager(tmp_path / "periodos_tracking.json")
+    periodo_id = manager.create_periodo("01/2025", "onshore")["periodo_id"]
+    manager.add_archivo_to_periodo(periodo_id, "r1")
+
+    manager.get_periodo(periodo_id)["estado"] = "roto"
+    manager.get_archivos_from_periodo(periodo_id).append("r2")
+    manager.list_periodos()[0]["archivos_asociados"].append("r3")
+
+    periodo = manager.get_periodo(periodo_id)
+    assert periodo["estado"] != "roto"
+    assert periodo["archivos_asociados"] == ["r1"]
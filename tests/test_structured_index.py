@@ -0,0 +1,62 @@
+"""
+Tests de regresión del índice de JSONs estructurados (src/api/structured_index.py)
+"""
+
+import json
+
+from src.api.structured_index import StructuredIndex, build_structured_entry
+
+
+def _write_structured(api_folder, request_id, name, content):
+    """Escribe un JSON en api/{request_id}/structured/ y retorna su ruta."""
+    structured_folder = api_folder / request_id / "structured"
+    structured_folder.mkdir(parents=True, exist_ok=True)
+    path = structured_folder / name
+    path.write_text(content, encoding="utf-8")
+    return path
+
+
+def test_build_structured_entry_metadata_null_se_trata_como_vacia(tmp_path):
+    path = _write_structured(tmp_path, "r1", "a_structured.json", json.dumps({"metadata": None}))
+    entry = build_structured_entry(str(path), "r1")
+    assert entry is not None
+    assert entry["request_id"] == ""
+    assert entry["processed_date"] is None
+
+
+def test_build_structured_entry_metadata_no_objeto_se_omite(tmp_path):
+    path = _write_structured(tmp_path, "r1", "a_structured.json", json.dumps({"metadata": [1]}))
+    assert build_structured_entry(str(path), "r1") is None
+
+
+def test_build_structured_entry_json_no_objeto_se_omite(tmp_path):
+    path = _write_structured(tmp_path, "r1", "a_structured.json", "[1, 2]")
+    assert build_structured_entry(str(path), "r1") is None
+
+
+def test_refresh_omite_jsons_invalidos(tmp_path):
+    _write_structured(tmp_path, "r1", "a_structured.json", json.dumps({"metadata": None}))
+    _write_structured(tmp_path, "r2", "b_structured.json", "[1, 2]")
+    _write_structured(tmp_path, "r3", "c_structured.json", json.dumps({
+        "metadata": {"request_id": "r3", "email": "a@x.com", "processed_at": "2025-01-01T10:00:00"},
+        "mcomprobante": [{"nPrecioTotal": "10.5"}],
+        "mjornada": [{"nTotalHoras": 2}]
+    }))
+
+    index = StructuredIndex(str(tmp_path))
+    index.refresh()
+
+    # El JSON con metadata null queda indexado sin request_id; el que no es objeto se omite
+    entries = {entry["folder"]: entry for entry in index.get_entries()}
+    assert sorted(entries) == ["r1", "r3"]
+    assert entries["r3"]["monto_total"] == 10.5
+    assert entries["r3"]["total_horas"] == 2.0
+    assert index.get_by_request_id("r3") is entries["r3"]
+
+
+def test_firma_determinista_entre_instancias(tmp_path):
+    _write_structured(tmp_path, "r1", "a_structured.json", json.dumps({"metadata": {"request_id": "r1"}}))
+    first, second = StructuredIndex(str(tmp_path)), StructuredIndex(str(tmp_path))
+    first.refresh()
+    second.refresh()
+    assert first.get_signature() == second.get_signature() != StructuredIndex(str(tmp_path)).get_signature()
@@ -0,0 +1,23 @@
+"""
+Tests de regresión del gestor de uploads (src/api/upload_manager.py)
+"""
+
+from src.api.upload_manager import UploadManager
+
+
+def test_get_by_request_id_ve_metadata_de_otro_proceso(tmp_path):
+    # Dos instancias sobre la misma carpeta simulan dos workers
+    writer = UploadManager(str(tmp_path))
+    reader = UploadManager(str(tmp_path))
+    file_id = writer.save_uploaded_pdf(b"%PDF", "doc.pdf", {"email": "a@x.com"})
+
+    # El lector construye su índice antes de que el archivo se procese
+    assert reader.get_by_request_id("r1") is None
+
+    writer.mark_as_processed(file_id, "r1.zip", "/public/r1.zip", "r1", "r1.xlsx", "/public/r1.xlsx")
+
+    assert reader.get_by_request_id("r1")["file_id"] == file_id
+    assert reader.get_by_filename("r1.xlsx")["file_id"] == file_id
+
+    writer.delete_uploaded_pdf(file_id)
+    assert reader.get_by_request_id("r1") is None